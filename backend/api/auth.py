@@ -10,6 +10,8 @@ from backend.models.schemas import (
     UserProfile, BaseResponse
 )
 from backend.services.auth_service import firebase_auth_service
+from backend.services.principal_cache import principal_cache
+from backend.services.token_versions import token_versions
 from backend.core.config import settings
 
 router = APIRouter()
@@ -34,7 +36,13 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid token payload"
         )
     
-    user = firebase_auth_service.get_user_by_id(user_id)
+    # Claims-only mode: no database read while the token's version is current
+    if settings.AUTH_CLAIMS_ONLY:
+        user = firebase_auth_service.principal_from_claims(payload)
+        if user is not None:
+            return user
+    
+    user = await principal_cache.get(user_id, firebase_auth_service.get_user_by_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -67,11 +75,11 @@ async def login(request: Request, login_data: LoginRequest):
     user_agent = request.headers.get("user-agent")
     
     # Authenticate user
-    user = firebase_auth_service.authenticate_user(login_data.email, login_data.password)
+    user = await firebase_auth_service.authenticate_user(login_data.email, login_data.password)
     
     if not user:
         # Log failed attempt
-        firebase_auth_service.log_user_action(
+        await firebase_auth_service.log_user_action(
             None, "LOGIN_FAILED", 
             f"Failed login attempt for {login_data.email}",
             client_host, user_agent
@@ -83,11 +91,8 @@ async def login(request: Request, login_data: LoginRequest):
         )
     
     # Create tokens
-    token_data = {
-        "sub": str(user['id']),
-        "email": user['email'],
-        "tipo_usuario": user['tipo_usuario']
-    }
+    token_data = firebase_auth_service.token_claims(user)
+    token_versions.observe(token_data['sub'], token_data['ver'])
     access_token = firebase_auth_service.create_access_token(token_data)
     refresh_token = firebase_auth_service.create_refresh_token(token_data)
     
@@ -103,7 +108,7 @@ async def refresh_token(refresh_data: TokenRefreshRequest):
     """
     Refresh access token using refresh token
     """
-    new_access_token = firebase_auth_service.refresh_access_token(refresh_data.refresh_token)
+    new_access_token = await firebase_auth_service.refresh_access_token(refresh_data.refresh_token)
     
     if not new_access_token:
         raise HTTPException(
@@ -125,15 +130,21 @@ async def get_current_user_profile(current_user: dict = Depends(get_current_user
     return UserProfile(**current_user)
 
 @router.post("/logout", response_model=BaseResponse)
-async def logout(request: Request, current_user: dict = Depends(get_current_user)):
+async def logout(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
     """
     Logout user (client should discard tokens)
     """
+    firebase_auth_service.evict_token(credentials.credentials)
+    
     client_host = request.client.host if request.client else None
     user_agent = request.headers.get("user-agent")
     
     # Log logout
-    firebase_auth_service.log_user_action(
+    await firebase_auth_service.log_user_action(
         current_user['id'], "LOGOUT", 
         f"User logged out",
         client_host, user_agent
@@ -3,110 +3,72 @@ Reports API endpoints - Firebase Firestore implementation
 """
 
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from typing import Optional
-from datetime import datetime, timedelta
-from backend.models.schemas import DashboardData, DashboardStats, BaseResponse
+from datetime import datetime, timedelta, timezone
+from backend.models.schemas import DashboardData, DashboardStats, BaseResponse, ReportQuery
 from backend.api.auth import get_current_user
-from backend.database.firebase_connection import firebase_manager
-from collections import defaultdict
+from backend.database.async_firebase_connection import async_firebase_manager
+from backend.services.dashboard_stats import dashboard_counters, month_key
+from backend.services.suggestion_snapshot import (
+    suggestion_snapshot, breakdown, day_counts, epoch_column, epoch_ns, local_day_bounds, MISSING_TIME
+)
+from backend.services.report_query import compile_query
+import numpy as np
+import json
 
 router = APIRouter()
 
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
 @router.get("/dashboard", response_model=DashboardData)
 async def get_dashboard_data(
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get dashboard statistics and charts data - Firebase implementation
+    
+    A single read of the counters kept by backend/services/dashboard_stats.py
     """
     try:
-        # Get all suggestions
-        suggestions_result = firebase_manager.query_collection("sugestoes")
-        if not suggestions_result['success']:
-            raise HTTPException(status_code=500, detail="Error fetching suggestions")
-        
-        suggestions = suggestions_result.get('data', [])
-        
-        # Get all users
-        users_result = firebase_manager.query_collection("usuarios")
-        if not users_result['success']:
-            raise HTTPException(status_code=500, detail="Error fetching users")
-        
-        users = users_result.get('data', [])
-        
-        # Calculate basic stats
-        total_suggestions = len(suggestions)
-        
-        # Count active users
-        active_users = sum(1 for user in users if user.get('ativo', False))
-        total_users = active_users
-        
-        # Count suggestions this month
-        current_month = datetime.now().strftime('%Y-%m')
-        suggestions_this_month = 0
-        
-        for suggestion in suggestions:
-            created_at = suggestion.get('created_at')
-            if created_at:
-                # Handle both datetime objects and Firebase timestamps
-                if hasattr(created_at, 'timestamp'):
-                    created_at = datetime.fromtimestamp(created_at.timestamp())
-                if isinstance(created_at, datetime) and created_at.strftime('%Y-%m') == current_month:
-                    suggestions_this_month += 1
-        
-        # Count suggestions by status
-        status_counts = defaultdict(int)
-        for suggestion in suggestions:
-            status = suggestion.get('status', 'unknown')
-            status_counts[status] += 1
+        # Normally seeded by the warm-up; rebuilt here if that has not happened yet
+        stats = await dashboard_counters.ensure()
         
-        pending_suggestions = status_counts.get('pendente', 0)
-        approved_suggestions = status_counts.get('aprovada', 0)
+        status_counts = stats.get('sugestoes_por_status') or {}
+        month_counts = stats.get('sugestoes_por_mes') or {}
+        dept_counts = stats.get('usuarios_ativos_por_setor') or {}
         
+        # Basic stats
+        active_users = stats.get('usuarios_ativos', 0)
         dashboard_stats = DashboardStats(
-            total_suggestions=total_suggestions,
-            total_users=total_users,
-            suggestions_this_month=suggestions_this_month,
+            total_suggestions=stats.get('sugestoes_total', 0),
+            total_users=active_users,
+            suggestions_this_month=month_counts.get(month_key(datetime.now(timezone.utc)), 0),
             active_users=active_users,
-            pending_suggestions=pending_suggestions,
-            approved_suggestions=approved_suggestions
+            pending_suggestions=status_counts.get('pendente', 0),
+            approved_suggestions=status_counts.get('aprovada', 0)
         )
         
         # Suggestions by status
         suggestions_by_status = [
             {"status": status, "count": count}
-            for status, count in status_counts.items()
+            for status, count in status_counts.items() if count
         ]
         
         # Suggestions by month (last 12 months)
-        month_counts = defaultdict(int)
-        cutoff_date = datetime.now() - timedelta(days=365)
-        
-        for suggestion in suggestions:
-            created_at = suggestion.get('created_at')
-            if created_at:
-                # Handle both datetime objects and Firebase timestamps
-                if hasattr(created_at, 'timestamp'):
-                    created_at = datetime.fromtimestamp(created_at.timestamp())
-                if isinstance(created_at, datetime) and created_at >= cutoff_date:
-                    month_key = created_at.strftime('%Y-%m')
-                    month_counts[month_key] += 1
-        
+        cutoff_month = month_key(datetime.now(timezone.utc) - timedelta(days=365))
         suggestions_by_month = [
             {"month": month, "count": count}
-            for month, count in sorted(month_counts.items())
+            for month, count in sorted(month_counts.items()) if count and month >= cutoff_month
         ]
         
-        # Users by department
-        dept_counts = defaultdict(int)
-        for user in users:
-            if user.get('ativo', False):
-                setor = user.get('setor', 'Unknown')
-                dept_counts[setor] += 1
-        
+        # Users by department (active users only)
         users_by_department = [
             {"setor": setor, "count": count}
-            for setor, count in sorted(dept_counts.items(), key=lambda x: x[1], reverse=True)
+            for setor, count in sorted(dept_counts.items(), key=lambda x: x[1], reverse=True) if count
         ]
         
         return DashboardData(
@@ -130,76 +92,38 @@ async def get_suggestions_summary(
     Get suggestions summary with filters - Firebase implementation
     """
     try:
-        # Get all suggestions
-        suggestions_result = firebase_manager.query_collection("sugestoes")
-        if not suggestions_result['success']:
-            raise HTTPException(status_code=500, detail="Error fetching suggestions")
-        
-        suggestions = suggestions_result.get('data', [])
-        
-        # Apply filters
-        filtered_suggestions = []
-        
-        for suggestion in suggestions:
-            # Date filtering
-            created_at = suggestion.get('created_at')
-            if created_at:
-                # Handle both datetime objects and Firebase timestamps
-                if hasattr(created_at, 'timestamp'):
-                    created_at = datetime.fromtimestamp(created_at.timestamp())
-                
-                if date_from:
-                    date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-                    if created_at < date_from_obj:
-                        continue
-                
-                if date_to:
-                    date_to_obj = datetime.strptime(date_to, '%Y-%m-%d')
-                    if created_at > date_to_obj:
-                        continue
-            
-            # Sector filtering
-            if setor:
-                setor_origem = suggestion.get('setor_origem', '')
-                setor_destino = suggestion.get('setor_destino', '')
-                if setor not in [setor_origem, setor_destino]:
-                    continue
-            
-            # Non-admin users see only their department's data
-            if current_user['tipo_usuario'] != 'admin':
-                user_setor = current_user.get('setor', '')
-                sugg_setor_origem = suggestion.get('setor_origem', '')
-                sugg_setor_destino = suggestion.get('setor_destino', '')
-                if user_setor not in [sugg_setor_origem, sugg_setor_destino]:
-                    continue
-            
-            filtered_suggestions.append(suggestion)
-        
-        # Calculate summary statistics
-        total_suggestions = len(filtered_suggestions)
-        
-        status_counts = defaultdict(int)
-        priority_counts = defaultdict(int)
-        setor_counts = defaultdict(int)
-        
-        for suggestion in filtered_suggestions:
-            # Count by status
-            status = suggestion.get('status', 'unknown')
-            status_counts[status] += 1
-            
-            # Count by priority
-            priority = suggestion.get('prioridade', 'unknown')
-            priority_counts[priority] += 1
-            
-            # Count by origin sector
-            setor_origem = suggestion.get('setor_origem', 'Unknown')
-            setor_counts[setor_origem] += 1
+        frame = await suggestion_snapshot.frame()
+        
+        # Date bounds are local-time days; created_at holds UTC epoch nanoseconds
+        # (date_to is inclusive: everything before the next local midnight)
+        date_from_ns = local_day_bounds(date_from)[0] if date_from else None
+        date_to_ns = local_day_bounds(date_to)[1] if date_to else None
+        
+        # Apply filters as one boolean mask; suggestions without created_at pass the date filters
+        created_at = frame['created_at'].to_numpy()
+        has_date = created_at != MISSING_TIME
+        mask = np.ones(len(frame), dtype=bool)
+        if date_from_ns is not None:
+            mask &= ~has_date | (created_at >= date_from_ns)
+        if date_to_ns is not None:
+            mask &= ~has_date | (created_at < date_to_ns)
+        
+        # Sector filtering
+        if setor:
+            mask &= ((frame['setor_origem'] == setor) | (frame['setor_destino'] == setor)).to_numpy()
+        
+        # Non-admin users see only their department's data
+        if current_user['tipo_usuario'] != 'admin':
+            user_setor = current_user.get('setor', '')
+            mask &= ((frame['setor_origem'] == user_setor) | (frame['setor_destino'] == user_setor)).to_numpy()
+        
+        filtered = frame[mask]
         
         summary = {
-            "total_suggestions": total_suggestions,
-            "status_breakdown": dict(status_counts),
-            "priority_breakdown": dict(priority_counts),
-            "sector_breakdown": dict(setor_counts),
+            "total_suggestions": len(filtered),
+            "status_breakdown": breakdown(filtered['status'], 'unknown'),
+            "priority_breakdown": breakdown(filtered['prioridade'], 'unknown'),
+            "sector_breakdown": breakdown(filtered['setor_origem'], 'Unknown'),
             "date_range": {
                 "from": date_from,
                 "to": date_to
@@ -223,45 +147,29 @@ async def get_top_contributors(
     Get top contributors (users with most suggestions) - Firebase implementation
     """
     try:
-        # Get all suggestions
-        suggestions_result = firebase_manager.query_collection("sugestoes")
-        if not suggestions_result['success']:
-            raise HTTPException(status_code=500, detail="Error fetching suggestions")
+        frame = await suggestion_snapshot.frame()
         
-        suggestions = suggestions_result.get('data', [])
+        # Apply date filter if provided
+        if date_from:
+            date_from_ns = local_day_bounds(date_from)[0]
+            frame = frame[(frame['created_at'] >= date_from_ns).to_numpy()]
         
-        # Get all users
-        users_result = firebase_manager.query_collection("usuarios")
+        # Count suggestions per user (value_counts drops a missing usuario_id)
+        user_counts = frame['usuario_id'].value_counts()
+        user_counts = user_counts[(user_counts > 0) & (user_counts.index != '')]
+        
+        # Sort by count and limit before joining, so only the top users are read
+        top_counts = [(user_id, int(count)) for user_id, count in user_counts.head(limit).items()]
+        
+        users_result = await async_firebase_manager.get_documents("usuarios", [user_id for user_id, _ in top_counts])
         if not users_result['success']:
             raise HTTPException(status_code=500, detail="Error fetching users")
         
-        users = users_result.get('data', [])
-        user_map = {user.get('id'): user for user in users}
-        
-        # Apply date filter if provided
-        if date_from:
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-            filtered_suggestions = []
-            
-            for suggestion in suggestions:
-                created_at = suggestion.get('created_at')
-                if created_at:
-                    if hasattr(created_at, 'timestamp'):
-                        created_at = datetime.fromtimestamp(created_at.timestamp())
-                    if created_at >= date_from_obj:
-                        filtered_suggestions.append(suggestion)
-            suggestions = filtered_suggestions
-        
-        # Count suggestions per user
-        user_counts = defaultdict(int)
-        for suggestion in suggestions:
-            user_id = suggestion.get('usuario_id')
-            if user_id:
-                user_counts[user_id] += 1
+        user_map = users_result['data']
         
         # Build contributors list
         contributors = []
-        for user_id, count in user_counts.items():
+        for user_id, count in top_counts:
             user_data = user_map.get(user_id, {})
             contributors.append({
                 "user_id": user_id,
@@ -270,10 +178,6 @@ async def get_top_contributors(
                 "suggestions_count": count
             })
         
-        # Sort by count and limit
-        contributors.sort(key=lambda x: x['suggestions_count'], reverse=True)
-        contributors = contributors[:limit]
-        
         return {
             "contributors": contributors,
             "total_contributors": len(user_counts),
@@ -292,60 +196,30 @@ async def get_user_activity(
     Get user activity statistics - Firebase implementation
     """
     try:
-        date_from = datetime.now() - timedelta(days=days)
+        date_from = datetime.now(timezone.utc) - timedelta(days=days)
         
         # Get all users
-        users_result = firebase_manager.query_collection("usuarios")
+        users_result = await async_firebase_manager.query_collection("usuarios", select=["created_at"])
         if not users_result['success']:
             raise HTTPException(status_code=500, detail="Error fetching users")
         
         users = users_result.get('data', [])
+        frame = await suggestion_snapshot.frame()
+        date_from_ns = epoch_ns(date_from)
         
-        # Get all suggestions
-        suggestions_result = firebase_manager.query_collection("sugestoes")
-        if not suggestions_result['success']:
-            raise HTTPException(status_code=500, detail="Error fetching suggestions")
+        # Calculate user registration activity
+        user_created_at = epoch_column([user.get('created_at') for user in users])
+        registration_activity = day_counts(user_created_at[user_created_at >= date_from_ns])
         
-        suggestions = suggestions_result.get('data', [])
+        # Suggestion creation activity and department activity over the same rows
+        recent = frame[(frame['created_at'] >= date_from_ns).to_numpy()]
+        suggestion_activity = day_counts(recent['created_at'].to_numpy())
         
-        # Calculate user registration activity
-        registration_activity = defaultdict(int)
-        for user in users:
-            created_at = user.get('created_at')
-            if created_at:
-                if hasattr(created_at, 'timestamp'):
-                    created_at = datetime.fromtimestamp(created_at.timestamp())
-                if created_at >= date_from:
-                    date_key = created_at.strftime('%Y-%m-%d')
-                    registration_activity[date_key] += 1
-        
-        # Calculate suggestion creation activity
-        suggestion_activity = defaultdict(int)
-        for suggestion in suggestions:
-            created_at = suggestion.get('created_at')
-            if created_at:
-                if hasattr(created_at, 'timestamp'):
-                    created_at = datetime.fromtimestamp(created_at.timestamp())
-                if created_at >= date_from:
-                    date_key = created_at.strftime('%Y-%m-%d')
-                    suggestion_activity[date_key] += 1
-        
-        # Calculate department activity
-        dept_suggestions = defaultdict(int)
-        dept_users = defaultdict(set)
-        
-        # Count suggestions by department origin
-        for suggestion in suggestions:
-            created_at = suggestion.get('created_at')
-            if created_at:
-                if hasattr(created_at, 'timestamp'):
-                    created_at = datetime.fromtimestamp(created_at.timestamp())
-                if created_at >= date_from:
-                    setor = suggestion.get('setor_origem', 'Unknown')
-                    dept_suggestions[setor] += 1
-                    user_id = suggestion.get('usuario_id')
-                    if user_id:
-                        dept_users[setor].add(user_id)
+        # Count suggestions by department origin, and distinct (department, user) pairs
+        dept_suggestions = breakdown(recent['setor_origem'], 'Unknown')
+        has_user = (recent['usuario_id'].notna() & (recent['usuario_id'] != '')).to_numpy()
+        dept_pairs = recent.loc[has_user, ['setor_origem', 'usuario_id']].drop_duplicates()
+        dept_users = breakdown(dept_pairs['setor_origem'], 'Unknown')
         
         # Build department activity list
         department_activity = []
@@ -353,7 +227,7 @@ async def get_user_activity(
             department_activity.append({
                 "setor": setor,
                 "suggestions_count": suggestion_count,
-                "active_users": len(dept_users[setor])
+                "active_users": dept_users.get(setor, 0)
             })
         
         department_activity.sort(key=lambda x: x['suggestions_count'], reverse=True)
@@ -362,11 +236,11 @@ async def get_user_activity(
             "period_days": days,
             "registration_activity": [
                 {"date": date, "new_users": count}
-                for date, count in sorted(registration_activity.items())
+                for date, count in registration_activity
             ],
             "suggestion_activity": [
                 {"date": date, "new_suggestions": count}
-                for date, count in sorted(suggestion_activity.items())
+                for date, count in suggestion_activity
             ],
             "department_activity": department_activity
         }
@@ -374,6 +248,38 @@ async def get_user_activity(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/query")
+async def run_report_query(
+    spec: ReportQuery,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Evaluate a declarative report spec over the suggestions snapshot
+    
+    See backend/services/report_query.py for the spec format. Non-admin
+    users only see their own sector's suggestions.
+    """
+    try:
+        normalized = spec.model_dump()
+        try:
+            plan = compile_query(normalized)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        frame = await suggestion_snapshot.frame()
+        visible_setor = None if current_user['tipo_usuario'] == 'admin' else current_user.get('setor', '')
+        try:
+            result = plan.run(frame, visible_setor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return {"spec": normalized, **result}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/export-data")
 async def export_data(
     format: str = Query("json", regex="^(json)$"),
@@ -382,7 +288,8 @@ async def export_data(
 ):
     """
     Export data in JSON format - Firebase implementation
-    Note: Only JSON export is supported with Firebase
+    Note: Only JSON export is supported with Firebase. The body is streamed,
+    so "count" comes after "data".
     """
     # Check permissions for sensitive data
     if table == "usuarios" and current_user['tipo_usuario'] != 'admin':
@@ -391,31 +298,24 @@ async def export_data(
             detail="Admin access required for user data export"
         )
     
-    try:
-        # Get data from Firebase
-        result = firebase_manager.query_collection(table)
-        
-        if not result['success']:
-            raise HTTPException(status_code=500, detail="Database error")
-        
-        data = result.get('data', [])
-        
-        # Filter for non-admin users on suggestions
-        if current_user['tipo_usuario'] != 'admin' and table == "sugestoes":
-            data = [s for s in data if s.get('usuario_id') == current_user['id']]
-        
-        # Convert Firebase timestamps to ISO strings for JSON serialization
-        for item in data:
-            for key, value in item.items():
-                if hasattr(value, 'timestamp'):
-                    item[key] = datetime.fromtimestamp(value.timestamp()).isoformat()
+    if not async_firebase_manager.is_connected():
+        raise HTTPException(status_code=500, detail="Database error")
+    
+    # Non-admin users only export their own suggestions
+    filters = None
+    if current_user['tipo_usuario'] != 'admin' and table == "sugestoes":
+        filters = [("usuario_id", "==", current_user['id'])]
+    
+    async def stream_export():
+        # Documents are streamed page by page, so memory stays flat whatever the table size
+        yield f'{{"table": {json.dumps(table)}, "exported_at": {json.dumps(datetime.now().isoformat())}, "data": ['
         
-        return {
-            "table": table,
-            "count": len(data),
-            "data": data,
-            "exported_at": datetime.now().isoformat()
-        }
+        count = 0
+        async for item in async_firebase_manager.iter_collection(table, filters):
+            # Timestamps come back as aware datetimes; serialise them as ISO strings
+            yield ("," if count else "") + json.dumps(item, ensure_ascii=False, default=_json_default)
+            count += 1
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        yield f'], "count": {count}}}'
+    
+    return StreamingResponse(stream_export(), media_type="application/json")
@@ -10,12 +10,23 @@ from backend.models.schemas import (
 )
 from backend.api.auth import get_current_user, get_admin_user
 from backend.services.auth_service import auth_service
-from backend.database.firebase_connection import firebase_manager
-from datetime import datetime
+from backend.database.async_firebase_connection import async_firebase_manager
+from backend.services.dashboard_stats import dashboard_counters
+from backend.database.cursors import encode_cursor, decode_cursor
+from datetime import datetime, timezone
+import asyncio
 import uuid
 
 router = APIRouter()
 
+async def fetch_author_names(suggestions: list) -> dict:
+    """Map usuario_id -> author name for a list of suggestions with one batched read"""
+    user_ids = [suggestion.get('usuario_id', '') for suggestion in suggestions]
+    users_result = await async_firebase_manager.get_documents("usuarios", user_ids)
+    if not users_result['success']:
+        return {}
+    return {user_id: user.get('nome', 'Unknown') for user_id, user in users_result['data'].items()}
+
 @router.get("/", response_model=SuggestionList)
 async def list_suggestions(
     page: int = Query(1, ge=1),
@@ -23,10 +34,15 @@ async def list_suggestions(
     status: Optional[str] = Query(None),
     setor: Optional[str] = Query(None),
     autor: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
     current_user: dict = Depends(get_current_user)
 ):
     """
     List suggestions with filters - Firebase implementation
+    
+    The first page and every `cursor` (the `next_cursor` of a previous
+    response) are read with a keyset query of one page; other `page` numbers,
+    and the in-memory `autor` filter, read every match.
     """
     try:
         # Build Firebase query filters
@@ -45,48 +61,66 @@ async def list_suggestions(
             # For now, we'll filter by setor_origem
             filters.append(("setor_origem", "==", setor))
         
-        # Get all suggestions with filters
-        result = firebase_manager.query_collection("sugestoes", filters=filters, order_by="created_at")
-        
-        if not result['success']:
-            raise HTTPException(status_code=500, detail="Database error")
-        
-        suggestions_data = result.get('data', [])
-          # Additional filtering for autor (name search) - done in memory since Firestore doesn't support LIKE
-        if autor:
-            filtered_suggestions = []
-            for suggestion in suggestions_data:
-                # Get user data to check name
-                user_result = firebase_manager.get_document("usuarios", suggestion.get('usuario_id', ''))
-                if user_result['success'] and user_result.get('data'):
-                    user_data = user_result['data']
-                    if autor.lower() in user_data.get('nome', '').lower():
-                        suggestion['autor_nome'] = user_data.get('nome', 'Unknown')
-                        filtered_suggestions.append(suggestion)
-            suggestions_data = filtered_suggestions
+        if (cursor or page == 1) and not autor:
+            # Keyset pagination: read just this page, plus one row to detect a next page
+            try:
+                start_after = decode_cursor(cursor, "created_at") if cursor else None
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            
+            # The total comes from a server-side count run alongside the page read
+            result, count_result = await asyncio.gather(
+                async_firebase_manager.query_collection(
+                    "sugestoes", filters=filters, order_by="created_at",
+                    limit=per_page + 1, start_after=start_after
+                ),
+                async_firebase_manager.aggregate("sugestoes", filters)
+            )
+            
+            if not result['success']:
+                raise HTTPException(status_code=500, detail="Database error")
+            
+            paginated_suggestions = result['data'][:per_page]
+            has_more = len(result['data']) > per_page
+            total = count_result['data']['count'] if count_result['success'] else None
         else:
-            # Add author names to all suggestions
-            for suggestion in suggestions_data:
-                user_result = firebase_manager.get_document("usuarios", suggestion.get('usuario_id', ''))
-                if user_result['success'] and user_result.get('data'):
-                    suggestion['autor_nome'] = user_result['data'].get('nome', 'Unknown')
-                else:
-                    suggestion['autor_nome'] = 'Unknown'
-        
-        # Manual pagination since Firestore pagination is more complex
-        total = len(suggestions_data)
-        offset = (page - 1) * per_page
-        paginated_suggestions = suggestions_data[offset:offset + per_page]
+            # Get all suggestions with filters
+            result = await async_firebase_manager.query_collection("sugestoes", filters=filters, order_by="created_at")
+            
+            if not result['success']:
+                raise HTTPException(status_code=500, detail="Database error")
+            
+            suggestions_data = result.get('data', [])
+            
+            # Additional filtering for autor (name search) - done in memory since Firestore doesn't support LIKE
+            if autor:
+                author_names = await fetch_author_names(suggestions_data)
+                autor_lower = autor.lower()
+                suggestions_data = [
+                    suggestion for suggestion in suggestions_data
+                    if autor_lower in author_names.get(suggestion.get('usuario_id'), '').lower()
+                ]
+            
+            # Manual pagination
+            total = len(suggestions_data)
+            offset = (page - 1) * per_page
+            paginated_suggestions = suggestions_data[offset:offset + per_page]
+            has_more = offset + per_page < total
+        
+        # Cursor continuation is only possible without in-memory author filtering
+        next_cursor = None
+        if has_more and not autor and paginated_suggestions:
+            next_cursor = encode_cursor(paginated_suggestions[-1], "created_at")
+        
+        # Author names only for the page being returned, in one batched read
+        if not autor:
+            author_names = await fetch_author_names(paginated_suggestions)
+        for suggestion in paginated_suggestions:
+            suggestion['autor_nome'] = author_names.get(suggestion.get('usuario_id'), 'Unknown')
         
         # Convert to response models
         suggestions = []
         for suggestion_data in paginated_suggestions:
-            # Convert Firebase timestamp to datetime if needed
-            if 'created_at' in suggestion_data and hasattr(suggestion_data['created_at'], 'timestamp'):
-                suggestion_data['created_at'] = datetime.fromtimestamp(suggestion_data['created_at'].timestamp())
-            if 'updated_at' in suggestion_data and hasattr(suggestion_data['updated_at'], 'timestamp'):
-                suggestion_data['updated_at'] = datetime.fromtimestamp(suggestion_data['updated_at'].timestamp())
-            
             # Ensure we have all required fields with defaults
             suggestion_data.setdefault('observacoes', None)
             suggestion_data.setdefault('updated_at', None)
@@ -97,9 +131,12 @@ async def list_suggestions(
             suggestions=suggestions,
             total=total,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            next_cursor=next_cursor
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -122,29 +159,27 @@ async def create_suggestion(
             "status": "pendente",  # Default status
             "usuario_id": current_user['id'],
             "observacoes": None,
-            "created_at": datetime.now(),
-            "updated_at": datetime.now()
+            "created_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc)
         }
         
         # Create suggestion in Firebase
-        result = firebase_manager.create_document("sugestoes", suggestion_doc)
+        result = await async_firebase_manager.create_document("sugestoes", suggestion_doc)
         
         if not result['success']:
             raise HTTPException(status_code=500, detail="Failed to create suggestion")
         
+        await dashboard_counters.record_suggestion(None, suggestion_doc)
+        
         # Get the created suggestion with author name
         suggestion_id = result['id']
         suggestion_doc['id'] = suggestion_id
         
-        # Get author name
-        user_result = firebase_manager.get_document("usuarios", current_user['id'])
-        if user_result['success'] and user_result.get('data'):
-            suggestion_doc['autor_nome'] = user_result['data'].get('nome', 'Unknown')
-        else:
-            suggestion_doc['autor_nome'] = 'Unknown'
+        # The author is the authenticated user, whose profile is already loaded
+        suggestion_doc['autor_nome'] = current_user.get('nome', 'Unknown')
         
         # Log action
-        auth_service.log_user_action(
+        await auth_service.log_user_action(
             current_user['id'],
             "CREATE_SUGGESTION",
             f"Created suggestion: {suggestion_data.titulo}"
@@ -167,7 +202,7 @@ async def get_suggestion(
     """
     try:
         # Get suggestion from Firebase
-        result = firebase_manager.get_document("sugestoes", suggestion_id)
+        result = await async_firebase_manager.get_document("sugestoes", suggestion_id)
         
         if not result['success'] or not result.get('data'):
             raise HTTPException(status_code=404, detail="Suggestion not found")
@@ -183,17 +218,8 @@ async def get_suggestion(
             )
         
         # Get author name
-        user_result = firebase_manager.get_document("usuarios", suggestion.get('usuario_id', ''))
-        if user_result['success'] and user_result.get('data'):
-            suggestion['autor_nome'] = user_result['data'].get('nome', 'Unknown')
-        else:
-            suggestion['autor_nome'] = 'Unknown'
-        
-        # Convert Firebase timestamp to datetime if needed
-        if 'created_at' in suggestion and hasattr(suggestion['created_at'], 'timestamp'):
-            suggestion['created_at'] = datetime.fromtimestamp(suggestion['created_at'].timestamp())
-        if 'updated_at' in suggestion and hasattr(suggestion['updated_at'], 'timestamp'):
-            suggestion['updated_at'] = datetime.fromtimestamp(suggestion['updated_at'].timestamp())
+        author_names = await fetch_author_names([suggestion])
+        suggestion['autor_nome'] = author_names.get(suggestion.get('usuario_id'), 'Unknown')
         
         # Ensure required fields
         suggestion.setdefault('observacoes', None)
@@ -219,31 +245,8 @@ async def update_suggestion(
     Update suggestion - Firebase implementation
     """
     try:
-        # Get current suggestion
-        current_result = firebase_manager.get_document("sugestoes", suggestion_id)
-        
-        if not current_result['success'] or not current_result.get('data'):
-            raise HTTPException(status_code=404, detail="Suggestion not found")
-        
-        current_suggestion = current_result['data']
-        
-        # Check permission
-        is_author = current_suggestion.get('usuario_id') == current_user['id']
         is_admin = current_user['tipo_usuario'] == 'admin'
         
-        if not (is_author or is_admin):
-            raise HTTPException(
-                status_code=403,
-                detail="Not authorized to update this suggestion"
-            )
-        
-        # Authors can only edit their own pending suggestions
-        if is_author and not is_admin and current_suggestion.get('status') != 'pendente':
-            raise HTTPException(
-                status_code=403,
-                detail="Can only edit pending suggestions"
-            )
-        
         # Build update data
         update_data = {}
         
@@ -271,40 +274,52 @@ async def update_suggestion(
             raise HTTPException(status_code=400, detail="No valid fields to update")
         
         # Update timestamp
-        update_data['updated_at'] = datetime.now()
+        update_data['updated_at'] = datetime.now(timezone.utc)
         
-        # Update in Firebase
-        result = firebase_manager.update_document("sugestoes", suggestion_id, update_data)
+        previous = {}
+        
+        def check_permission(current_suggestion):
+            """Checked on the suggestion as read inside the update transaction"""
+            # Keep the version being replaced for the dashboard counters
+            previous.clear()
+            previous.update(current_suggestion)
+            
+            is_author = current_suggestion.get('usuario_id') == current_user['id']
+            
+            if not (is_author or is_admin):
+                return "Not authorized to update this suggestion"
+            
+            # Authors can only edit their own pending suggestions
+            if is_author and not is_admin and current_suggestion.get('status') != 'pendente':
+                return "Can only edit pending suggestions"
+            
+            return None
+        
+        # Read, check and update in one transaction; the merged document comes back
+        result = await async_firebase_manager.update_and_get(
+            "sugestoes", suggestion_id, update_data, precondition=check_permission
+        )
         
         if not result['success']:
+            if result.get('code') == 'not_found':
+                raise HTTPException(status_code=404, detail="Suggestion not found")
+            if result.get('code') == 'precondition_failed':
+                raise HTTPException(status_code=403, detail=result['error'])
             raise HTTPException(status_code=500, detail="Failed to update suggestion")
         
-        # Get updated suggestion
-        updated_result = firebase_manager.get_document("sugestoes", suggestion_id)
-        if not updated_result['success'] or not updated_result.get('data'):
-            raise HTTPException(status_code=500, detail="Failed to retrieve updated suggestion")
-        
-        updated_suggestion = updated_result['data']
+        updated_suggestion = result['data']
+        await dashboard_counters.record_suggestion(previous, updated_suggestion)
         
         # Get author name
-        user_result = firebase_manager.get_document("usuarios", updated_suggestion.get('usuario_id', ''))
-        if user_result['success'] and user_result.get('data'):
-            updated_suggestion['autor_nome'] = user_result['data'].get('nome', 'Unknown')
-        else:
-            updated_suggestion['autor_nome'] = 'Unknown'
-        
-        # Convert Firebase timestamp to datetime if needed
-        if 'created_at' in updated_suggestion and hasattr(updated_suggestion['created_at'], 'timestamp'):
-            updated_suggestion['created_at'] = datetime.fromtimestamp(updated_suggestion['created_at'].timestamp())
-        if 'updated_at' in updated_suggestion and hasattr(updated_suggestion['updated_at'], 'timestamp'):
-            updated_suggestion['updated_at'] = datetime.fromtimestamp(updated_suggestion['updated_at'].timestamp())
+        author_names = await fetch_author_names([updated_suggestion])
+        updated_suggestion['autor_nome'] = author_names.get(updated_suggestion.get('usuario_id'), 'Unknown')
         
         # Ensure required fields
         updated_suggestion.setdefault('observacoes', None)
         updated_suggestion.setdefault('updated_at', None)
         
         # Log action
-        auth_service.log_user_action(
+        await auth_service.log_user_action(
             current_user['id'],
             "UPDATE_SUGGESTION",
             f"Updated suggestion: {updated_suggestion.get('titulo', suggestion_id)}"
@@ -349,7 +364,7 @@ async def update_suggestion(
             raise HTTPException(status_code=500, detail="Failed to retrieve updated suggestion")
         
         # Log action
-        auth_service.log_user_action(
+        await auth_service.log_user_action(
             current_user['id'],
             "UPDATE_SUGGESTION",
             f"Updated suggestion ID: {suggestion_id}"
@@ -372,7 +387,7 @@ async def delete_suggestion(
     """
     try:
         # Get current suggestion
-        result = firebase_manager.get_document("sugestoes", suggestion_id)
+        result = await async_firebase_manager.get_document("sugestoes", suggestion_id)
         
         if not result['success'] or not result.get('data'):
             raise HTTPException(status_code=404, detail="Suggestion not found")
@@ -389,12 +404,14 @@ async def delete_suggestion(
                 detail="Not authorized to delete this suggestion"
             )
           # Delete suggestion from Firebase
-        delete_result = firebase_manager.delete_document("sugestoes", suggestion_id)
+        delete_result = await async_firebase_manager.delete_document("sugestoes", suggestion_id)
         
         if not delete_result['success']:
             raise HTTPException(status_code=500, detail="Failed to delete suggestion")
+        
+        await dashboard_counters.record_suggestion(suggestion, None)
           # Log action
-        auth_service.log_user_action(
+        await auth_service.log_user_action(
             current_user['id'],
             "DELETE_SUGGESTION",
             f"Deleted suggestion: {suggestion.get('titulo', 'Unknown')} (ID: {suggestion_id})"
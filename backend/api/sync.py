@@ -5,6 +5,7 @@ API endpoints para sincronização Google Forms
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from typing import Dict, Any
 from datetime import datetime
+import asyncio
 
 from backend.services.google_forms_sync import google_forms_sync
 from backend.api.auth import get_current_user, require_admin
@@ -21,7 +22,8 @@ async def sync_google_forms_manual(
     Requer privilégios de admin
     """
     try:
-        result = google_forms_sync.sync_now()
+        # Sheets + Firestore calls are blocking; keep them off the event loop
+        result = await asyncio.to_thread(google_forms_sync.sync_now)
         
         return BaseResponse(
             success=result["success"],
@@ -95,7 +97,7 @@ async def test_google_forms_connection(
             )
         
         # Testar busca de dados
-        responses = google_forms_sync.fetch_new_responses()
+        responses = await asyncio.to_thread(google_forms_sync.fetch_new_responses)
         
         return BaseResponse(
             success=True,
@@ -133,7 +135,7 @@ async def configure_google_forms_sync(
                 )
         
         # Atualizar configurações (você pode salvar no Firebase ou arquivo)
-        from backend.database.firebase_connection import firebase_manager
+        from backend.database.async_firebase_connection import async_firebase_manager
         
         config_updates = {
             "google_sheets_id": config_data["google_sheets_id"],
@@ -144,7 +146,7 @@ async def configure_google_forms_sync(
         }
         
         # Salvar configuração no Firebase
-        result = firebase_manager.create_document("configuracoes_sync", config_updates)
+        result = await async_firebase_manager.create_document("configuracoes_sync", config_updates)
         
         if result["success"]:
             return BaseResponse(
@@ -174,7 +176,7 @@ async def preview_google_forms_data(
     Visualizar dados que seriam importados (sem salvar)
     """
     try:
-        responses = google_forms_sync.fetch_new_responses()
+        responses = await asyncio.to_thread(google_forms_sync.fetch_new_responses)
         
         if not responses:
             return BaseResponse(
@@ -3,25 +3,61 @@ System API endpoints - Firebase Firestore implementation
 """
 
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import JSONResponse
 from typing import Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from backend.models.schemas import SystemHealth, LogList, LogEntry, BaseResponse
 from backend.api.auth import get_current_user, get_admin_user
-from backend.services.auth_service import auth_service
-from backend.database.firebase_connection import firebase_manager
+from backend.services.auth_service import auth_service, token_cache
+from backend.services.audit_log import audit_log
+from backend.services.password_hasher import password_hasher
+from backend.services.principal_cache import principal_cache
+from backend.services.suggestion_snapshot import suggestion_snapshot
+from backend.services.report_query import plan_cache
+from backend.services.token_versions import token_versions
+from backend.database.async_firebase_connection import async_firebase_manager
+from backend.database.cursors import encode_cursor, decode_cursor
+from backend.database.firebase_connection import BATCH_WRITE_LIMIT
+from backend.database.resilience import firestore_guard
+from backend.database.query_cache import query_cache
+from backend.database.query_stats import query_recorder, firestore_indexes
+from backend.services.replica import replica_manager
 from backend.core.config import settings
 from collections import defaultdict
+import asyncio
 
 router = APIRouter()
 
+# Sort key for logs without a timestamp
+EARLIEST = datetime.min.replace(tzinfo=timezone.utc)
+
 @router.get("/health", response_model=SystemHealth)
 async def health_check():
     """
     System health check - Firebase implementation with Google Forms sync status
+    (503 until the startup warm-up has succeeded)
     """
+    if async_firebase_manager.warm_up_error:
+        return JSONResponse(status_code=503, content={
+            "status": "error",
+            "version": "2.0.0",
+            "database": "error",
+            "uptime": "Running",
+            "message": f"Warm-up failed: {async_firebase_manager.warm_up_error}"
+        })
+    
+    if not async_firebase_manager.ready:
+        return JSONResponse(status_code=503, content={
+            "status": "starting",
+            "version": "2.0.0",
+            "database": "warming_up",
+            "uptime": "Starting",
+            "message": "Warm-up in progress, not ready"
+        })
+    
     try:
         # Test Firebase connection
-        db_status = "ok" if firebase_manager.is_connected() else "error"
+        db_status = "ok" if async_firebase_manager.is_connected() else "error"
         
         # Calculate uptime (simplified)
         uptime = "Running"
@@ -44,15 +80,20 @@ async def health_check():
         
         # Additional Firebase status info
         status_message = "Sistema de Gestão de Sugestões API"
-        if firebase_manager.is_demo_mode:
+        if async_firebase_manager.is_demo_mode:
             status_message += " (Demo Mode - Firebase)"
+            database = "Firebase Firestore (Demo)"
+        elif async_firebase_manager.is_local_backend:
+            status_message += " (SQLite)"
+            database = f"SQLite ({settings.SQLITE_DATABASE_PATH})"
         else:
             status_message += " (Firebase Firestore)"
+            database = "Firebase Firestore (Connected)"
         
         return SystemHealth(
             status="ok" if db_status == "ok" else "error",
             version="2.0.0",
-            database=f"Firebase Firestore ({('Demo' if firebase_manager.is_demo_mode else 'Connected')})",
+            database=database,
             uptime=uptime,
             message=status_message,
             google_forms_sync=google_forms_status
@@ -76,66 +117,62 @@ async def get_system_logs(
     user_id: Optional[str] = Query(None),
     date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
     current_user: dict = Depends(get_admin_user)
 ):
     """
     Get system logs (admin only) - Firebase implementation
+    
+    The first page and every `cursor` (the `next_cursor` of a previous
+    response) are read with a keyset query of one page; other `page` numbers,
+    and the in-memory `action` filter, read every log.
     """
     try:
-        # Get all logs from Firebase
-        logs_result = firebase_manager.query_collection("logs", order_by="created_at")
-        
-        if not logs_result['success']:
-            raise HTTPException(status_code=500, detail="Database error")
-        
-        logs_data = logs_result.get('data', [])
-        
-        # Apply filters
-        filtered_logs = []
-        
-        for log in logs_data:
-            # Action filter
-            if action and action.lower() not in log.get('action', '').lower():
-                continue
+        if (cursor or page == 1) and not action:
+            # Keyset pagination: user/date filters are pushed into the query,
+            # newest first, reading just this page plus one row
+            try:
+                start_after = decode_cursor(cursor, "created_at") if cursor else None
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             
-            # User ID filter
-            if user_id and log.get('user_id') != user_id:
-                continue
+            filters = []
+            if user_id:
+                filters.append(("user_id", "==", user_id))
+            if date_from:
+                filters.append(("created_at", ">=", datetime.strptime(date_from, '%Y-%m-%d').astimezone()))
+            if date_to:
+                filters.append(("created_at", "<", (datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)).astimezone()))
             
-            # Date filters
-            created_at = log.get('created_at')
-            if created_at:
-                # Handle both datetime objects and Firebase timestamps
-                if hasattr(created_at, 'timestamp'):
-                    created_at = datetime.fromtimestamp(created_at.timestamp())
-                
-                if date_from:
-                    date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-                    if created_at < date_from_obj:
-                        continue
-                
-                if date_to:
-                    date_to_obj = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
-                    if created_at >= date_to_obj:
-                        continue
+            # The total comes from a server-side count run alongside the page read
+            logs_result, count_result = await asyncio.gather(
+                async_firebase_manager.query_collection(
+                    "logs", filters=filters, order_by="created_at", descending=True,
+                    limit=per_page + 1, start_after=start_after
+                ),
+                async_firebase_manager.aggregate("logs", filters)
+            )
             
-            filtered_logs.append(log)
-        
-        # Sort by created_at descending
-        filtered_logs.sort(key=lambda x: x.get('created_at', datetime.min), reverse=True)
+            if not logs_result['success']:
+                raise HTTPException(status_code=500, detail="Database error")
+            
+            paginated_logs = logs_result['data'][:per_page]
+            has_more = len(logs_result['data']) > per_page
+            total = count_result['data']['count'] if count_result['success'] else None
+        else:
+            paginated_logs, total, has_more = await _filter_logs_in_memory(
+                page, per_page, action, user_id, date_from, date_to
+            )
         
-        # Manual pagination
-        total = len(filtered_logs)
-        offset = (page - 1) * per_page
-        paginated_logs = filtered_logs[offset:offset + per_page]
+        # Cursor continuation is only possible without the in-memory action filter
+        next_cursor = None
+        if has_more and not action and paginated_logs:
+            next_cursor = encode_cursor(paginated_logs[-1], "created_at")
         
         # Convert to response models
         logs = []
         for log_data in paginated_logs:
-            # Convert Firebase timestamp to datetime if needed
-            if 'created_at' in log_data and hasattr(log_data['created_at'], 'timestamp'):
-                log_data['created_at'] = datetime.fromtimestamp(log_data['created_at'].timestamp())
-              # Ensure required fields with defaults
+            # Ensure required fields with defaults
             log_data.setdefault('user_id', None)
             log_data.setdefault('ip_address', None)
             log_data.setdefault('user_agent', None)
@@ -146,12 +183,61 @@ async def get_system_logs(
             logs=logs,
             total=total,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            next_cursor=next_cursor
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _filter_logs_in_memory(page: int, per_page: int, action: Optional[str], user_id: Optional[str],
+                                 date_from: Optional[str], date_to: Optional[str]):
+    """Page-number path for get_system_logs: reads every log and filters in Python"""
+    # Get all logs from Firebase
+    logs_result = await async_firebase_manager.query_collection("logs", order_by="created_at")
+    
+    if not logs_result['success']:
+        raise HTTPException(status_code=500, detail="Database error")
+    
+    logs_data = logs_result.get('data', [])
+    
+    # Date bounds are local-time days; stored timestamps are aware UTC datetimes
+    date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').astimezone() if date_from else None
+    date_to_obj = (datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)).astimezone() if date_to else None
+    
+    # Apply filters
+    filtered_logs = []
+    
+    for log in logs_data:
+        # Action filter
+        if action and action.lower() not in log.get('action', '').lower():
+            continue
+        
+        # User ID filter
+        if user_id and log.get('user_id') != user_id:
+            continue
+        
+        # Date filters
+        created_at = log.get('created_at')
+        if created_at:
+            if date_from_obj and created_at < date_from_obj:
+                continue
+            
+            if date_to_obj and created_at >= date_to_obj:
+                continue
+        
+        filtered_logs.append(log)
+    
+    # Sort by created_at descending (ties on ID, matching the keyset query order)
+    filtered_logs.sort(key=lambda x: (x.get('created_at') or EARLIEST, x.get('id', '')), reverse=True)
+    
+    # Manual pagination
+    total = len(filtered_logs)
+    offset = (page - 1) * per_page
+    return filtered_logs[offset:offset + per_page], total, offset + per_page < total
+
 @router.get("/stats")
 async def get_system_stats(
     current_user: dict = Depends(get_admin_user)
@@ -160,34 +246,99 @@ async def get_system_stats(
     Get detailed system statistics (admin only) - Firebase implementation
     """
     try:
-        # Get basic Firebase collection stats
-        collections_stats = []
+        # Server-side count aggregations, run concurrently: O(1) reads per collection
+        collections = ["sugestoes", "usuarios", "logs"]
+        counts = await asyncio.gather(*(
+            async_firebase_manager.aggregate(collection) for collection in collections
+        ))
         
-        # Check suggestions collection
-        suggestions_result = firebase_manager.query_collection("sugestoes")
-        suggestions_count = len(suggestions_result.get('data', [])) if suggestions_result['success'] else 0
-        collections_stats.append({"collection": "sugestoes", "count": suggestions_count})
-        
-        # Check users collection
-        users_result = firebase_manager.query_collection("usuarios")
-        users_count = len(users_result.get('data', [])) if users_result['success'] else 0
-        collections_stats.append({"collection": "usuarios", "count": users_count})
-        
-        # Check logs collection
-        logs_result = firebase_manager.query_collection("logs")
-        logs_count = len(logs_result.get('data', [])) if logs_result['success'] else 0
-        collections_stats.append({"collection": "logs", "count": logs_count})
+        collections_stats = [
+            {"collection": collection, "count": result['data']['count'] if result['success'] else 0}
+            for collection, result in zip(collections, counts)
+        ]
         
         return {
             "database_stats": collections_stats,
-            "database_type": "Firebase Firestore",
-            "demo_mode": firebase_manager.is_demo_mode,
+            "database_type": "SQLite" if async_firebase_manager.is_local_backend and not async_firebase_manager.is_demo_mode else "Firebase Firestore",
+            "demo_mode": async_firebase_manager.is_demo_mode,
             "generated_at": datetime.now().isoformat()
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/replicas")
+async def get_replica_stats(
+    current_user: dict = Depends(get_admin_user)
+):
+    """
+    Live replica status and staleness (admin only)
+    """
+    return {
+        "enabled": settings.REPLICA_ENABLED,
+        "replicas": replica_manager.stats(),
+        "generated_at": datetime.now().isoformat()
+    }
+
+@router.get("/firestore")
+async def get_firestore_call_stats(
+    current_user: dict = Depends(get_admin_user)
+):
+    """
+    Firestore circuit breaker state, in-flight RPCs, per-operation retry counts and audit-log queue (admin only)
+    """
+    return {
+        "guarded": not async_firebase_manager.is_local_backend,
+        **firestore_guard.stats(),
+        "audit_log": audit_log.stats(),
+        "generated_at": datetime.now().isoformat()
+    }
+
+@router.get("/password-hashing")
+async def get_password_hashing_stats(
+    current_user: dict = Depends(get_admin_user)
+):
+    """
+    Password hashing algorithm, cost, worker pool queue depth and hash upgrades (admin only)
+    """
+    return {
+        **password_hasher.stats(),
+        "generated_at": datetime.now().isoformat()
+    }
+
+@router.get("/cache")
+async def get_query_cache_stats(
+    current_user: dict = Depends(get_admin_user)
+):
+    """
+    Query result, verified-token, principal, report snapshot and report plan cache sizes, TTLs and hit/miss counters (admin only)
+    """
+    return {
+        **query_cache.stats(),
+        "tokens": token_cache.stats(),
+        "principals": principal_cache.stats(),
+        "claims_only": {"enabled": settings.AUTH_CLAIMS_ONLY, **token_versions.stats()},
+        "suggestion_snapshot": suggestion_snapshot.stats(),
+        "report_plans": plan_cache.stats(),
+        "generated_at": datetime.now().isoformat()
+    }
+
+@router.get("/query-shapes")
+async def get_query_shapes(
+    current_user: dict = Depends(get_admin_user)
+):
+    """
+    Distinct query shapes with frequency, latency and the composite index each needs (admin only)
+    """
+    shapes = query_recorder.report()
+    return {
+        "enabled": query_recorder.enabled,
+        "shapes": shapes,
+        "dropped": query_recorder.dropped,
+        "firestore_indexes": firestore_indexes([entry['shape'] for entry in shapes]),
+        "generated_at": datetime.now().isoformat()
+    }
+
 @router.post("/backup", response_model=BaseResponse)
 async def create_backup(
     current_user: dict = Depends(get_admin_user)
@@ -197,7 +348,7 @@ async def create_backup(
     """
     try:
         # Log the backup action
-        auth_service.log_user_action(
+        await auth_service.log_user_action(
             current_user['id'],
             "BACKUP_REQUESTED",
             "Manual backup requested for Firebase data"
@@ -220,7 +371,7 @@ async def get_system_config(
     """
     try:
         # Get configuration from Firebase
-        config_result = firebase_manager.query_collection("configuracoes")
+        config_result = await async_firebase_manager.query_collection("configuracoes")
         
         if not config_result['success']:
             # Return default config
@@ -229,7 +380,7 @@ async def get_system_config(
                 "version": "2.0.0",
                 "environment": "Firebase",
                 "maintenance_mode": False,
-                "demo_mode": firebase_manager.is_demo_mode
+                "demo_mode": async_firebase_manager.is_demo_mode
             }
         
         # Convert to dictionary
@@ -238,7 +389,7 @@ async def get_system_config(
             "version": "2.0.0",
             "environment": "Firebase",
             "maintenance_mode": False,
-            "demo_mode": firebase_manager.is_demo_mode
+            "demo_mode": async_firebase_manager.is_demo_mode
         }
         
         for row in config_result.get('data', []):
@@ -271,15 +422,15 @@ async def update_system_config(
                 "valor": str(value),
                 "tipo": "texto",
                 "categoria": "geral",
-                "updated_at": datetime.now()
+                "updated_at": datetime.now(timezone.utc)
             }
             
-            result = firebase_manager.create_document("configuracoes", config_doc)
+            result = await async_firebase_manager.create_document("configuracoes", config_doc)
             if result['success']:
                 updated_count += 1
         
         # Log the configuration change
-        auth_service.log_user_action(
+        await auth_service.log_user_action(
             current_user['id'],
             "CONFIG_UPDATED",
             f"Updated {updated_count} configuration items"
@@ -302,40 +453,35 @@ async def cleanup_old_logs(
     Delete logs older than specified days (admin only) - Firebase implementation
     """
     try:
-        cutoff_date = datetime.now() - timedelta(days=days)
-        
-        # Get all logs
-        logs_result = firebase_manager.query_collection("logs")
-        if not logs_result['success']:
-            return BaseResponse(success=True, message="No logs found")
-        
-        logs_data = logs_result.get('data', [])
-        logs_to_delete = []
-        
-        # Find logs older than cutoff date
-        for log in logs_data:
-            created_at = log.get('created_at')
-            if created_at:
-                if hasattr(created_at, 'timestamp'):
-                    created_at = datetime.fromtimestamp(created_at.timestamp())
-                if created_at < cutoff_date:
-                    logs_to_delete.append(log.get('id'))
-        
-        if not logs_to_delete:
+        cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
+        
+        # Stream only the old logs' IDs and delete them one batch at a time,
+        # so memory stays flat however large the logs collection is
+        deleted_count = 0
+        pending_ids = []
+        
+        async for log in async_firebase_manager.iter_collection(
+            "logs", filters=[("created_at", "<", cutoff_date)], order_by="created_at",
+            batch_size=BATCH_WRITE_LIMIT, select=["created_at"]
+        ):
+            pending_ids.append(log['id'])
+            if len(pending_ids) >= BATCH_WRITE_LIMIT:
+                result = await async_firebase_manager.delete_documents("logs", pending_ids)
+                deleted_count += result.get('succeeded', 0)
+                pending_ids = []
+        
+        if pending_ids:
+            result = await async_firebase_manager.delete_documents("logs", pending_ids)
+            deleted_count += result.get('succeeded', 0)
+        
+        if not deleted_count:
             return BaseResponse(
                 success=True,
                 message="No old logs found to delete"
             )
         
-        # Delete old logs
-        deleted_count = 0
-        for log_id in logs_to_delete:
-            result = firebase_manager.delete_document("logs", log_id)
-            if result['success']:
-                deleted_count += 1
-        
         # Log the cleanup action
-        auth_service.log_user_action(
+        await auth_service.log_user_action(
             current_user['id'],
             "LOGS_CLEANUP",
             f"Deleted {deleted_count} logs older than {days} days"
@@ -10,8 +10,13 @@ from backend.models.schemas import (
 )
 from backend.api.auth import get_current_user, get_admin_user
 from backend.services.auth_service import auth_service
-from backend.database.firebase_connection import firebase_manager
-from datetime import datetime
+from backend.services.principal_cache import principal_cache
+from backend.services.dashboard_stats import dashboard_counters
+from backend.services.token_versions import token_versions
+from backend.database.async_firebase_connection import async_firebase_manager
+from backend.database.cursors import encode_cursor, decode_cursor
+from datetime import datetime, timezone
+import asyncio
 import uuid
 
 router = APIRouter()
@@ -23,16 +28,18 @@ async def list_users(
     search: Optional[str] = Query(None),
     setor: Optional[str] = Query(None),
     tipo_usuario: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
     current_user: dict = Depends(get_admin_user)
 ):
     """
     List all users (admin only) - Firebase implementation
     
-    - **page**: Page number (starts from 1)
+    - **page**: Page number (starts from 1); page 1 is a one-page keyset read, later pages read every match
     - **per_page**: Items per page (max 100)
     - **search**: Search in name or email
     - **setor**: Filter by department
     - **tipo_usuario**: Filter by user type (admin/user)
+    - **cursor**: `next_cursor` from a previous response; reads only one page
     """
     try:
         # Build Firebase query filters
@@ -44,37 +51,60 @@ async def list_users(
         if tipo_usuario:
             filters.append(("tipo_usuario", "==", tipo_usuario))
         
-        # Get all users with filters
-        result = firebase_manager.query_collection("usuarios", filters=filters, order_by="created_at")
-        
-        if not result['success']:
-            raise HTTPException(status_code=500, detail="Database error")
-        
-        users_data = result.get('data', [])
-        
-        # Additional filtering for search (name or email) - done in memory
-        if search:
-            search_lower = search.lower()
-            users_data = [
-                user for user in users_data
-                if (search_lower in user.get('nome', '').lower() or
-                    search_lower in user.get('email', '').lower())
-            ]
+        if (cursor or page == 1) and not search:
+            # Keyset pagination: read just this page, plus one row to detect a next page
+            try:
+                start_after = decode_cursor(cursor, "created_at") if cursor else None
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            
+            # The total comes from a server-side count run alongside the page read
+            result, count_result = await asyncio.gather(
+                async_firebase_manager.query_collection(
+                    "usuarios", filters=filters, order_by="created_at",
+                    limit=per_page + 1, start_after=start_after
+                ),
+                async_firebase_manager.aggregate("usuarios", filters)
+            )
+            
+            if not result['success']:
+                raise HTTPException(status_code=500, detail="Database error")
+            
+            paginated_users = result['data'][:per_page]
+            has_more = len(result['data']) > per_page
+            total = count_result['data']['count'] if count_result['success'] else None
+        else:
+            # Get all users with filters
+            result = await async_firebase_manager.query_collection("usuarios", filters=filters, order_by="created_at")
+            
+            if not result['success']:
+                raise HTTPException(status_code=500, detail="Database error")
+            
+            users_data = result.get('data', [])
+            
+            # Additional filtering for search (name or email) - done in memory
+            if search:
+                search_lower = search.lower()
+                users_data = [
+                    user for user in users_data
+                    if (search_lower in user.get('nome', '').lower() or
+                        search_lower in user.get('email', '').lower())
+                ]
+            
+            # Manual pagination
+            total = len(users_data)
+            offset = (page - 1) * per_page
+            paginated_users = users_data[offset:offset + per_page]
+            has_more = offset + per_page < total
         
-        # Manual pagination
-        total = len(users_data)
-        offset = (page - 1) * per_page
-        paginated_users = users_data[offset:offset + per_page]
+        # Cursor continuation is only possible without in-memory search filtering
+        next_cursor = None
+        if has_more and not search and paginated_users:
+            next_cursor = encode_cursor(paginated_users[-1], "created_at")
         
         # Convert to response models
         users = []
         for user_data in paginated_users:
-            # Convert Firebase timestamp to datetime if needed
-            if 'created_at' in user_data and hasattr(user_data['created_at'], 'timestamp'):
-                user_data['created_at'] = datetime.fromtimestamp(user_data['created_at'].timestamp())
-            if 'last_login' in user_data and hasattr(user_data['last_login'], 'timestamp'):
-                user_data['last_login'] = datetime.fromtimestamp(user_data['last_login'].timestamp())
-            
             # Ensure required fields with defaults
             user_data.setdefault('telefone', None)
             user_data.setdefault('cargo', None)
@@ -86,9 +116,12 @@ async def list_users(
             users=users,
             total=total,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            next_cursor=next_cursor
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -102,7 +135,7 @@ async def create_user(
     """
     try:
         # Check if email already exists
-        existing_users = firebase_manager.query_collection("usuarios", filters=[("email", "==", user_data.email)])
+        existing_users = await async_firebase_manager.query_collection("usuarios", filters=[("email", "==", user_data.email)])
         
         if existing_users['success'] and existing_users.get('data'):
             raise HTTPException(
@@ -111,7 +144,7 @@ async def create_user(
             )
         
         # Hash password
-        hashed_password = auth_service.hash_password(user_data.senha)
+        hashed_password = await auth_service.hash_password_async(user_data.senha)
         
         # Prepare user data
         user_doc = {
@@ -123,21 +156,23 @@ async def create_user(
             "cargo": user_data.cargo,
             "tipo_usuario": user_data.tipo_usuario,
             "ativo": user_data.ativo,
-            "created_at": datetime.now(),
+            "created_at": datetime.now(timezone.utc),
             "last_login": None
         }
         
         # Create user in Firebase
-        result = firebase_manager.create_document("usuarios", user_doc)
+        result = await async_firebase_manager.create_document("usuarios", user_doc)
         
         if not result['success']:
             raise HTTPException(status_code=500, detail="Failed to create user")
         
+        await dashboard_counters.record_user(None, user_doc)
+        
         # Prepare response data
         user_doc['id'] = result['id']
         
         # Log action
-        auth_service.log_user_action(
+        await auth_service.log_user_action(
             current_user['id'],
             "CREATE_USER",
             f"Created user: {user_data.nome} ({user_data.email})"
@@ -150,7 +185,7 @@ async def create_user(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
           # Log action
-        auth_service.log_user_action(
+        await auth_service.log_user_action(
             current_user['id'],
             "CREATE_USER",
             f"Created user: {user_data.nome} ({user_data.email})"
@@ -181,19 +216,13 @@ async def get_user(
         )
     
     try:
-        result = firebase_manager.get_document("usuarios", user_id)
+        result = await async_firebase_manager.get_document("usuarios", user_id)
         
         if not result['success'] or not result.get('data'):
             raise HTTPException(status_code=404, detail="User not found")
         
         user_data = result['data']
         
-        # Convert Firebase timestamp to datetime if needed
-        if 'created_at' in user_data and hasattr(user_data['created_at'], 'timestamp'):
-            user_data['created_at'] = datetime.fromtimestamp(user_data['created_at'].timestamp())
-        if 'last_login' in user_data and hasattr(user_data['last_login'], 'timestamp'):
-            user_data['last_login'] = datetime.fromtimestamp(user_data['last_login'].timestamp())
-        
         # Ensure required fields with defaults
         user_data.setdefault('telefone', None)
         user_data.setdefault('cargo', None)
@@ -225,11 +254,6 @@ async def update_user(
         )
     
     try:
-        # Get current user to verify existence
-        current_result = firebase_manager.get_document("usuarios", user_id)
-        if not current_result['success'] or not current_result.get('data'):
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Build update data
         update_data = {}
         
@@ -238,7 +262,7 @@ async def update_user(
         
         if user_data.email is not None:
             # Check if email is already used by another user
-            existing_users = firebase_manager.query_collection("usuarios", filters=[("email", "==", user_data.email)])
+            existing_users = await async_firebase_manager.query_collection("usuarios", filters=[("email", "==", user_data.email)])
             if existing_users['success'] and existing_users.get('data'):
                 for user in existing_users['data']:
                     if user.get('id') != user_id:
@@ -270,33 +294,35 @@ async def update_user(
             raise HTTPException(status_code=400, detail="No fields to update")
         
         # Update timestamp
-        update_data['updated_at'] = datetime.now()
-        
-        # Update user in Firebase
-        result = firebase_manager.update_document("usuarios", user_id, update_data)
+        update_data['updated_at'] = datetime.now(timezone.utc)
+        
+        # Update user in one transaction that also returns the merged document;
+        # the version being replaced is kept for the dashboard counters, and a
+        # change to a field tokens carry as a claim bumps token_version
+        previous = {}
+        result = await async_firebase_manager.update_and_get(
+            "usuarios", user_id, update_data,
+            precondition=lambda current: previous.update(current),
+            derive=auth_service.claim_version_bump(update_data)
+        )
+        principal_cache.invalidate(user_id)
+        if result['success']:
+            auth_service.revoke_if_bumped(user_id, previous, result['data'])
         
         if not result['success']:
+            if result.get('code') == 'not_found':
+                raise HTTPException(status_code=404, detail="User not found")
             raise HTTPException(status_code=500, detail="Failed to update user")
         
-        # Get updated user
-        updated_result = firebase_manager.get_document("usuarios", user_id)
-        if not updated_result['success'] or not updated_result.get('data'):
-            raise HTTPException(status_code=500, detail="Failed to retrieve updated user")
-        
-        updated_user = updated_result['data']
-        
-        # Convert Firebase timestamp to datetime if needed
-        if 'created_at' in updated_user and hasattr(updated_user['created_at'], 'timestamp'):
-            updated_user['created_at'] = datetime.fromtimestamp(updated_user['created_at'].timestamp())
-        if 'last_login' in updated_user and hasattr(updated_user['last_login'], 'timestamp'):
-            updated_user['last_login'] = datetime.fromtimestamp(updated_user['last_login'].timestamp())
+        updated_user = result['data']
+        await dashboard_counters.record_user(previous, updated_user)
         
         # Ensure required fields with defaults
         updated_user.setdefault('telefone', None)
         updated_user.setdefault('cargo', None)
         updated_user.setdefault('last_login', None)
           # Log action
-        auth_service.log_user_action(
+        await auth_service.log_user_action(
             current_user['id'],
             "UPDATE_USER",
             f"Updated user: {updated_user.get('nome', 'Unknown')} (ID: {user_id})"
@@ -325,7 +351,7 @@ async def delete_user(
     
     try:
         # Check if user exists
-        result = firebase_manager.get_document("usuarios", user_id)
+        result = await async_firebase_manager.get_document("usuarios", user_id)
         
         if not result['success'] or not result.get('data'):
             raise HTTPException(status_code=404, detail="User not found")
@@ -334,13 +360,17 @@ async def delete_user(
         user_email = user_data.get('email', 'Unknown')
         
         # Delete user from Firebase
-        delete_result = firebase_manager.delete_document("usuarios", user_id)
+        delete_result = await async_firebase_manager.delete_document("usuarios", user_id)
+        principal_cache.invalidate(user_id)
+        token_versions.forget(user_id)
         
         if not delete_result['success']:
             raise HTTPException(status_code=500, detail="Failed to delete user")
         
+        await dashboard_counters.record_user(user_data, None)
+        
         # Log action
-        auth_service.log_user_action(
+        await auth_service.log_user_action(
             current_user['id'],
             "DELETE_USER",
             f"Deleted user: {user_email} (ID: {user_id})"
@@ -376,7 +406,7 @@ async def change_password(
     
     try:
         # Get user data
-        user_result = firebase_manager.get_document("usuarios", user_id)
+        user_result = await async_firebase_manager.get_document("usuarios", user_id)
         if not user_result['success'] or not user_result.get('data'):
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -386,28 +416,29 @@ async def change_password(
         if current_user['tipo_usuario'] != 'admin':
             current_hash = user_data.get('senha_hash', '')
             
-            if not auth_service.verify_password(password_data.current_password, current_hash):
+            if not await auth_service.verify_password_async(password_data.current_password, current_hash):
                 raise HTTPException(
                     status_code=400,
                     detail="Current password is incorrect"
                 )
         
         # Hash new password
-        new_hash = auth_service.hash_password(password_data.new_password)
+        new_hash = await auth_service.hash_password_async(password_data.new_password)
         
         # Update password in Firebase
         update_data = {
             'senha_hash': new_hash,
-            'updated_at': datetime.now()
+            'updated_at': datetime.now(timezone.utc)
         }
         
-        result = firebase_manager.update_document("usuarios", user_id, update_data)
+        result = await async_firebase_manager.update_document("usuarios", user_id, update_data)
+        principal_cache.invalidate(user_id)
         
         if not result['success']:
             raise HTTPException(status_code=500, detail="Failed to update password")
         
         # Log action
-        auth_service.log_user_action(
+        await auth_service.log_user_action(
             current_user['id'],
             "CHANGE_PASSWORD",
             f"Changed password for user ID: {user_id}"
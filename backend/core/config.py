@@ -37,6 +37,22 @@ class Settings:
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     JWT_REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Verified token payloads kept in memory until they expire (0 disables)
+    JWT_CACHE_MAX_ENTRIES: int = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "4096"))
+    # Authenticated user records cached per user ID, in seconds (0 disables)
+    PRINCIPAL_CACHE_TTL: float = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "1024"))
+    # Password hashing: "scrypt" or "pbkdf2_sha256", cost parameters and worker threads
+    PASSWORD_HASH_ALGORITHM: str = os.getenv("PASSWORD_HASH_ALGORITHM", "scrypt")
+    PASSWORD_SCRYPT_N: int = int(os.getenv("PASSWORD_SCRYPT_N", "16384"))
+    PASSWORD_SCRYPT_R: int = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+    PASSWORD_SCRYPT_P: int = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+    PASSWORD_PBKDF2_ITERATIONS: int = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", "600000"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    # Authorise requests from the access token's claims alone (see backend/services/token_versions.py)
+    AUTH_CLAIMS_ONLY: bool = os.getenv("AUTH_CLAIMS_ONLY", "False").lower() == "true"
+    # How often each process rereads token versions, bounding how late it sees another process's revocations
+    TOKEN_VERSIONS_RELOAD_SECONDS: float = float(os.getenv("TOKEN_VERSIONS_RELOAD_SECONDS", "30"))
     
     # CORS
     CORS_ORIGINS: list = ["*"]
@@ -58,6 +74,35 @@ class Settings:
     WEBHOOK_ENABLED: bool = os.getenv("WEBHOOK_ENABLED", "False").lower() == "true"
     LAST_SYNC_TIMESTAMP_FILE: str = os.getenv("LAST_SYNC_TIMESTAMP_FILE", "data/last_sync.txt")    # Firebase Configuration
     FIREBASE_ENABLED: bool = os.getenv("FIREBASE_ENABLED", "True").lower() == "true"
+    # Storage backend: "firestore" (Firebase, or the in-memory demo when disabled) or "sqlite" (local, persistent)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "firestore").lower()
+    SQLITE_DATABASE_PATH: str = os.getenv("SQLITE_DATABASE_PATH", "data/cpa_forms.db")
+    # Live in-memory replicas serving reads of these collections
+    REPLICA_ENABLED: bool = os.getenv("REPLICA_ENABLED", "False").lower() == "true"
+    REPLICA_COLLECTIONS: list = [name for name in os.getenv("REPLICA_COLLECTIONS", "sugestoes").split(",") if name]
+    # Firestore call guard: deadlines (seconds), read retries, circuit breaker and in-flight RPC cap
+    FIRESTORE_READ_TIMEOUT: float = float(os.getenv("FIRESTORE_READ_TIMEOUT", "10"))
+    FIRESTORE_WRITE_TIMEOUT: float = float(os.getenv("FIRESTORE_WRITE_TIMEOUT", "20"))
+    FIRESTORE_READ_RETRIES: int = int(os.getenv("FIRESTORE_READ_RETRIES", "3"))
+    FIRESTORE_BREAKER_THRESHOLD: int = int(os.getenv("FIRESTORE_BREAKER_THRESHOLD", "5"))
+    FIRESTORE_BREAKER_RESET_SECONDS: float = float(os.getenv("FIRESTORE_BREAKER_RESET_SECONDS", "30"))
+    FIRESTORE_MAX_CONCURRENT_RPCS: int = int(os.getenv("FIRESTORE_MAX_CONCURRENT_RPCS", "64"))
+    # Query result cache (opt-in); TTLs in seconds, per collection as "sugestoes:30,usuarios:120", 0 disables
+    QUERY_CACHE_ENABLED: bool = os.getenv("QUERY_CACHE_ENABLED", "False").lower() == "true"
+    QUERY_CACHE_MAX_ENTRIES: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))
+    QUERY_CACHE_TTL: float = float(os.getenv("QUERY_CACHE_TTL", "30"))
+    QUERY_CACHE_TTLS: str = os.getenv("QUERY_CACHE_TTLS", "")
+    # Query-shape statistics, persisted on shutdown for scripts/firestore_index_advisor.py (opt-in)
+    QUERY_STATS_ENABLED: bool = os.getenv("QUERY_STATS_ENABLED", "False").lower() == "true"
+    QUERY_STATS_FILE: str = os.getenv("QUERY_STATS_FILE", "data/query_shapes.json")
+    # Columnar suggestions snapshot used by the reports, rebuilt after local writes or this many seconds
+    SUGGESTION_SNAPSHOT_TTL: float = float(os.getenv("SUGGESTION_SNAPSHOT_TTL", "60"))
+    # Compiled /api/reports/query plans kept per distinct spec
+    REPORT_PLAN_CACHE_MAX_ENTRIES: int = int(os.getenv("REPORT_PLAN_CACHE_MAX_ENTRIES", "256"))
+    # Audit log entries are queued and written in batches (entries, seconds)
+    AUDIT_LOG_BATCH_SIZE: int = int(os.getenv("AUDIT_LOG_BATCH_SIZE", "200"))
+    AUDIT_LOG_FLUSH_INTERVAL: float = float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "1"))
+    AUDIT_LOG_MAX_QUEUE: int = int(os.getenv("AUDIT_LOG_MAX_QUEUE", "10000"))
     FIREBASE_PROJECT_ID: str = os.getenv("FIREBASE_PROJECT_ID", "projeto-integrador-sugestoes")
     FIREBASE_PRIVATE_KEY_ID: str = os.getenv("FIREBASE_PRIVATE_KEY_ID", "")
     FIREBASE_PRIVATE_KEY: str = os.getenv("FIREBASE_PRIVATE_KEY", "")
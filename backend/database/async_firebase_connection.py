@@ -0,0 +1,533 @@
+"""
+Async Firebase Firestore connection built on Firestore's AsyncClient
+"""
+
+import asyncio
+import threading
+import time
+from firebase_admin import firestore_async
+from typing import Callable, Dict, List, Optional, Any, AsyncIterator
+from backend.database.firebase_connection import (
+    FirebaseManager, firebase_manager, build_query, snapshot_to_dict,
+    chunked, bulk_result, unique_doc_ids, build_aggregation_query,
+    utc_now, normalize_timestamps, increment_transforms
+)
+from backend.database.resilience import firestore_guard
+from backend.database.query_cache import query_cache
+from backend.database.query_stats import query_recorder
+
+class AsyncLocalBackend:
+    """Async facade over a local document store so it matches the AsyncClient path
+
+    MockFirestore lives in process memory and is called inline; blocking
+    stores such as SQLiteFirestore run in a worker thread (offload=True).
+    """
+
+    def __init__(self, backend, offload: bool = False):
+        self._backend = backend
+        self._offload = offload
+
+    def __getattr__(self, name):
+        attr = getattr(self._backend, name)
+        if not callable(attr):
+            return attr
+
+        if self._offload:
+            async def call(*args, **kwargs):
+                return await asyncio.to_thread(attr, *args, **kwargs)
+        else:
+            async def call(*args, **kwargs):
+                return attr(*args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+class AsyncFirebaseManager:
+    """Async twin of FirebaseManager for use inside request handlers
+
+    Initialization is delegated to the sync manager so both share the same
+    Firebase app or, with a local backend, the same store.
+    """
+
+    def __init__(self, sync_manager: FirebaseManager):
+        self._sync = sync_manager
+        self.db = None
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        # Set once warm_up() has succeeded; /health reports "not ready" until
+        # then, and an error while warm_up_error is set
+        self.ready = False
+        self.cold_start_seconds: Optional[float] = None
+        self.warm_up_error: Optional[str] = None
+
+    @property
+    def is_demo_mode(self) -> bool:
+        return self._sync.is_demo_mode
+
+    @property
+    def is_local_backend(self) -> bool:
+        return self._sync.is_local_backend
+
+    def _ensure_initialized(self):
+        """Ensure the async client is created when needed"""
+        if self._initialized:
+            return
+
+        with self._init_lock:
+            if self._initialized:
+                return
+
+            self._sync._ensure_initialized()
+
+            if self._sync.is_local_backend:
+                self.db = AsyncLocalBackend(self._sync.db, offload=not self._sync.is_demo_mode)
+            else:
+                print("🔄 Criando cliente Firestore assíncrono...")
+                self.db = firestore_async.client()
+                print("✅ Cliente Firestore assíncrono criado")
+
+            self._initialized = True
+
+    async def warm_up(self) -> Dict[str, Any]:
+        """Initialize both managers and open their channels before serving traffic
+
+        Credential parsing, initialize_app and the sync client's first read
+        run in a worker thread; the AsyncClient is created on the event loop
+        its channel will belong to, then opened with one cheap read.
+        """
+        started = time.monotonic()
+        sync_result = await asyncio.to_thread(self._sync.warm_up)
+        self._ensure_initialized()
+        result = await self.query_collection("usuarios", limit=1, select=[])
+
+        self.cold_start_seconds = time.monotonic() - started
+        self.warm_up_error = sync_result.get('error') or result.get('error')
+        self.ready = self.warm_up_error is None
+        return {"success": sync_result['success'] and result['success'],
+                "seconds": self.cold_start_seconds, "error": self.warm_up_error}
+
+    def is_connected(self) -> bool:
+        """Check if Firebase is connected"""
+        self._ensure_initialized()
+        return self.db is not None
+
+    async def query_collection(self, collection: str, filters: Optional[List[tuple]] = None,
+                               order_by: Optional[str] = None, limit: Optional[int] = None,
+                               descending: bool = False, start_after: Optional[Dict[str, Any]] = None,
+                               end_before: Optional[Dict[str, Any]] = None,
+                               select: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Query a collection with optional filters, keyset cursors and field mask (see build_query)"""
+        try:
+            self._ensure_initialized()
+
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+
+            # Replicas are in process memory, so they are queried inline
+            replica = self._sync.serving_replica(collection)
+            if replica:
+                return replica.query_collection(filters, order_by, limit, descending,
+                                                start_after, end_before, select=select)
+
+            cache_key = query_cache.key(collection, "query", filters, order_by, limit, descending,
+                                        start_after, end_before, select)
+            cached = query_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            with query_recorder.observe(collection, "query", filters, order_by, descending):
+                if self.is_local_backend:
+                    result = await self.db.query_collection(collection, filters, order_by, limit,
+                                                            descending, start_after, end_before, select=select)
+                else:
+                    query = build_query(self.db.collection(collection), filters, order_by, limit,
+                                        descending, start_after, end_before, select=select)
+
+                    async def fetch(timeout):
+                        if end_before:
+                            # limit_to_last queries cannot be streamed
+                            return [snapshot_to_dict(doc) for doc in await query.get(retry=None, timeout=timeout)]
+                        return [snapshot_to_dict(doc) async for doc in query.stream(retry=None, timeout=timeout)]
+
+                    result = {"success": True, "data": await firestore_guard.call_async("query", fetch, idempotent=True)}
+
+            query_cache.put(cache_key, result)
+            return result
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def iter_collection(self, collection: str, filters: Optional[List[tuple]] = None,
+                              order_by: Optional[str] = None, batch_size: int = 500,
+                              select: Optional[List[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield documents lazily, reading `batch_size` at a time with keyset cursors
+
+        Only one page is held in memory, whatever the collection size.
+        Raises RuntimeError if a page cannot be read.
+        """
+        if select is not None and order_by and order_by not in select:
+            # The cursor needs the order_by value of the last document
+            select = select + [order_by]
+
+        start_after = None
+        while True:
+            result = await self.query_collection(collection, filters, order_by, batch_size,
+                                                 start_after=start_after, select=select)
+            if not result['success']:
+                raise RuntimeError(result['error'])
+
+            page = result['data']
+            for document in page:
+                yield document
+
+            if len(page) < batch_size:
+                return
+            start_after = page[-1]
+
+    async def aggregate(self, collection: str, filters: Optional[List[tuple]] = None,
+                        aggregations: Optional[List[tuple]] = None) -> Dict[str, Any]:
+        """Run count/sum/avg aggregations server-side (see FirebaseManager.aggregate)"""
+        try:
+            self._ensure_initialized()
+
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+
+            aggregations = aggregations or [("count", None)]
+
+            replica = self._sync.serving_replica(collection)
+            if replica:
+                return replica.aggregate(filters, aggregations)
+
+            cache_key = query_cache.key(collection, "aggregate", filters, aggregations)
+            cached = query_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            with query_recorder.observe(collection, "aggregate", filters):
+                if self.is_local_backend:
+                    result = await self.db.aggregate(collection, filters, aggregations)
+                else:
+                    query = build_aggregation_query(build_query(self.db.collection(collection), filters), aggregations)
+                    results = await firestore_guard.call_async(
+                        "aggregate", lambda timeout: query.get(retry=None, timeout=timeout), idempotent=True
+                    )
+                    result = {"success": True, "data": {result.alias: result.value for row in results for result in row}}
+
+            query_cache.put(cache_key, result)
+            return result
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def create_document(self, collection: str, data: Dict[str, Any], doc_id: Optional[str] = None) -> Dict[str, Any]:
+        """Create a new document in a collection"""
+        try:
+            self._ensure_initialized()
+
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+
+            if self.is_local_backend:
+                return await self.db.create_document(collection, data, doc_id)
+
+            data['created_at'] = data.get('created_at') or utc_now()
+            data['updated_at'] = utc_now()
+            normalize_timestamps(data)
+
+            if doc_id:
+                doc_ref = self.db.collection(collection).document(doc_id)
+                await firestore_guard.call_async("create", lambda timeout: doc_ref.set(data, retry=None, timeout=timeout))
+                return {"success": True, "id": doc_id, "data": data}
+            else:
+                _, doc_ref = await firestore_guard.call_async(
+                    "create", lambda timeout: self.db.collection(collection).add(data, retry=None, timeout=timeout)
+                )
+                return {"success": True, "id": doc_ref.id, "data": data}
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+
+    async def get_document(self, collection: str, doc_id: str) -> Dict[str, Any]:
+        """Get a single document by ID"""
+        try:
+            self._ensure_initialized()
+
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+
+            if self.is_local_backend:
+                return await self.db.get_document(collection, doc_id)
+
+            doc_ref = self.db.collection(collection).document(doc_id)
+            doc = await firestore_guard.call_async(
+                "get", lambda timeout: doc_ref.get(retry=None, timeout=timeout), idempotent=True
+            )
+
+            if doc.exists:
+                return {"success": True, "data": snapshot_to_dict(doc)}
+            else:
+                return {"success": False, "error": "Document not found"}
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def get_documents(self, collection: str, doc_ids: List[str]) -> Dict[str, Any]:
+        """Get many documents by ID with a single batched get_all call
+
+        Duplicate and empty IDs are dropped; the result data is a dict keyed
+        by document ID and only contains documents that exist.
+        """
+        try:
+            self._ensure_initialized()
+
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+
+            unique_ids = unique_doc_ids(doc_ids)
+            if not unique_ids:
+                return {"success": True, "data": {}}
+
+            if self.is_local_backend:
+                return await self.db.get_documents(collection, unique_ids)
+
+            collection_ref = self.db.collection(collection)
+            refs = [collection_ref.document(doc_id) for doc_id in unique_ids]
+
+            async def fetch(timeout):
+                return {doc.id: snapshot_to_dict(doc)
+                        async for doc in self.db.get_all(refs, retry=None, timeout=timeout) if doc.exists}
+
+            data = await firestore_guard.call_async("get_all", fetch, idempotent=True)
+
+            return {"success": True, "data": data}
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def update_document(self, collection: str, doc_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Update a document"""
+        try:
+            self._ensure_initialized()
+
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+
+            if self.is_local_backend:
+                return await self.db.update_document(collection, doc_id, data)
+
+            data['updated_at'] = utc_now()
+            normalize_timestamps(data)
+            doc_ref = self.db.collection(collection).document(doc_id)
+            await firestore_guard.call_async("update", lambda timeout: doc_ref.update(data, retry=None, timeout=timeout))
+
+            return {"success": True, "id": doc_id}
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+
+    async def update_and_get(self, collection: str, doc_id: str, data: Dict[str, Any],
+                             precondition: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None,
+                             derive: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Read, check and update a document in one transaction (see FirebaseManager.update_and_get)"""
+        try:
+            self._ensure_initialized()
+
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+
+            if self.is_local_backend:
+                return await self.db.update_and_get(collection, doc_id, data, precondition, derive)
+
+            doc_ref = self.db.collection(collection).document(doc_id)
+
+            @firestore_async.async_transactional
+            async def read_check_write(transaction, timeout):
+                # Re-run from here if the transaction is retried on contention
+                snapshot = await doc_ref.get(transaction=transaction, retry=None, timeout=timeout)
+                if not snapshot.exists:
+                    return {"success": False, "error": "Document not found", "code": "not_found"}
+                current = snapshot_to_dict(snapshot)
+                reason = precondition(current) if precondition else None
+                if reason:
+                    return {"success": False, "error": reason, "code": "precondition_failed"}
+                extra = derive(current) if derive else {}
+                fields = normalize_timestamps({**data, **extra, 'updated_at': utc_now()})
+                transaction.update(doc_ref, fields)
+                return {"success": True, "id": doc_id, "data": {**current, **fields}}
+
+            return await firestore_guard.call_async(
+                "transaction", lambda timeout: read_check_write(self.db.transaction(), timeout)
+            )
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+
+    async def increment_fields(self, collection: str, doc_id: str, increments: Dict[str, Any]) -> Dict[str, Any]:
+        """Atomically add to numeric fields of a document (see FirebaseManager.increment_fields)"""
+        try:
+            self._ensure_initialized()
+
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+
+            if self.is_local_backend:
+                return await self.db.increment_fields(collection, doc_id, increments)
+
+            data = {**increment_transforms(increments), 'updated_at': utc_now()}
+            doc_ref = self.db.collection(collection).document(doc_id)
+            await firestore_guard.call_async(
+                "increment", lambda timeout: doc_ref.set(data, merge=True, retry=None, timeout=timeout)
+            )
+
+            return {"success": True, "id": doc_id}
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+
+    async def delete_document(self, collection: str, doc_id: str) -> Dict[str, Any]:
+        """Delete a document"""
+        try:
+            self._ensure_initialized()
+
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+
+            if self.is_local_backend:
+                return await self.db.delete_document(collection, doc_id)
+
+            doc_ref = self.db.collection(collection).document(doc_id)
+            await firestore_guard.call_async("delete", lambda timeout: doc_ref.delete(retry=None, timeout=timeout))
+
+            return {"success": True}
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+
+    async def create_documents(self, collection: str, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Create many documents; chunks of up to 500 writes are committed concurrently
+
+        A document carrying an 'id' key is written under that ID, otherwise
+        Firestore generates one. Returns one result per input document.
+        """
+        try:
+            self._ensure_initialized()
+
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+
+            if self.is_local_backend:
+                return await self.db.create_documents(collection, documents)
+
+            collection_ref = self.db.collection(collection)
+            commits = []
+
+            for chunk in chunked(documents):
+                batch = self.db.batch()
+                chunk_ids = []
+
+                for document in chunk:
+                    data = dict(document)
+                    doc_id = data.pop('id', None)
+                    data['created_at'] = data.get('created_at') or utc_now()
+                    data['updated_at'] = utc_now()
+                    normalize_timestamps(data)
+                    doc_ref = collection_ref.document(doc_id) if doc_id else collection_ref.document()
+                    batch.set(doc_ref, data)
+                    chunk_ids.append(doc_ref.id)
+
+                commits.append(commit_batch(batch, chunk_ids))
+
+            return bulk_result([result for chunk in await asyncio.gather(*commits) for result in chunk])
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+
+    async def update_documents(self, collection: str, updates: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Update many documents ({doc_id: fields}) using concurrent WriteBatch commits"""
+        try:
+            self._ensure_initialized()
+
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+
+            if self.is_local_backend:
+                return await self.db.update_documents(collection, updates)
+
+            collection_ref = self.db.collection(collection)
+            commits = []
+
+            for chunk in chunked(list(updates.items())):
+                batch = self.db.batch()
+
+                for doc_id, data in chunk:
+                    batch.update(collection_ref.document(doc_id), normalize_timestamps({**data, 'updated_at': utc_now()}))
+
+                commits.append(commit_batch(batch, [doc_id for doc_id, _ in chunk]))
+
+            return bulk_result([result for chunk in await asyncio.gather(*commits) for result in chunk])
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+
+    async def delete_documents(self, collection: str, doc_ids: List[str]) -> Dict[str, Any]:
+        """Delete many documents using concurrent WriteBatch commits"""
+        try:
+            self._ensure_initialized()
+
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+
+            if self.is_local_backend:
+                return await self.db.delete_documents(collection, doc_ids)
+
+            collection_ref = self.db.collection(collection)
+            commits = []
+
+            for chunk in chunked(list(doc_ids)):
+                batch = self.db.batch()
+
+                for doc_id in chunk:
+                    batch.delete(collection_ref.document(doc_id))
+
+                commits.append(commit_batch(batch, chunk))
+
+            return bulk_result([result for chunk in await asyncio.gather(*commits) for result in chunk])
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+
+async def commit_batch(batch, doc_ids: List[str]) -> List[Dict[str, Any]]:
+    """Commit an AsyncWriteBatch; a batch is atomic, so its documents share one outcome"""
+    try:
+        await firestore_guard.call_async("commit", lambda timeout: batch.commit(retry=None, timeout=timeout))
+        return [{"success": True, "id": doc_id} for doc_id in doc_ids]
+    except Exception as e:
+        return [{"success": False, "id": doc_id, "error": str(e)} for doc_id in doc_ids]
+
+# Create global instance sharing the sync manager's initialization
+async_firebase_manager = AsyncFirebaseManager(firebase_manager)
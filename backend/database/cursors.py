@@ -0,0 +1,51 @@
+"""
+Opaque pagination cursors for keyset (start_after/end_before) queries
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Optional, Any
+
+from backend.database.firebase_connection import field_value
+
+def _encode_value(value: Any) -> Any:
+    """Make an order_by value JSON-safe, keeping datetimes distinguishable"""
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    """Reverse _encode_value"""
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+def encode_cursor(document: Dict[str, Any], order_by: Optional[str] = None) -> str:
+    """Build an opaque cursor pointing just past `document` in `order_by` order"""
+    payload = {"id": document['id']}
+    if order_by:
+        payload["v"] = _encode_value(field_value(document, order_by, None))
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str, order_by: Optional[str] = None) -> Dict[str, Any]:
+    """Turn an opaque cursor back into the {order_by: value, 'id': ...} dict
+    accepted by query_collection's start_after/end_before (a field path
+    'a.b' becomes {'a': {'b': value}}).
+
+    Raises ValueError for malformed cursors.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        cursor = {"id": str(payload["id"])}
+        if order_by:
+            *parents, last = order_by.split(".")
+            target = cursor
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[last] = _decode_value(payload.get("v"))
+        return cursor
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
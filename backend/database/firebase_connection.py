@@ -4,18 +4,181 @@ Firebase Firestore connection with lazy initialization
 
 import firebase_admin
 from firebase_admin import credentials, firestore
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterator, Set, Callable
+from bisect import bisect_left, bisect_right, insort
+import copy
+import operator
 import os
-from datetime import datetime
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
 import json
 from pathlib import Path
 from backend.core.config import settings
+from backend.database.resilience import firestore_guard
+from backend.database.query_cache import query_cache
+from backend.database.query_stats import query_recorder
 
-class MockFirestore:
-    """Mock Firestore for demo purposes"""
+class MockCollection:
+    """Documents of one mock collection plus the indexes used to query them
+    
+    Hash indexes (field value -> IDs) serve == and in filters; sorted indexes
+    (list of (value_key, id) entries) serve range filters, order_by and
+    cursors. Both are built on first use of a field and kept up to date by
+    every write afterwards.
+    """
+    
+    # Above this many documents in one bulk write, sorted indexes are dropped
+    # and rebuilt with one sort instead of one list insertion per document
+    BULK_REINDEX_THRESHOLD = 1000
+    
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.hash_indexes: Dict[str, Dict[tuple, Set[str]]] = {}
+        self.sorted_indexes: Dict[str, List[tuple]] = {}
+    
+    def hash_index(self, field: str) -> Dict[tuple, Set[str]]:
+        index = self.hash_indexes.get(field)
+        if index is None:
+            index = {}
+            for doc_id, item in self.docs.items():
+                value = field_value(item, field)
+                if value is not _MISSING:
+                    index.setdefault(value_key(value), set()).add(doc_id)
+            self.hash_indexes[field] = index
+        return index
+    
+    def sorted_index(self, field: str) -> List[tuple]:
+        index = self.sorted_indexes.get(field)
+        if index is None:
+            index = sorted(entry for entry in (index_entry(item, field) for item in self.docs.values())
+                           if entry is not None)
+            self.sorted_indexes[field] = index
+        return index
+    
+    def insert(self, item: Dict[str, Any]):
+        if item['id'] in self.docs:
+            self.remove(item['id'])
+        self.docs[item['id']] = item
+        self._index(item)
+    
+    def insert_many(self, items: List[Dict[str, Any]]):
+        if len(items) > self.BULK_REINDEX_THRESHOLD:
+            self.sorted_indexes.clear()
+        for item in items:
+            self.insert(item)
+    
+    def update(self, doc_id: str, data: Dict[str, Any]):
+        item = self.docs[doc_id]
+        self._unindex(item)
+        item.update(data)
+        self._index(item)
+    
+    def remove(self, doc_id: str):
+        self._unindex(self.docs.pop(doc_id))
+    
+    def _index(self, item: Dict[str, Any]):
+        for field, index in self.hash_indexes.items():
+            value = field_value(item, field)
+            if value is not _MISSING:
+                index.setdefault(value_key(value), set()).add(item['id'])
+        for field, index in self.sorted_indexes.items():
+            entry = index_entry(item, field)
+            if entry is not None:
+                insort(index, entry)
+    
+    def _unindex(self, item: Dict[str, Any]):
+        for field, index in self.hash_indexes.items():
+            value = field_value(item, field)
+            if value is not _MISSING:
+                key = value_key(value)
+                ids = index.get(key)
+                if ids is not None:
+                    ids.discard(item['id'])
+                    if not ids:
+                        del index[key]
+        for field, index in self.sorted_indexes.items():
+            entry = index_entry(item, field)
+            if entry is not None:
+                position = bisect_left(index, entry)
+                if position < len(index) and index[position] == entry:
+                    del index[position]
+    
+    def candidate_ids(self, filters: List[tuple], walk_field: str) -> Optional[Set[str]]:
+        """IDs that can possibly match, from the indexes; None means every document"""
+        candidates = None
+        for field, operator, value in filters:
+            if operator == "==":
+                ids = self.hash_index(field).get(value_key(value), set())
+            elif operator == "in":
+                index = self.hash_index(field)
+                ids = set().union(*(index.get(value_key(option), set()) for option in value))
+            else:
+                continue
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return candidates
+        
+        # Range filters on other fields narrow further when their slice is smaller
+        for field, operator, value in filters:
+            if operator in RANGE_OPERATORS and field != walk_field:
+                index = self.sorted_index(field)
+                lo, hi = range_bounds(index, 0, len(index), operator, value)
+                if candidates is None or hi - lo < len(candidates):
+                    ids = {doc_id for _, doc_id in index[lo:hi]}
+                    candidates = ids if candidates is None else candidates & ids
+                    if not candidates:
+                        return candidates
+        
+        return candidates
+
+class ChangeNotifier:
+    """Write notifications for local backends, their counterpart of on_snapshot
+    
+    Listeners are called as listener(collection, upserts, deleted_ids) after
+    every write, in write order, with copies of the full written documents.
+    """
     
     def __init__(self):
-        self.data = {
+        self._listeners: List[Callable[[str, List[Dict[str, Any]], List[str]], None]] = []
+    
+    def add_listener(self, listener: Callable[[str, List[Dict[str, Any]], List[str]], None]) -> Callable[[], None]:
+        """Register a change listener; returns a function that removes it"""
+        self._listeners = self._listeners + [listener]
+        
+        def remove():
+            self._listeners = [other for other in self._listeners if other is not listener]
+        
+        return remove
+    
+    def _notify(self, collection: str, upserts: List[Dict[str, Any]], deleted_ids: List[str]):
+        for listener in self._listeners:
+            listener(collection, [dict(item) for item in upserts], list(deleted_ids))
+
+class MockFirestore(ChangeNotifier):
+    """In-memory Firestore for demo mode and offline load testing
+    
+    Documents are stored by ID and queried through lazily built indexes, with
+    Firestore semantics for operators, cross-type ordering, order_by, limit,
+    cursors, field masks and aggregations; field names may be dotted paths
+    into maps ('a.b'). Reads return copies, so callers cannot corrupt
+    stored documents or indexes. Thread-safe.
+    """
+    
+    # A limited query walks the whole sorted index instead of sorting its
+    # candidates once they are more than 1/16 of the collection
+    DENSE_CANDIDATES_RATIO = 16
+    
+    def __init__(self, seed: bool = True):
+        super().__init__()
+        self.collections: Dict[str, MockCollection] = {}
+        self._lock = threading.RLock()
+        
+        if not seed:
+            return
+        
+        demo_data = {
             "usuarios": [
                 {
                     "id": "admin_user_123",
@@ -27,8 +190,8 @@ class MockFirestore:
                     "setor": "TI",
                     "ativo": True,
                     "ultimo_login": None,
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now()
+                    "created_at": utc_now(),
+                    "updated_at": utc_now()
                 }
             ],
             "configuracoes": [
@@ -39,64 +202,554 @@ class MockFirestore:
                     "descricao": "Nome do sistema",
                     "tipo": "texto",
                     "categoria": "geral",
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now()
+                    "created_at": utc_now(),
+                    "updated_at": utc_now()
                 }
             ],
             "sugestoes": [],
             "logs": []
         }
+        for collection, documents in demo_data.items():
+            self._collection(collection).insert_many(documents)
     
-    def query_collection(self, collection: str, filters: Optional[List[tuple]] = None):
-        """Mock query collection"""
-        data = self.data.get(collection, [])
+    def _collection(self, collection: str) -> MockCollection:
+        if collection not in self.collections:
+            self.collections[collection] = MockCollection()
+        return self.collections[collection]
+    
+    def _matching_ids(self, collection: str, filters: Optional[List[tuple]] = None,
+                      order_by: Optional[str] = None, limit: Optional[int] = None,
+                      descending: bool = False, start_after: Optional[Dict[str, Any]] = None,
+                      end_before: Optional[Dict[str, Any]] = None) -> List[str]:
+        """IDs of the documents a query returns, in result order"""
+        filters = filters or []
+        for _, operator, _ in filters:
+            if operator not in MOCK_OPERATORS:
+                raise ValueError(f"Unsupported operator: {operator}")
+        
+        coll = self.collections.get(collection)
+        if coll is None:
+            return []
+        
+        # Results are always walked in (order_by, id) order, like Firestore;
+        # without order_by that is plain document ID order
+        walk_field = order_by or "__name__"
+        candidates = coll.candidate_ids(filters, walk_field)
+        index = coll.sorted_index(walk_field)
+        if candidates is None or (limit and len(candidates) * self.DENSE_CANDIDATES_RATIO > len(index)):
+            # Walking the full index stops after `limit` matches, which beats
+            # sorting a large candidate set
+            entries = index
+        else:
+            entries = sorted(entry for entry in (index_entry(coll.docs[doc_id], walk_field) for doc_id in candidates)
+                             if entry is not None)
+        
+        lo, hi = 0, len(entries)
+        for field, operator, value in filters:
+            if field == walk_field and operator in RANGE_OPERATORS:
+                lo, hi = range_bounds(entries, lo, hi, operator, value)
+        
+        if start_after:
+            after = cursor_entry(start_after, order_by)
+            if descending:
+                hi = min(hi, bisect_left(entries, after))
+            else:
+                lo = max(lo, bisect_right(entries, after))
+        
+        if end_before:
+            before = cursor_entry(end_before, order_by)
+            if descending:
+                lo = max(lo, bisect_right(entries, before))
+            else:
+                hi = min(hi, bisect_left(entries, before))
         
-        if filters:
-            for field, operator, value in filters:
-                if operator == "==":
-                    data = [item for item in data if item.get(field) == value]
+        positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+        # Paging backwards (limit_to_last) collects from the far end of the range
+        from_end = bool(limit and end_before and not start_after)
+        if from_end:
+            positions = reversed(positions)
         
+        ids = []
+        for position in positions:
+            doc_id = entries[position][1]
+            item = coll.docs[doc_id]
+            if all(match_filter(item, field, operator, value) for field, operator, value in filters):
+                ids.append(doc_id)
+                if limit and len(ids) == limit:
+                    break
+        
+        if from_end:
+            ids.reverse()
+        return ids
+    
+    def query_collection(self, collection: str, filters: Optional[List[tuple]] = None,
+                         order_by: Optional[str] = None, limit: Optional[int] = None,
+                         descending: bool = False, start_after: Optional[Dict[str, Any]] = None,
+                         end_before: Optional[Dict[str, Any]] = None, select: Optional[List[str]] = None):
+        """Mock query collection"""
+        with self._lock:
+            ids = self._matching_ids(collection, filters, order_by, limit, descending, start_after, end_before)
+            docs = self.collections[collection].docs if ids else {}
+            if select is not None:
+                data = [project_document(docs[doc_id], select) for doc_id in ids]
+            else:
+                data = [dict(docs[doc_id]) for doc_id in ids]
         return {"success": True, "data": data}
     
-    def create_document(self, collection: str, data: Dict[str, Any]):
-        """Mock create document"""
-        doc_id = f"{collection}_{len(self.data.get(collection, []))}"
+    def aggregate(self, collection: str, filters: Optional[List[tuple]] = None,
+                  aggregations: Optional[List[tuple]] = None):
+        """Mock aggregation query (computed locally over the matching documents)"""
+        with self._lock:
+            coll = self.collections.get(collection, MockCollection())
+            if filters:
+                data = [coll.docs[doc_id] for doc_id in self._matching_ids(collection, filters)]
+            else:
+                data = list(coll.docs.values())
+            result = compute_aggregations(data, aggregations or [("count", None)])
+        return {"success": True, "data": result}
+    
+    def create_document(self, collection: str, data: Dict[str, Any], doc_id: Optional[str] = None):
+        """Mock create document (an existing ID is overwritten, like set())"""
+        doc_id = doc_id or new_document_id()
         data['id'] = doc_id
-        data['created_at'] = datetime.now()
-        data['updated_at'] = datetime.now()
+        data['created_at'] = data.get('created_at') or utc_now()
+        data['updated_at'] = utc_now()
+        normalize_timestamps(data)
         
-        if collection not in self.data:
-            self.data[collection] = []
-        
-        self.data[collection].append(data)
+        with self._lock:
+            self._collection(collection).insert(dict(data))
+            self._notify(collection, [data], [])
         return {"success": True, "id": doc_id}
     
     def update_document(self, collection: str, doc_id: str, data: Dict[str, Any]):
         """Mock update document"""
-        collection_data = self.data.get(collection, [])
-        for item in collection_data:
-            if item.get('id') == doc_id:
-                item.update(data)
-                item['updated_at'] = datetime.now()
-                return {"success": True}
-        return {"success": False, "error": "Document not found"}
+        with self._lock:
+            coll = self.collections.get(collection)
+            if coll is None or doc_id not in coll.docs:
+                return {"success": False, "error": "Document not found"}
+            coll.update(doc_id, normalize_timestamps({**data, 'updated_at': utc_now()}))
+            self._notify(collection, [coll.docs[doc_id]], [])
+        return {"success": True}
+    
+    def update_and_get(self, collection: str, doc_id: str, data: Dict[str, Any],
+                       precondition: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None,
+                       derive: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        """Mock atomic read-check-update returning the merged document (see FirebaseManager.update_and_get)"""
+        with self._lock:
+            coll = self.collections.get(collection)
+            if coll is None or doc_id not in coll.docs:
+                return {"success": False, "error": "Document not found", "code": "not_found"}
+            current = dict(coll.docs[doc_id])
+            reason = precondition(current) if precondition else None
+            if reason:
+                return {"success": False, "error": reason, "code": "precondition_failed"}
+            extra = derive(current) if derive else {}
+            coll.update(doc_id, normalize_timestamps({**data, **extra, 'updated_at': utc_now()}))
+            self._notify(collection, [coll.docs[doc_id]], [])
+            return {"success": True, "id": doc_id, "data": dict(coll.docs[doc_id])}
+    
+    def increment_fields(self, collection: str, doc_id: str, increments: Dict[str, Any]):
+        """Mock atomic counter update (see FirebaseManager.increment_fields)"""
+        with self._lock:
+            coll = self._collection(collection)
+            current = coll.docs.get(doc_id)
+            item = copy.deepcopy(current) if current else {'id': doc_id, 'created_at': utc_now()}
+            add_increments(item, increments)
+            item['updated_at'] = utc_now()
+            coll.insert(item)
+            self._notify(collection, [item], [])
+        return {"success": True, "id": doc_id}
     
     def get_document(self, collection: str, doc_id: str):
         """Mock get document"""
-        collection_data = self.data.get(collection, [])
-        for item in collection_data:
-            if item.get('id') == doc_id:
-                return {"success": True, "data": item}
-        return {"success": False, "error": "Document not found"}
+        with self._lock:
+            item = self.collections.get(collection, MockCollection()).docs.get(doc_id)
+            if item is None:
+                return {"success": False, "error": "Document not found"}
+            return {"success": True, "data": dict(item)}
+    
+    def get_documents(self, collection: str, doc_ids: List[str]):
+        """Mock multi-get (missing IDs are left out of the result)"""
+        with self._lock:
+            docs = self.collections.get(collection, MockCollection()).docs
+            data = {doc_id: dict(docs[doc_id]) for doc_id in doc_ids if doc_id in docs}
+        return {"success": True, "data": data}
     
     def delete_document(self, collection: str, doc_id: str):
         """Mock delete document"""
-        collection_data = self.data.get(collection, [])
-        for i, item in enumerate(collection_data):
-            if item.get('id') == doc_id:
-                del collection_data[i]
-                return {"success": True}
-        return {"success": False, "error": "Document not found"}
+        with self._lock:
+            coll = self.collections.get(collection)
+            if coll is None or doc_id not in coll.docs:
+                return {"success": False, "error": "Document not found"}
+            coll.remove(doc_id)
+            self._notify(collection, [], [doc_id])
+        return {"success": True}
+    
+    def create_documents(self, collection: str, documents: List[Dict[str, Any]]):
+        """Mock bulk create (documents may carry their own 'id')"""
+        items = []
+        for document in documents:
+            item = dict(document)
+            item['id'] = item.get('id') or new_document_id()
+            item['created_at'] = item.get('created_at') or utc_now()
+            item['updated_at'] = utc_now()
+            normalize_timestamps(item)
+            items.append(item)
+        
+        with self._lock:
+            self._collection(collection).insert_many(items)
+            self._notify(collection, items, [])
+        return bulk_result([{"success": True, "id": item['id']} for item in items])
+    
+    def update_documents(self, collection: str, updates: Dict[str, Dict[str, Any]]):
+        """Mock bulk update"""
+        results = []
+        with self._lock:
+            for doc_id, data in updates.items():
+                result = self.update_document(collection, doc_id, data)
+                results.append({"success": result['success'], "id": doc_id, "error": result.get('error')})
+        return bulk_result(results)
+    
+    def delete_documents(self, collection: str, doc_ids: List[str]):
+        """Mock bulk delete"""
+        results = []
+        with self._lock:
+            for doc_id in doc_ids:
+                result = self.delete_document(collection, doc_id)
+                results.append({"success": result['success'], "id": doc_id, "error": result.get('error')})
+        return bulk_result(results)
+    
+    def apply_changes(self, collection: str, upserts: List[Dict[str, Any]], deleted_ids: List[str]):
+        """Store documents verbatim and drop deleted IDs (used to mirror another backend)"""
+        with self._lock:
+            coll = self._collection(collection)
+            coll.insert_many([dict(item) for item in upserts])
+            for doc_id in deleted_ids:
+                if doc_id in coll.docs:
+                    coll.remove(doc_id)
+            self._notify(collection, upserts, deleted_ids)
+
+def new_document_id() -> str:
+    """Random 20-character ID, like Firestore's auto IDs (never reused after deletes)"""
+    return uuid.uuid4().hex[:20]
+
+# Top-level fields holding timestamps in this app's schema
+TIMESTAMP_FIELDS = ("created_at", "updated_at", "last_login", "ultimo_login", "timestamp")
+
+def utc_now() -> datetime:
+    """Current time as a timezone-aware UTC datetime"""
+    return datetime.now(timezone.utc)
+
+def to_utc(value: datetime) -> datetime:
+    """Convert any datetime to a plain, timezone-aware UTC datetime
+    
+    Naive datetimes are taken as local time (they come from datetime.now()).
+    Firestore's DatetimeWithNanoseconds subclass is turned into a plain
+    datetime so every backend hands out the same type.
+    """
+    if type(value) is datetime and value.tzinfo is timezone.utc:
+        return value
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, value.day, value.hour, value.minute,
+                    value.second, value.microsecond, tzinfo=timezone.utc)
+
+def normalize_timestamps(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert the schema's timestamp fields in place to aware UTC datetimes
+    
+    ISO-8601 strings (older imports and backups) are parsed; other values
+    are left alone.
+    """
+    for field in TIMESTAMP_FIELDS:
+        value = document.get(field)
+        if isinstance(value, datetime):
+            document[field] = to_utc(value)
+        elif isinstance(value, str):
+            try:
+                document[field] = to_utc(datetime.fromisoformat(value.replace('Z', '+00:00')))
+            except ValueError:
+                pass
+    return document
+
+def add_increments(target: Dict[str, Any], increments: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the numbers of a nested `increments` map into `target` in place (missing counters start at 0)"""
+    for key, value in increments.items():
+        if isinstance(value, dict):
+            current = target.get(key)
+            if not isinstance(current, dict):
+                current = target[key] = {}
+            add_increments(current, value)
+        else:
+            target[key] = (target.get(key) or 0) + value
+    return target
+
+def increment_transforms(increments: Dict[str, Any]) -> Dict[str, Any]:
+    """`increments` with every number wrapped in firestore.Increment, for set(..., merge=True)"""
+    return {
+        key: increment_transforms(value) if isinstance(value, dict) else firestore.Increment(value)
+        for key, value in increments.items()
+    }
+
+def normalize_filters(filters: Optional[List[tuple]]) -> Optional[List[tuple]]:
+    """Filters with their datetime values converted by to_utc"""
+    if not filters:
+        return filters
+    return [(field, operator, to_utc(value) if isinstance(value, datetime) else value)
+            for field, operator, value in filters]
+
+def value_key(value: Any) -> tuple:
+    """Hashable, comparable key giving Firestore's cross-type value ordering
+    
+    null < booleans < numbers < timestamps < strings < bytes < other < arrays < maps.
+    Integers and floats compare as numbers, so 1 == 1.0 but True != 1.
+    """
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        # Naive datetimes are local time, as everywhere in the data layer (see to_utc)
+        return (3, value.timestamp())
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, bytes):
+        return (5, value)
+    if isinstance(value, (list, tuple)):
+        return (7, tuple(value_key(element) for element in value))
+    if isinstance(value, dict):
+        return (8, tuple(sorted((key, value_key(element)) for key, element in value.items())))
+    return (6, str(value))
+
+def index_entry(item: Dict[str, Any], field: str) -> Optional[tuple]:
+    """Sorted-index entry for a document, or None if it lacks the field
+    
+    The pseudo-field "__name__" orders by document ID only.
+    """
+    if field == "__name__":
+        return ((), item['id'])
+    value = field_value(item, field)
+    if value is _MISSING:
+        return None
+    return (value_key(value), item['id'])
+
+def cursor_entry(cursor: Dict[str, Any], order_by: Optional[str]) -> tuple:
+    """Sorted-index entry a start_after/end_before cursor points at"""
+    if not order_by:
+        return ((), cursor['id'])
+    return (value_key(field_value(cursor, order_by, None)), cursor['id'])
+
+class _AfterAllIds:
+    """Sorts after every document ID, to bisect past all entries sharing one value"""
+    
+    def __lt__(self, other):
+        return False
+    
+    def __gt__(self, other):
+        return True
+
+AFTER_ALL_IDS = _AfterAllIds()
+
+def range_bounds(entries: List[tuple], lo: int, hi: int, operator: str, value: Any) -> tuple:
+    """Narrow [lo, hi) of a sorted index to the entries matching a range filter
+    
+    Like Firestore, range filters only match values of the same type.
+    """
+    key = value_key(value)
+    lo = max(lo, bisect_left(entries, ((key[0],),)))
+    hi = min(hi, bisect_left(entries, ((key[0] + 1,),)))
+    if operator == ">":
+        lo = max(lo, bisect_left(entries, (key, AFTER_ALL_IDS)))
+    elif operator == ">=":
+        lo = max(lo, bisect_left(entries, (key,)))
+    elif operator == "<":
+        hi = min(hi, bisect_left(entries, (key,)))
+    elif operator == "<=":
+        hi = min(hi, bisect_left(entries, (key, AFTER_ALL_IDS)))
+    return lo, hi
+
+def _range_operator(compare):
+    def check(field_value, value):
+        if field_value is _MISSING or field_value is None:
+            return False
+        left, right = value_key(field_value), value_key(value)
+        return left[0] == right[0] and compare(left, right)
+    return check
+
+# Marks a field absent from a document (distinct from a stored None)
+_MISSING = object()
+
+def field_value(item: Dict[str, Any], field: str, default: Any = _MISSING) -> Any:
+    """Value at a Firestore field path ('a.b' is field b of map a), or `default` if absent"""
+    if "." not in field:
+        return item.get(field, default)
+    value = item
+    for part in field.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return value
+
+RANGE_OPERATORS = ("<", "<=", ">", ">=")
+
+# Filter operators understood by the mock backend, called with the document's
+# field value (or _MISSING) and the filter value
+MOCK_OPERATORS = {
+    "==": lambda field_value, value: field_value is not _MISSING and value_key(field_value) == value_key(value),
+    "!=": lambda field_value, value: (field_value is not _MISSING and field_value is not None
+                                      and value_key(field_value) != value_key(value)),
+    "<": _range_operator(operator.lt),
+    "<=": _range_operator(operator.le),
+    ">": _range_operator(operator.gt),
+    ">=": _range_operator(operator.ge),
+    "in": lambda field_value, value: (field_value is not _MISSING
+                                      and value_key(field_value) in {value_key(option) for option in value}),
+    "not-in": lambda field_value, value: (field_value is not _MISSING and field_value is not None
+                                          and value_key(field_value) not in {value_key(option) for option in value}),
+    "array-contains": lambda field_value, value: (isinstance(field_value, list)
+                                                  and value_key(value) in [value_key(element) for element in field_value]),
+    "array-contains-any": lambda field_value, value: (isinstance(field_value, list)
+                                                      and bool({value_key(element) for element in field_value}
+                                                               & {value_key(option) for option in value})),
+}
+
+# Aggregations understood by aggregate(): ("count", None), ("sum", field), ("avg", field)
+AGGREGATION_OPERATIONS = ("count", "sum", "avg")
+
+def aggregation_alias(operation: str, field: Optional[str]) -> str:
+    """Result key for one aggregation: 'count', 'sum_<field>' or 'avg_<field>'"""
+    if operation not in AGGREGATION_OPERATIONS:
+        raise ValueError(f"Unsupported aggregation: {operation}")
+    return operation if operation == "count" else f"{operation}_{field}"
+
+def compute_aggregations(data: List[Dict[str, Any]], aggregations: List[tuple]) -> Dict[str, Any]:
+    """Local fallback for aggregate(); like Firestore, sum/avg skip non-numeric values"""
+    result = {}
+    for operation, field in aggregations:
+        alias = aggregation_alias(operation, field)
+        if operation == "count":
+            result[alias] = len(data)
+            continue
+        values = [field_value(item, field, None) for item in data]
+        numbers = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        if operation == "sum":
+            result[alias] = sum(numbers)
+        else:
+            result[alias] = sum(numbers) / len(numbers) if numbers else None
+    return result
+
+def build_aggregation_query(query, aggregations: List[tuple]):
+    """Turn a Firestore query into an AggregationQuery computing `aggregations` server-side"""
+    aggregation_query = query
+    for operation, field in aggregations:
+        alias = aggregation_alias(operation, field)
+        if operation == "count":
+            aggregation_query = aggregation_query.count(alias=alias)
+        elif operation == "sum":
+            aggregation_query = aggregation_query.sum(field, alias=alias)
+        else:
+            aggregation_query = aggregation_query.avg(field, alias=alias)
+    return aggregation_query
+
+def project_document(item: Dict[str, Any], select: List[str]) -> Dict[str, Any]:
+    """Keep only the selected fields (plus 'id'), like a Firestore field mask
+    
+    A field path 'a.b' keeps only field b of map a, still nested under a.
+    """
+    projected: Dict[str, Any] = {}
+    for field in select:
+        value = field_value(item, field)
+        if value is _MISSING:
+            continue
+        *parents, last = field.split(".")
+        target = projected
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[last] = value
+    projected['id'] = item.get('id')
+    return projected
+
+def match_filter(item: Dict[str, Any], field: str, operator: str, value: Any) -> bool:
+    """Evaluate one (field, operator, value) filter against a mock document"""
+    if operator not in MOCK_OPERATORS:
+        raise ValueError(f"Unsupported operator: {operator}")
+    # Firestore never matches missing fields, and only == / in match null
+    return MOCK_OPERATORS[operator](field_value(item, field), value)
+
+# Firestore rejects batches with more than 500 writes
+BATCH_WRITE_LIMIT = 500
+
+def chunked(items: List[Any], size: int = BATCH_WRITE_LIMIT):
+    """Split a list into consecutive chunks of at most `size` items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def bulk_result(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Summarise per-document results of a bulk write"""
+    for result in results:
+        if result.get('error') is None:
+            result.pop('error', None)
+    succeeded = sum(1 for result in results if result['success'])
+    return {
+        "success": succeeded == len(results),
+        "results": results,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded
+    }
+
+def build_query(collection_ref, filters: Optional[List[tuple]] = None,
+                order_by: Optional[str] = None, limit: Optional[int] = None,
+                descending: bool = False, start_after: Optional[Dict[str, Any]] = None,
+                end_before: Optional[Dict[str, Any]] = None, select: Optional[List[str]] = None):
+    """Apply filters, ordering, keyset cursors, limit and field mask to a Firestore collection reference
+    
+    Cursors are partial documents holding the order_by field and 'id' (any
+    document previously returned by the same query works). Results are
+    ordered by document ID after order_by so cursors are unambiguous.
+    Works for both the sync client and the AsyncClient, whose query
+    objects share the same builder API.
+    """
+    query = collection_ref
+    direction = "DESCENDING" if descending else "ASCENDING"
+    
+    if select is not None:
+        # Field mask: only these fields are sent over the wire
+        query = query.select(select)
+    
+    if filters:
+        for field, operator, value in normalize_filters(filters):
+            query = query.where(field, operator, value)
+    
+    if order_by:
+        query = query.order_by(order_by, direction=direction)
+    
+    if order_by or start_after or end_before:
+        query = query.order_by("__name__", direction=direction)
+    
+    if start_after:
+        query = query.start_after(cursor_values(start_after, order_by))
+    
+    if end_before:
+        query = query.end_before(cursor_values(end_before, order_by))
+    
+    if limit:
+        # Paging backwards wants the page right before the cursor
+        query = query.limit_to_last(limit) if end_before and not start_after else query.limit(limit)
+    
+    return query
+
+def cursor_values(cursor: Dict[str, Any], order_by: Optional[str]) -> List[Any]:
+    """Cursor values in the same order as build_query's order_by clauses"""
+    if not order_by:
+        return [cursor['id']]
+    value = field_value(cursor, order_by, None)
+    return [to_utc(value) if isinstance(value, datetime) else value, cursor['id']]
+
+def snapshot_to_dict(doc) -> Dict[str, Any]:
+    """Convert a Firestore document snapshot into a plain dict with its id"""
+    data = doc.to_dict()
+    data['id'] = doc.id
+    return normalize_timestamps(data)
 
 class FirebaseManager:
     """Firebase Firestore database manager with lazy initialization"""
@@ -104,20 +757,51 @@ class FirebaseManager:
     def __init__(self):
         self.db = None
         self.is_demo_mode = False
+        # True when self.db is an in-process store (MockFirestore or
+        # SQLiteFirestore) exposing the document API instead of a Firestore client
+        self.is_local_backend = False
+        # Live local copies of whole collections (see backend.services.replica)
+        self.replicas: Dict[str, Any] = {}
         self._initialized = False
+        self._init_lock = threading.Lock()
+        self.init_seconds: Optional[float] = None
+        self.cold_start_seconds: Optional[float] = None
         print("🔥 Firebase Manager criado (inicialização lazy)")
     
     def _ensure_initialized(self):
-        """Ensure Firebase is initialized when needed"""
+        """Ensure Firebase is initialized when needed
+        
+        Concurrent first callers wait for a single initialization instead of
+        racing through initialize_app together.
+        """
         if self._initialized:
             return
         
+        with self._init_lock:
+            if self._initialized:
+                return
+            started = time.monotonic()
+            self._initialize()
+            self.init_seconds = time.monotonic() - started
+    
+    def _initialize(self):
+        """Pick the backend and create its client (called once, under the init lock)"""
         try:
+            # Local persistent storage replaces Firestore entirely
+            if settings.STORAGE_BACKEND == "sqlite":
+                from backend.database.sqlite_backend import SQLiteFirestore
+                print(f"🗄️ Usando armazenamento SQLite local: {settings.SQLITE_DATABASE_PATH}")
+                self.db = SQLiteFirestore(settings.SQLITE_DATABASE_PATH)
+                self.is_local_backend = True
+                self._initialized = True
+                return
+            
             # Check if Firebase is disabled
             if not settings.FIREBASE_ENABLED:
                 print("🔥 Firebase DESABILITADO - usando modo DEMO")
                 self.db = MockFirestore()
                 self.is_demo_mode = True
+                self.is_local_backend = True
                 self._initialized = True
                 return
                 
@@ -127,6 +811,7 @@ class FirebaseManager:
                 print("🔥 Firebase em modo DEMO (sem credenciais reais)")
                 self.db = MockFirestore()
                 self.is_demo_mode = True
+                self.is_local_backend = True
                 self._initialized = True
                 return
             
@@ -187,6 +872,7 @@ class FirebaseManager:
             print("🔥 Iniciando em modo DEMO")
             self.db = MockFirestore()
             self.is_demo_mode = True
+            self.is_local_backend = True
             self._initialized = True
     
     def is_connected(self) -> bool:
@@ -194,40 +880,140 @@ class FirebaseManager:
         self._ensure_initialized()
         return self.db is not None
     
+    def warm_up(self) -> Dict[str, Any]:
+        """Initialize eagerly and open the channel with one cheap read, timing the cold start"""
+        started = time.monotonic()
+        self._ensure_initialized()
+        # Document names only: no field is transferred
+        result = self.query_collection("usuarios", limit=1, select=[])
+        self.cold_start_seconds = time.monotonic() - started
+        return {"success": result['success'], "seconds": self.cold_start_seconds, "error": result.get('error')}
+    
+    def attach_replica(self, replica):
+        """Serve query_collection/aggregate for replica.collection from the replica while it is serving"""
+        self.replicas[replica.collection] = replica
+    
+    def detach_replica(self, collection: str):
+        self.replicas.pop(collection, None)
+    
+    def serving_replica(self, collection: str):
+        """The attached replica of a collection if it is loaded and current, else None"""
+        replica = self.replicas.get(collection)
+        return replica if replica is not None and replica.is_serving else None
+    
     def query_collection(self, collection: str, filters: Optional[List[tuple]] = None, 
-                        order_by: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
-        """Query a collection with optional filters"""
+                        order_by: Optional[str] = None, limit: Optional[int] = None,
+                        descending: bool = False, start_after: Optional[Dict[str, Any]] = None,
+                        end_before: Optional[Dict[str, Any]] = None,
+                        select: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Query a collection with optional filters
+        
+        `start_after` / `end_before` are keyset cursors (see build_query), so
+        reading one page costs O(limit) whatever the collection size.
+        `select` limits the returned documents to the listed fields.
+        """
         try:
             self._ensure_initialized()
             
             if not self.is_connected():
                 return {"success": False, "error": "Firebase not connected"}
             
-            if self.is_demo_mode:
-                return self.db.query_collection(collection, filters)
+            replica = self.serving_replica(collection)
+            if replica:
+                return replica.query_collection(filters, order_by, limit, descending,
+                                                start_after, end_before, select=select)
             
-            # Real Firebase query logic here
-            query = self.db.collection(collection)
+            cache_key = query_cache.key(collection, "query", filters, order_by, limit, descending,
+                                        start_after, end_before, select)
+            cached = query_cache.get(cache_key)
+            if cached is not None:
+                return cached
             
-            if filters:
-                for field, operator, value in filters:
-                    query = query.where(field, operator, value)
+            with query_recorder.observe(collection, "query", filters, order_by, descending):
+                if self.is_local_backend:
+                    result = self.db.query_collection(collection, filters, order_by, limit,
+                                                      descending, start_after, end_before, select=select)
+                else:
+                    # Real Firebase query logic here
+                    query = build_query(self.db.collection(collection), filters, order_by, limit,
+                                        descending, start_after, end_before, select=select)
+                
+                    def fetch(timeout):
+                        # limit_to_last queries cannot be streamed
+                        docs = (query.get(retry=None, timeout=timeout) if end_before
+                                else query.stream(retry=None, timeout=timeout))
+                        return [snapshot_to_dict(doc) for doc in docs]
+                
+                    result = {"success": True, "data": firestore_guard.call("query", fetch, idempotent=True)}
+            
+            query_cache.put(cache_key, result)
+            return result
+            
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    def iter_collection(self, collection: str, filters: Optional[List[tuple]] = None,
+                        order_by: Optional[str] = None, batch_size: int = 500,
+                        select: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield documents lazily, reading `batch_size` at a time with keyset cursors
+        
+        Only one page is held in memory, whatever the collection size.
+        Raises RuntimeError if a page cannot be read.
+        """
+        if select is not None and order_by and order_by not in select:
+            # The cursor needs the order_by value of the last document
+            select = select + [order_by]
+        
+        start_after = None
+        while True:
+            result = self.query_collection(collection, filters, order_by, batch_size,
+                                           start_after=start_after, select=select)
+            if not result['success']:
+                raise RuntimeError(result['error'])
+            
+            page = result['data']
+            yield from page
+            
+            if len(page) < batch_size:
+                return
+            start_after = page[-1]
+    
+    def aggregate(self, collection: str, filters: Optional[List[tuple]] = None,
+                  aggregations: Optional[List[tuple]] = None) -> Dict[str, Any]:
+        """Run count/sum/avg aggregations server-side without downloading documents
+        
+        `aggregations` is a list of ("count", None), ("sum", field) or
+        ("avg", field) tuples (default: count). Results are keyed by
+        aggregation_alias, e.g. {"count": 42, "avg_nota": 4.5}.
+        """
+        try:
+            self._ensure_initialized()
             
-            if order_by:
-                query = query.order_by(order_by)
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
             
-            if limit:
-                query = query.limit(limit)
+            aggregations = aggregations or [("count", None)]
             
-            docs = query.stream()
+            replica = self.serving_replica(collection)
+            if replica:
+                return replica.aggregate(filters, aggregations)
             
-            data = []
-            for doc in docs:
-                doc_data = doc.to_dict()
-                doc_data['id'] = doc.id
-                data.append(doc_data)
+            cache_key = query_cache.key(collection, "aggregate", filters, aggregations)
+            cached = query_cache.get(cache_key)
+            if cached is not None:
+                return cached
             
-            return {"success": True, "data": data}
+            with query_recorder.observe(collection, "aggregate", filters):
+                if self.is_local_backend:
+                    result = self.db.aggregate(collection, filters, aggregations)
+                else:
+                    query = build_aggregation_query(build_query(self.db.collection(collection), filters), aggregations)
+                    results = firestore_guard.call("aggregate", lambda timeout: query.get(retry=None, timeout=timeout),
+                                                   idempotent=True)
+                    result = {"success": True, "data": {result.alias: result.value for row in results for result in row}}
+            
+            query_cache.put(cache_key, result)
+            return result
             
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -240,23 +1026,29 @@ class FirebaseManager:
             if not self.is_connected():
                 return {"success": False, "error": "Firebase not connected"}
             
-            if self.is_demo_mode:
-                return self.db.create_document(collection, data)
+            if self.is_local_backend:
+                return self.db.create_document(collection, data, doc_id)
             
             # Real Firebase creation logic
-            data['created_at'] = datetime.now()
-            data['updated_at'] = datetime.now()
+            data['created_at'] = data.get('created_at') or utc_now()
+            data['updated_at'] = utc_now()
+            normalize_timestamps(data)
             
             if doc_id:
                 doc_ref = self.db.collection(collection).document(doc_id)
-                doc_ref.set(data)
+                firestore_guard.call("create", lambda timeout: doc_ref.set(data, retry=None, timeout=timeout))
                 return {"success": True, "id": doc_id, "data": data}
             else:
-                doc_ref = self.db.collection(collection).add(data)
+                doc_ref = firestore_guard.call(
+                    "create", lambda timeout: self.db.collection(collection).add(data, retry=None, timeout=timeout)
+                )
                 return {"success": True, "id": doc_ref[1].id, "data": data}
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
     
     def get_document(self, collection: str, doc_id: str) -> Dict[str, Any]:
         """Get a single document by ID"""
@@ -266,23 +1058,54 @@ class FirebaseManager:
             if not self.is_connected():
                 return {"success": False, "error": "Firebase not connected"}
             
-            if self.is_demo_mode:
+            if self.is_local_backend:
                 return self.db.get_document(collection, doc_id)
             
             # Real Firebase get logic
             doc_ref = self.db.collection(collection).document(doc_id)
-            doc = doc_ref.get()
+            doc = firestore_guard.call("get", lambda timeout: doc_ref.get(retry=None, timeout=timeout), idempotent=True)
             
             if doc.exists:
-                data = doc.to_dict()
-                data['id'] = doc.id
-                return {"success": True, "data": data}
+                return {"success": True, "data": snapshot_to_dict(doc)}
             else:
                 return {"success": False, "error": "Document not found"}
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def get_documents(self, collection: str, doc_ids: List[str]) -> Dict[str, Any]:
+        """Get many documents by ID with a single batched get_all call
+        
+        Duplicate and empty IDs are dropped; the result data is a dict keyed
+        by document ID and only contains documents that exist.
+        """
+        try:
+            self._ensure_initialized()
+            
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+            
+            unique_ids = unique_doc_ids(doc_ids)
+            if not unique_ids:
+                return {"success": True, "data": {}}
+            
+            if self.is_local_backend:
+                return self.db.get_documents(collection, unique_ids)
+            
+            collection_ref = self.db.collection(collection)
+            refs = [collection_ref.document(doc_id) for doc_id in unique_ids]
+            data = firestore_guard.call(
+                "get_all",
+                lambda timeout: {doc.id: snapshot_to_dict(doc)
+                                 for doc in self.db.get_all(refs, retry=None, timeout=timeout) if doc.exists},
+                idempotent=True
+            )
+            
+            return {"success": True, "data": data}
+            
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
     def update_document(self, collection: str, doc_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Update a document"""
         try:
@@ -291,18 +1114,100 @@ class FirebaseManager:
             if not self.is_connected():
                 return {"success": False, "error": "Firebase not connected"}
             
-            if self.is_demo_mode:
+            if self.is_local_backend:
                 return self.db.update_document(collection, doc_id, data)
             
             # Real Firebase update logic
-            data['updated_at'] = datetime.now()
+            data['updated_at'] = utc_now()
+            normalize_timestamps(data)
             doc_ref = self.db.collection(collection).document(doc_id)
-            doc_ref.update(data)
+            firestore_guard.call("update", lambda timeout: doc_ref.update(data, retry=None, timeout=timeout))
             
             return {"success": True, "id": doc_id}
             
         except Exception as e:
             return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+    
+    def update_and_get(self, collection: str, doc_id: str, data: Dict[str, Any],
+                       precondition: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None,
+                       derive: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Read, check and update a document in one transaction, returning the merged document
+        
+        `precondition(current)` receives the document as read inside the
+        transaction and returns a reason to refuse the write, or None.
+        `derive(current)`, called after it, returns extra fields computed from
+        the current document (e.g. a new version when a field changes); they
+        are written together with `data`. Both run again if the transaction is
+        retried. The check and the write are atomic, and the result needs no
+        second read. `data` must hold plain top-level fields (no sentinels or
+        dotted paths). Failures carry a "code": "not_found" or
+        "precondition_failed".
+        """
+        try:
+            self._ensure_initialized()
+            
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+            
+            if self.is_local_backend:
+                return self.db.update_and_get(collection, doc_id, data, precondition, derive)
+            
+            doc_ref = self.db.collection(collection).document(doc_id)
+            
+            @firestore.transactional
+            def read_check_write(transaction, timeout):
+                # Re-run from here if the transaction is retried on contention
+                snapshot = doc_ref.get(transaction=transaction, retry=None, timeout=timeout)
+                if not snapshot.exists:
+                    return {"success": False, "error": "Document not found", "code": "not_found"}
+                current = snapshot_to_dict(snapshot)
+                reason = precondition(current) if precondition else None
+                if reason:
+                    return {"success": False, "error": reason, "code": "precondition_failed"}
+                extra = derive(current) if derive else {}
+                fields = normalize_timestamps({**data, **extra, 'updated_at': utc_now()})
+                transaction.update(doc_ref, fields)
+                return {"success": True, "id": doc_id, "data": {**current, **fields}}
+            
+            return firestore_guard.call("transaction",
+                                        lambda timeout: read_check_write(self.db.transaction(), timeout))
+            
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+    
+    def increment_fields(self, collection: str, doc_id: str, increments: Dict[str, Any]) -> Dict[str, Any]:
+        """Atomically add to numeric fields of a document, creating it (and the fields) if missing
+        
+        `increments` is a nested map whose leaves are the amounts to add, e.g.
+        {"total": 1, "por_status": {"pendente": -1, "aprovada": 1}}. Each
+        amount is applied server-side, so concurrent callers never lose counts.
+        """
+        try:
+            self._ensure_initialized()
+            
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+            
+            if self.is_local_backend:
+                return self.db.increment_fields(collection, doc_id, increments)
+            
+            data = {**increment_transforms(increments), 'updated_at': utc_now()}
+            doc_ref = self.db.collection(collection).document(doc_id)
+            firestore_guard.call("increment", lambda timeout: doc_ref.set(data, merge=True, retry=None, timeout=timeout))
+            
+            return {"success": True, "id": doc_id}
+            
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
     
     def delete_document(self, collection: str, doc_id: str) -> Dict[str, Any]:
         """Delete a document"""
@@ -312,17 +1217,134 @@ class FirebaseManager:
             if not self.is_connected():
                 return {"success": False, "error": "Firebase not connected"}
             
-            if self.is_demo_mode:
+            if self.is_local_backend:
                 return self.db.delete_document(collection, doc_id)
             
             # Real Firebase delete logic
             doc_ref = self.db.collection(collection).document(doc_id)
-            doc_ref.delete()
+            firestore_guard.call("delete", lambda timeout: doc_ref.delete(retry=None, timeout=timeout))
             
             return {"success": True}
             
         except Exception as e:
             return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+
+    def create_documents(self, collection: str, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Create many documents using chunked WriteBatch commits
+        
+        A document carrying an 'id' key is written under that ID, otherwise
+        Firestore generates one. Returns one result per input document.
+        """
+        try:
+            self._ensure_initialized()
+            
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+            
+            if self.is_local_backend:
+                return self.db.create_documents(collection, documents)
+            
+            collection_ref = self.db.collection(collection)
+            results = []
+            
+            for chunk in chunked(documents):
+                batch = self.db.batch()
+                chunk_ids = []
+                
+                for document in chunk:
+                    data = dict(document)
+                    doc_id = data.pop('id', None)
+                    data['created_at'] = data.get('created_at') or utc_now()
+                    data['updated_at'] = utc_now()
+                    normalize_timestamps(data)
+                    doc_ref = collection_ref.document(doc_id) if doc_id else collection_ref.document()
+                    batch.set(doc_ref, data)
+                    chunk_ids.append(doc_ref.id)
+                
+                results.extend(commit_batch(batch, chunk_ids))
+            
+            return bulk_result(results)
+            
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+    
+    def update_documents(self, collection: str, updates: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Update many documents ({doc_id: fields}) using chunked WriteBatch commits"""
+        try:
+            self._ensure_initialized()
+            
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+            
+            if self.is_local_backend:
+                return self.db.update_documents(collection, updates)
+            
+            collection_ref = self.db.collection(collection)
+            results = []
+            
+            for chunk in chunked(list(updates.items())):
+                batch = self.db.batch()
+                
+                for doc_id, data in chunk:
+                    batch.update(collection_ref.document(doc_id), normalize_timestamps({**data, 'updated_at': utc_now()}))
+                
+                results.extend(commit_batch(batch, [doc_id for doc_id, _ in chunk]))
+            
+            return bulk_result(results)
+            
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+    
+    def delete_documents(self, collection: str, doc_ids: List[str]) -> Dict[str, Any]:
+        """Delete many documents using chunked WriteBatch commits"""
+        try:
+            self._ensure_initialized()
+            
+            if not self.is_connected():
+                return {"success": False, "error": "Firebase not connected"}
+            
+            if self.is_local_backend:
+                return self.db.delete_documents(collection, doc_ids)
+            
+            collection_ref = self.db.collection(collection)
+            results = []
+            
+            for chunk in chunked(list(doc_ids)):
+                batch = self.db.batch()
+                
+                for doc_id in chunk:
+                    batch.delete(collection_ref.document(doc_id))
+                
+                results.extend(commit_batch(batch, chunk))
+            
+            return bulk_result(results)
+            
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            # Writes invalidate cached reads of the collection
+            query_cache.invalidate(collection)
+
+def unique_doc_ids(doc_ids: List[str]) -> List[str]:
+    """Drop empty and duplicate IDs while keeping first-seen order"""
+    return list(dict.fromkeys(doc_id for doc_id in doc_ids if doc_id))
+
+def commit_batch(batch, doc_ids: List[str]) -> List[Dict[str, Any]]:
+    """Commit a WriteBatch; a batch is atomic, so its documents share one outcome"""
+    try:
+        firestore_guard.call("commit", lambda timeout: batch.commit(retry=None, timeout=timeout))
+        return [{"success": True, "id": doc_id} for doc_id in doc_ids]
+    except Exception as e:
+        return [{"success": False, "id": doc_id, "error": str(e)} for doc_id in doc_ids]
 
 # Create global instance
 firebase_manager = FirebaseManager()
@@ -0,0 +1,130 @@
+"""
+Opt-in cache of query_collection / aggregate results
+
+Results are keyed on (collection, query shape) and kept in a TTL + LRU
+cache. Every write the Firebase managers make to a collection bumps that
+collection's generation, which is part of the key: entries cached before
+the write can never be served again, including those stored by reads that
+were already in flight. Writes made by other processes are only picked up
+once the TTL expires, so keep TTLs short where that matters.
+"""
+
+import threading
+from typing import Any, Dict, Hashable, List, Optional
+
+from backend.core.cache import TTLCache
+from backend.core.config import settings
+
+def _freeze(value: Any) -> Hashable:
+    """Hashable form of a filter or cursor value; the type is kept so 1, 1.0 and True stay distinct"""
+    if isinstance(value, (list, tuple)):
+        return ("list", tuple(_freeze(element) for element in value))
+    if isinstance(value, dict):
+        return ("map", tuple(sorted((key, _freeze(element)) for key, element in value.items())))
+    return (type(value).__name__, value)
+
+def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a result so callers can mutate the documents they get back"""
+    data = result['data']
+    if isinstance(data, list):
+        data = [dict(item) for item in data]
+    else:
+        data = dict(data)
+    return {**result, "data": data}
+
+class QueryCache:
+    """Result cache with per-collection TTLs and write-through invalidation"""
+
+    def __init__(self, enabled: bool, maxsize: int, default_ttl: float, ttls: Dict[str, float]):
+        self.enabled = enabled
+        self.default_ttl = default_ttl
+        self.ttls = ttls
+        self.invalidations = 0
+        self.collection_counters: Dict[str, Dict[str, int]] = {}
+        self._cache = TTLCache(maxsize=maxsize, ttl=default_ttl)
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def ttl_for(self, collection: str) -> float:
+        return self.ttls.get(collection, self.default_ttl)
+
+    def key(self, collection: str, kind: str, *shape: Any) -> Optional[Hashable]:
+        """Cache key for one query, or None if this query is not cached
+
+        Must be taken before the backend is read, so a write that lands
+        during the read invalidates the result.
+        """
+        if not self.enabled or self.ttl_for(collection) <= 0:
+            return None
+        try:
+            key = (collection, self._generations.get(collection, 0), kind, _freeze(shape))
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key: Optional[Hashable]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        result = self._cache.get(key)
+        self._count(key[0], "hits" if result is not None else "misses")
+        return _copy_result(result) if result is not None else None
+
+    def put(self, key: Optional[Hashable], result: Dict[str, Any]):
+        """Store a successful result (failed reads are never cached)"""
+        if key is None or not result.get('success'):
+            return
+        self._cache.set(key, _copy_result(result), ttl=self.ttl_for(key[0]))
+
+    def invalidate(self, collection: str):
+        """Forget every cached result for `collection` (called after each write to it)
+
+        Generations are bumped even while the cache is disabled, as other
+        in-process caches (the suggestions snapshot) use them to detect writes.
+        """
+        with self._lock:
+            self._generations[collection] = self._generations.get(collection, 0) + 1
+            self.invalidations += 1
+
+    def generation(self, collection: str) -> int:
+        """Number of writes seen for `collection` so far in this process"""
+        return self._generations.get(collection, 0)
+
+    def clear(self):
+        with self._lock:
+            for collection in self._generations:
+                self._generations[collection] += 1
+        self._cache.clear()
+
+    def _count(self, collection: str, counter: str):
+        with self._lock:
+            counters = self.collection_counters.setdefault(collection, {"hits": 0, "misses": 0})
+            counters[counter] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            collections = {name: dict(counters) for name, counters in self.collection_counters.items()}
+        return {
+            "enabled": self.enabled,
+            **self._cache.stats(),
+            "ttls": {"default": self.default_ttl, **self.ttls},
+            "invalidations": self.invalidations,
+            "collections": collections
+        }
+
+def parse_ttls(spec: str) -> Dict[str, float]:
+    """Parse "sugestoes:30,usuarios:120" into {collection: seconds}"""
+    ttls = {}
+    for item in spec.split(","):
+        if ":" in item:
+            collection, seconds = item.split(":", 1)
+            ttls[collection.strip()] = float(seconds)
+    return ttls
+
+# Instância global, compartilhada pelos gerenciadores síncrono e assíncrono
+query_cache = QueryCache(
+    enabled=settings.QUERY_CACHE_ENABLED,
+    maxsize=settings.QUERY_CACHE_MAX_ENTRIES,
+    default_ttl=settings.QUERY_CACHE_TTL,
+    ttls=parse_ttls(settings.QUERY_CACHE_TTLS)
+)
@@ -0,0 +1,197 @@
+"""
+Query-shape recorder and Firestore composite-index advisor
+
+Every query the Firebase managers send to the backend is reduced to its
+shape (collection, equality / array / inequality filter fields, ordering),
+and the recorder keeps the frequency, latency and errors of each shape.
+Queries answered by a live replica or the query cache are not recorded:
+they never touch Firestore's indexes.
+
+composite_index() turns a shape into the composite index Firestore needs
+for it (or None when single-field indexes are enough), and
+firestore_indexes() builds a `firestore.indexes.json` document for
+`firebase deploy --only firestore:indexes`. See
+scripts/firestore_index_advisor.py.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from backend.core.config import settings
+
+EQUALITY_OPERATORS = ("==", "in")
+ARRAY_OPERATORS = ("array-contains", "array-contains-any")
+INEQUALITY_OPERATORS = ("<", "<=", ">", ">=", "!=", "not-in")
+
+def query_shape(collection: str, filters: Optional[List[tuple]] = None,
+                order_by: Optional[str] = None, descending: bool = False) -> Dict[str, Any]:
+    """The index-relevant part of a query: which fields are filtered how, and the ordering"""
+    equality, array, inequality = set(), set(), set()
+    for field, operator, _ in filters or []:
+        if operator in ARRAY_OPERATORS:
+            array.add(field)
+        elif operator in INEQUALITY_OPERATORS:
+            inequality.add(field)
+        else:
+            equality.add(field)
+    return {
+        "collection": collection,
+        "equality": sorted(equality),
+        "array": sorted(array),
+        "inequality": sorted(inequality),
+        "order_by": order_by,
+        "descending": bool(order_by and descending)
+    }
+
+def shape_key(shape: Dict[str, Any]) -> str:
+    """Readable, stable identifier of a shape, e.g. 'sugestoes: status ==, usuario_id == | created_at DESC'"""
+    parts = ([f"{field} ==" for field in shape['equality']]
+             + [f"{field} array-contains" for field in shape['array']]
+             + [f"{field} range" for field in shape['inequality']])
+    key = f"{shape['collection']}: {', '.join(parts) or '*'}"
+    if shape['order_by']:
+        key += f" | {shape['order_by']} {'DESC' if shape['descending'] else 'ASC'}"
+    return key
+
+def composite_index(shape: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Composite index serving `shape`, or None if Firestore's single-field indexes suffice
+
+    Equality-only queries are served by merging single-field indexes, and
+    so is anything touching a single field. Otherwise the index lists the
+    equality fields, then the array-contains field, then inequality
+    fields, then the order_by field in the query's direction.
+    """
+    if not shape['array'] and not shape['inequality'] and not shape['order_by']:
+        return None
+
+    fields: List[Dict[str, str]] = []
+    seen = set()
+
+    def add(field_path: str, **config: str):
+        if field_path not in seen:
+            seen.add(field_path)
+            fields.append({"fieldPath": field_path, **config})
+
+    for field in shape['equality']:
+        add(field, order="ASCENDING")
+    for field in shape['array']:
+        add(field, arrayConfig="CONTAINS")
+    for field in shape['inequality']:
+        if field != shape['order_by']:
+            add(field, order="ASCENDING")
+    if shape['order_by']:
+        add(shape['order_by'], order="DESCENDING" if shape['descending'] else "ASCENDING")
+
+    if len(fields) < 2:
+        return None
+    return {"collectionGroup": shape['collection'], "queryScope": "COLLECTION", "fields": fields}
+
+def firestore_indexes(shapes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """firestore.indexes.json document covering `shapes` (duplicates removed)"""
+    indexes = {}
+    for shape in shapes:
+        index = composite_index(shape)
+        if index is not None:
+            indexes.setdefault(json.dumps(index, sort_keys=True), index)
+    ordered = sorted(indexes.values(), key=lambda index: (index['collectionGroup'], json.dumps(index['fields'])))
+    return {"indexes": ordered, "fieldOverrides": []}
+
+class QueryRecorder:
+    """Frequency, latency and errors of each distinct query shape"""
+
+    def __init__(self, enabled: bool = True, path: Optional[str] = None, max_shapes: int = 500):
+        self.enabled = enabled
+        self.path = Path(path) if path else None
+        self.max_shapes = max_shapes
+        self.dropped = 0
+        self.shapes: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def observe(self, collection: str, kind: str, filters: Optional[List[tuple]] = None,
+                order_by: Optional[str] = None, descending: bool = False) -> Iterator[None]:
+        """Time the enclosed backend read and record it (exceptions are recorded and re-raised)"""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(query_shape(collection, filters, order_by, descending), kind,
+                        time.perf_counter() - started, error=str(e))
+            raise
+        self.record(query_shape(collection, filters, order_by, descending), kind,
+                    time.perf_counter() - started)
+
+    def record(self, shape: Dict[str, Any], kind: str, seconds: float, error: Optional[str] = None):
+        key = shape_key(shape)
+        with self._lock:
+            entry = self.shapes.get(key)
+            if entry is None:
+                if len(self.shapes) >= self.max_shapes:
+                    self.dropped += 1
+                    return
+                entry = self.shapes[key] = {
+                    "shape": shape, "kinds": [], "count": 0, "errors": 0,
+                    "total_seconds": 0.0, "max_seconds": 0.0, "last_error": None, "last_seen": None
+                }
+            if kind not in entry['kinds']:
+                entry['kinds'].append(kind)
+            entry['count'] += 1
+            entry['total_seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            entry['last_seen'] = time.time()
+            if error is not None:
+                entry['errors'] += 1
+                entry['last_error'] = error
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Shapes, most frequent first, with mean latency and the index each needs"""
+        with self._lock:
+            entries = [(key, dict(entry)) for key, entry in self.shapes.items()]
+        report = []
+        for key, entry in sorted(entries, key=lambda item: item[1]['count'], reverse=True):
+            entry['key'] = key
+            entry['mean_seconds'] = entry['total_seconds'] / entry['count'] if entry['count'] else None
+            entry['composite_index'] = composite_index(entry['shape'])
+            report.append(entry)
+        return report
+
+    def load(self, path: Optional[str] = None):
+        """Merge counters persisted by a previous run"""
+        source = Path(path) if path else self.path
+        if source is None or not source.exists():
+            return
+        with open(source, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        with self._lock:
+            for key, entry in saved.get("shapes", {}).items():
+                current = self.shapes.get(key)
+                if current is None:
+                    self.shapes[key] = entry
+                    continue
+                current['count'] += entry['count']
+                current['errors'] += entry['errors']
+                current['total_seconds'] += entry['total_seconds']
+                current['max_seconds'] = max(current['max_seconds'], entry['max_seconds'])
+                current['kinds'] = sorted(set(current['kinds']) | set(entry['kinds']))
+                current['last_error'] = current['last_error'] or entry['last_error']
+
+    def save(self, path: Optional[str] = None):
+        target = Path(path) if path else self.path
+        if target is None:
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            payload = {"saved_at": time.time(), "shapes": self.shapes}
+            data = json.dumps(payload, ensure_ascii=False, indent=2)
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(data)
+
+# Instância global, compartilhada pelos gerenciadores síncrono e assíncrono
+query_recorder = QueryRecorder(enabled=settings.QUERY_STATS_ENABLED, path=settings.QUERY_STATS_FILE)
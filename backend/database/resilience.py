@@ -0,0 +1,278 @@
+"""
+Guarded Firestore calls: deadlines, read retries, circuit breaker, in-flight cap
+
+Every RPC the Firebase managers send to Firestore goes through `firestore_guard`:
+
+- each call gets one deadline (read or write timeout) covering all its attempts
+- idempotent reads that fail with a transient error are retried with
+  jittered exponential backoff while the deadline allows
+- after FIRESTORE_BREAKER_THRESHOLD consecutive transient failures the
+  circuit opens and calls fail fast for FIRESTORE_BREAKER_RESET_SECONDS,
+  then a single trial call decides whether it closes again
+- a semaphore caps the RPCs in flight per worker process
+
+Errors still surface as exceptions, so the managers keep returning
+{"success": False, "error": ...} as before, only sooner.
+"""
+
+import asyncio
+import concurrent.futures
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from google.api_core import exceptions as api_exceptions
+
+from backend.core.config import settings
+
+# Failures that say "the backend is unhealthy right now", not "this request is wrong"
+TRANSIENT_ERRORS = (
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.InternalServerError,
+    api_exceptions.Aborted,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.RetryError,
+    asyncio.TimeoutError,
+    concurrent.futures.TimeoutError,
+    TimeoutError,
+    ConnectionError,
+)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Firestore while the circuit is open"""
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half-open -> closed)"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_count = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        # Read once: callers outside the lock may race with record_success
+        opened_at = self._opened_at
+        if opened_at is None:
+            return "closed"
+        if time.monotonic() - opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        """Let a call through, or raise CircuitOpenError
+
+        Once the reset period has passed only one trial call is let through;
+        its outcome closes the circuit or opens it for another period.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            # record_success may clear it as soon as the lock is released
+            opened_at = self._opened_at
+        retry_in = max(0.0, self.reset_seconds - (time.monotonic() - opened_at))
+        raise CircuitOpenError(f"Firestore indisponível (circuito aberto, nova tentativa em {retry_in:.1f}s)")
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        """Forget a call that ended without an outcome (cancelled, or never sent)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._trial_in_flight or (self._opened_at is None
+                                         and self.consecutive_failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.opened_count += 1
+            self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        opened_at = self._opened_at
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "opened_count": self.opened_count,
+            "seconds_open": time.monotonic() - opened_at if opened_at is not None else None
+        }
+
+class CallGuard:
+    """Runs Firestore calls under a deadline, retry policy, breaker and concurrency cap
+
+    `func` receives the seconds left before the deadline and should pass
+    them on as the client call's `timeout` (with `retry=None`, so retries
+    happen here only). The sync and async paths share the breaker and the
+    metrics but have their own semaphore.
+    """
+
+    def __init__(self, read_timeout: float, write_timeout: float, read_retries: int,
+                 breaker: CircuitBreaker, max_in_flight: int,
+                 base_delay: float = 0.1, max_delay: float = 2.0):
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.read_retries = read_retries
+        self.breaker = breaker
+        self.max_in_flight = max_in_flight
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.operations: Dict[str, Dict[str, int]] = {}
+        self._thread_slots = threading.BoundedSemaphore(max_in_flight)
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+
+    def call(self, operation: str, func: Callable[[float], Any], idempotent: bool = False) -> Any:
+        """Run a blocking Firestore call"""
+        deadline = self._start(operation, idempotent)
+        attempt = 0
+        while True:
+            self._admit(operation)
+            if not self._thread_slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                self.breaker.release()
+                self._count(operation, "timeouts")
+                raise TimeoutError(f"Firestore {operation}: sem vaga para a chamada antes do prazo")
+            self._enter()
+            try:
+                result = func(max(0.0, deadline - time.monotonic()))
+            except TRANSIENT_ERRORS as e:
+                error = e
+            except Exception:
+                # The backend answered; the request itself was rejected
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                self._leave()
+                self._thread_slots.release()
+
+            attempt += 1
+            delay = self._on_transient_failure(operation, error, idempotent, attempt, deadline)
+            time.sleep(delay)
+
+    async def call_async(self, operation: str, func: Callable[[float], Awaitable[Any]],
+                         idempotent: bool = False) -> Any:
+        """Run an AsyncClient call; the deadline is also enforced with wait_for"""
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_in_flight)
+        deadline = self._start(operation, idempotent)
+        attempt = 0
+        while True:
+            self._admit(operation)
+            try:
+                await asyncio.wait_for(self._async_slots.acquire(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                self.breaker.release()
+                self._count(operation, "timeouts")
+                raise TimeoutError(f"Firestore {operation}: sem vaga para a chamada antes do prazo")
+            except BaseException:
+                self.breaker.release()
+                raise
+            self._enter()
+            try:
+                remaining = max(0.0, deadline - time.monotonic())
+                result = await asyncio.wait_for(func(remaining), remaining)
+            except TRANSIENT_ERRORS as e:
+                error = e
+            except Exception:
+                self.breaker.record_success()
+                raise
+            except BaseException:
+                # Cancelled by the caller: no verdict on the backend
+                self.breaker.release()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                self._leave()
+                self._async_slots.release()
+
+            attempt += 1
+            delay = self._on_transient_failure(operation, error, idempotent, attempt, deadline)
+            await asyncio.sleep(delay)
+
+    def _start(self, operation: str, idempotent: bool) -> float:
+        self._count(operation, "calls")
+        return time.monotonic() + (self.read_timeout if idempotent else self.write_timeout)
+
+    def _admit(self, operation: str):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._count(operation, "rejected")
+            raise
+
+    def _on_transient_failure(self, operation: str, error: Exception, idempotent: bool,
+                              attempt: int, deadline: float) -> float:
+        """Record a transient failure; return the backoff delay or re-raise if out of retries/time"""
+        self.breaker.record_failure()
+        self._count(operation, "failures")
+        if isinstance(error, (asyncio.TimeoutError, concurrent.futures.TimeoutError, TimeoutError,
+                              api_exceptions.DeadlineExceeded)):
+            self._count(operation, "timeouts")
+
+        # Full jitter: uniform in [0, min(max_delay, base * 2^attempt)]
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if not idempotent or attempt > self.read_retries or time.monotonic() + delay >= deadline:
+            raise error
+        self._count(operation, "retries")
+        return delay
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _count(self, operation: str, counter: str):
+        with self._lock:
+            counters = self.operations.setdefault(
+                operation, {"calls": 0, "retries": 0, "failures": 0, "timeouts": 0, "rejected": 0}
+            )
+            counters[counter] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            operations = {name: dict(counters) for name, counters in self.operations.items()}
+        return {
+            "breaker": self.breaker.stats(),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_in_flight": self.max_in_flight,
+            "read_timeout": self.read_timeout,
+            "write_timeout": self.write_timeout,
+            "read_retries": self.read_retries,
+            "operations": operations
+        }
+
+# Instância global, compartilhada pelos gerenciadores síncrono e assíncrono
+firestore_guard = CallGuard(
+    read_timeout=settings.FIRESTORE_READ_TIMEOUT,
+    write_timeout=settings.FIRESTORE_WRITE_TIMEOUT,
+    read_retries=settings.FIRESTORE_READ_RETRIES,
+    breaker=CircuitBreaker(settings.FIRESTORE_BREAKER_THRESHOLD, settings.FIRESTORE_BREAKER_RESET_SECONDS),
+    max_in_flight=settings.FIRESTORE_MAX_CONCURRENT_RPCS
+)
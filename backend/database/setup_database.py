@@ -14,12 +14,12 @@ sys.path.insert(0, str(root_dir))
 
 from backend.database.firebase_connection import FirebaseManager
 from backend.core.config import settings
+from backend.services.password_hasher import password_hasher
 from datetime import datetime
-import hashlib
 
 def hash_password(password: str) -> str:
-    """Hash de senha usando SHA-256 (básico para setup)"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash de senha com o mesmo KDF usado pela API"""
+    return password_hasher.hash(password)
 
 def setup_firebase():
     """Configurar Firebase e dados iniciais"""
@@ -0,0 +1,550 @@
+"""
+Persistent SQLite storage implementing the same document API as MockFirestore
+
+All collections share one table of JSON documents. Hot fields get generated
+columns and composite indexes so the common filter/order combinations are
+served from indexes. Queries follow Firestore semantics where SQLite allows:
+missing fields never match, range filters only match values of the same
+type and ordering drops documents without the order_by field. Booleans
+sort together with numbers.
+
+Timestamps are stored as fixed-width UTC ISO-8601 text, so they compare
+and sort chronologically. The names of top-level timestamp fields are kept
+per document so they come back as timezone-aware datetimes.
+"""
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Any
+from backend.database.firebase_connection import (
+    ChangeNotifier, new_document_id, project_document, aggregation_alias, bulk_result, MOCK_OPERATORS, RANGE_OPERATORS,
+    utc_now, normalize_timestamps, add_increments, field_value, value_key
+)
+
+# Fields with a generated column and index; created_at is also the second
+# column of the other indexes, since it is the usual order_by
+HOT_FIELDS = ("status", "setor_origem", "usuario_id", "created_at")
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f+00:00"
+
+# json_type() values per Firestore value type, used as range/equality guards
+JSON_TYPES = {
+    "null": ("null",),
+    "bool": ("true", "false"),
+    "number": ("integer", "real"),
+    "text": ("text",),
+    "timestamp": ("text",),
+    "array": ("array",),
+    "map": ("object",),
+}
+
+def encode_timestamp(value: datetime) -> str:
+    """Fixed-width UTC text (naive datetimes are local time, see to_utc)"""
+    return value.astimezone(timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+def decode_timestamp(value: str) -> datetime:
+    # TIMESTAMP_FORMAT is ISO-8601, which fromisoformat parses much faster than strptime
+    return datetime.fromisoformat(value)
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return encode_timestamp(value)
+    return str(value)
+
+def encode_document(item: Dict[str, Any]) -> tuple:
+    """(data JSON, timestamp field names JSON) for one stored document"""
+    data = {key: value for key, value in item.items() if key != 'id'}
+    timestamps = sorted(key for key, value in data.items() if isinstance(value, datetime))
+    return (json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_json_default),
+            json.dumps(timestamps))
+
+def decode_document(doc_id: str, data: str, timestamps: str) -> Dict[str, Any]:
+    item = json.loads(data)
+    for key in json.loads(timestamps):
+        if isinstance(item.get(key), str):
+            item[key] = decode_timestamp(item[key])
+    item['id'] = doc_id
+    return item
+
+def value_type(value: Any) -> str:
+    """Key of JSON_TYPES for a filter value"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, (list, tuple)):
+        return "array"
+    if isinstance(value, dict):
+        return "map"
+    if isinstance(value, datetime):
+        return "timestamp"
+    return "text"
+
+def sql_value(value: Any) -> Any:
+    """Bind parameter comparable with json_extract() of the stored value"""
+    if isinstance(value, datetime):
+        return encode_timestamp(value)
+    if isinstance(value, (list, tuple, dict)):
+        # json_extract returns arrays and maps as minified JSON text
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+    return value
+
+def type_list(kind: str) -> str:
+    """SQL list of the json_type() values of one Firestore value type"""
+    return "(" + ", ".join(f"'{json_type}'" for json_type in JSON_TYPES[kind]) + ")"
+
+def sql_literal(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+def json_path(field: str) -> str:
+    """JSON path for a Firestore field path ('a.b' is field b of map a)"""
+    return "$" + "".join('."' + part.replace('"', '""') + '"' for part in field.split("."))
+
+class SQLiteFirestore(ChangeNotifier):
+    """SQLite-backed document store with the MockFirestore method set
+
+    One connection is shared and serialized by a lock; WAL mode keeps
+    external readers (backups, sqlite3 CLI) from blocking writes.
+    """
+
+    # Bulk creates larger than this refresh the query planner statistics
+    BULK_ANALYZE_THRESHOLD = 1000
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        # Autocommit; multi-statement writes use explicit transactions
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        # Refresh planner statistics so hot-field indexes are chosen
+        self._conn.execute("PRAGMA optimize")
+
+    def _create_schema(self):
+        generated = ",\n".join(
+            f"    {field} GENERATED ALWAYS AS (json_extract(data, {sql_literal(json_path(field))})) VIRTUAL"
+            for field in HOT_FIELDS
+        )
+        with self._lock:
+            self._conn.execute(f"""
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    timestamps TEXT NOT NULL DEFAULT '[]',
+{generated},
+    PRIMARY KEY (collection, id)
+) WITHOUT ROWID""")
+            for field in HOT_FIELDS:
+                columns = f"collection, {field}, id" if field == "created_at" else f"collection, {field}, created_at, id"
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_documents_{field} ON documents ({columns})")
+
+    @contextmanager
+    def _transaction(self):
+        """Serialize on the lock and run the block in one SQLite transaction"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.execute("PRAGMA optimize")
+            self._conn.close()
+
+    # Query compilation: field paths are inlined as quoted literals, so only
+    # filter and cursor values are bound as parameters
+
+    def _field(self, field: str) -> str:
+        """SQL expression for a field's value (the generated column for hot fields)"""
+        if field in HOT_FIELDS:
+            return field
+        return f"json_extract(data, {sql_literal(json_path(field))})"
+
+    def _field_type(self, field: str) -> str:
+        return f"json_type(data, {sql_literal(json_path(field))})"
+
+    def _type_rank(self, field: str) -> str:
+        """SQL expression for the rank of a field's value type in Firestore's ordering (value_key()[0])"""
+        text_rank = "4"
+        if "." not in field:
+            text_rank = f"CASE WHEN instr(timestamps, {sql_literal(json.dumps(field))}) > 0 THEN 3 ELSE 4 END"
+        return (f"CASE {self._field_type(field)} WHEN 'null' THEN 0 WHEN 'true' THEN 1 WHEN 'false' THEN 1 "
+                f"WHEN 'integer' THEN 2 WHEN 'real' THEN 2 WHEN 'text' THEN {text_rank} "
+                f"WHEN 'array' THEN 7 ELSE 8 END")
+
+    def _type_guard(self, field: str, kind: str) -> str:
+        """Clause restricting a field to one Firestore value type"""
+        if field in HOT_FIELDS and kind in ("text", "timestamp"):
+            # typeof() on the generated column avoids parsing the document
+            clause = f"typeof({field}) = 'text'"
+        else:
+            clause = f"{self._field_type(field)} IN {type_list(kind)}"
+        if kind in ("text", "timestamp") and "." not in field:
+            # Timestamps are text too; the per-document list tells them apart
+            listed = f"instr(timestamps, {sql_literal(json.dumps(field))})"
+            clause += f" AND {listed} > 0" if kind == "timestamp" else f" AND {listed} = 0"
+        return clause
+
+    def _equals(self, field: str, value: Any, params: List[Any]) -> str:
+        kind = value_type(value)
+        if kind == "null":
+            return f"{self._field_type(field)} = 'null'"
+        params.append(sql_value(value))
+        clause = f"{self._field(field)} = ?"
+        if kind not in ("array", "map"):
+            # json_extract turns booleans into 0/1 and timestamps into text
+            clause += f" AND {self._type_guard(field, kind)}"
+        return f"({clause})"
+
+    def _filter(self, field: str, operator: str, value: Any, params: List[Any]) -> str:
+        if operator not in MOCK_OPERATORS:
+            raise ValueError(f"Unsupported operator: {operator}")
+
+        if operator == "==":
+            return self._equals(field, value, params)
+
+        if operator == "in":
+            if not value:
+                return "0"
+            return "(" + " OR ".join(self._equals(field, option, params) for option in value) + ")"
+
+        if operator in ("!=", "not-in"):
+            options = [value] if operator == "!=" else list(value)
+            # Missing fields and nulls never match
+            clause = f"{self._field_type(field)} IS NOT NULL AND {self._field_type(field)} != 'null'"
+            for option in options:
+                if option is not None:
+                    clause += f" AND NOT {self._equals(field, option, params)}"
+            return f"({clause})"
+
+        if operator in RANGE_OPERATORS:
+            kind = value_type(value)
+            if kind == "null":
+                return "0"
+            params.append(sql_value(value))
+            return f"({self._field(field)} {operator} ? AND {self._type_guard(field, kind)})"
+
+        # array-contains / array-contains-any
+        options = [value] if operator == "array-contains" else list(value)
+        if not options:
+            return "0"
+        matches = []
+        for option in options:
+            kind = value_type(option)
+            if kind == "null":
+                matches.append("element.type = 'null'")
+                continue
+            params.append(sql_value(option))
+            match = "element.value = ?"
+            if kind in ("bool", "number"):
+                match += f" AND element.type IN {type_list(kind)}"
+            matches.append(f"({match})")
+        return (f"EXISTS (SELECT 1 FROM json_each(data, {sql_literal(json_path(field))}) AS element "
+                f"WHERE {' OR '.join(matches)})")
+
+    def _keyset(self, cursor: Dict[str, Any], order_by: Optional[str], after: bool, params: List[Any]) -> str:
+        """Rows strictly after (or before) a cursor in ascending (order_by, id) order"""
+        comparison = ">" if after else "<"
+        if not order_by:
+            params.append(cursor['id'])
+            return f"id {comparison} ?"
+
+        expression = self._field(order_by)
+        value = field_value(cursor, order_by, None)
+        if order_by not in HOT_FIELDS:
+            # Ordered by (type rank, value, id), see _order
+            rank = self._type_rank(order_by)
+            params.append(value_key(value)[0])
+            if value is None:
+                params.append(cursor['id'])
+                if after:
+                    return f"({rank} > ? OR id > ?)"
+                return f"({rank} = ? AND id < ?)"
+            params.extend([value_key(value)[0], sql_value(value), cursor['id']])
+            if after:
+                return f"({rank} > ? OR ({rank} = ? AND ({expression}, id) > (?, ?)))"
+            return f"({rank} < ? OR ({rank} = ? AND ({expression}, id) < (?, ?)))"
+
+        if value is None:
+            # NULL sorts first and row values cannot compare it
+            params.append(cursor['id'])
+            if after:
+                return f"({expression} IS NOT NULL OR id > ?)"
+            return f"({expression} IS NULL AND id < ?)"
+
+        params.extend([sql_value(value), cursor['id']])
+        if after:
+            return f"(({expression}, id) > (?, ?))"
+        return f"(({expression}, id) < (?, ?) OR {expression} IS NULL)"
+
+    def _where(self, collection: str, filters: Optional[List[tuple]], order_by: Optional[str],
+               descending: bool, start_after: Optional[Dict[str, Any]],
+               end_before: Optional[Dict[str, Any]], params: List[Any]) -> str:
+        params.append(collection)
+        clauses = ["collection = ?"]
+
+        for field, operator, value in filters or []:
+            clauses.append(self._filter(field, operator, value, params))
+
+        if order_by:
+            # Like Firestore: ordering drops documents without the field (a
+            # stored null is kept; the first test spares parsing the document)
+            clauses.append(f"({self._field(order_by)} IS NOT NULL OR {self._field_type(order_by)} IS NOT NULL)")
+
+        # In descending order "after" the cursor means a smaller (order_by, id)
+        if start_after:
+            clauses.append(self._keyset(start_after, order_by, not descending, params))
+        if end_before:
+            clauses.append(self._keyset(end_before, order_by, descending, params))
+
+        return " AND ".join(clauses)
+
+    def _order(self, order_by: Optional[str], descending: bool) -> str:
+        """ORDER BY clause with Firestore's cross-type ordering
+
+        Other fields are ranked by value type first (they have no index to
+        preserve). Hot fields keep their indexed order by value alone, which
+        matches Firestore as long as each holds one type besides null, as
+        the schema's strings and timestamps do.
+        """
+        direction = "DESC" if descending else "ASC"
+        if not order_by:
+            return f"id {direction}"
+        if order_by not in HOT_FIELDS:
+            return f"{self._type_rank(order_by)} {direction}, {self._field(order_by)} {direction}, id {direction}"
+        return f"{self._field(order_by)} {direction}, id {direction}"
+
+    # Document API
+
+    def query_collection(self, collection: str, filters: Optional[List[tuple]] = None,
+                         order_by: Optional[str] = None, limit: Optional[int] = None,
+                         descending: bool = False, start_after: Optional[Dict[str, Any]] = None,
+                         end_before: Optional[Dict[str, Any]] = None, select: Optional[List[str]] = None):
+        """Query collection with filters, (order_by, id) ordering, keyset cursors, limit and field mask"""
+        params: List[Any] = []
+        where = self._where(collection, filters, order_by, descending, start_after, end_before, params)
+
+        # Paging backwards (limit_to_last) reads the reversed order, then flips the page
+        from_end = bool(limit and end_before and not start_after)
+
+        sql = f"SELECT id, data, timestamps FROM documents WHERE {where}"
+        # An unordered, unlimited query is sorted by ID here instead, leaving
+        # SQLite free to pick a filter index over the primary key
+        sort_here = not (order_by or limit or start_after or end_before)
+        if not sort_here:
+            sql += f" ORDER BY {self._order(order_by, descending != from_end)}"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if sort_here:
+            rows.sort(reverse=descending)
+        if from_end:
+            rows.reverse()
+
+        data = [decode_document(*row) for row in rows]
+        if select is not None:
+            data = [project_document(item, select) for item in data]
+        return {"success": True, "data": data}
+
+    def aggregate(self, collection: str, filters: Optional[List[tuple]] = None,
+                  aggregations: Optional[List[tuple]] = None):
+        """count/sum/avg computed by SQLite; like Firestore, sum/avg skip non-numeric values"""
+        aggregations = aggregations or [("count", None)]
+        columns = []
+        for operation, field in aggregations:
+            aggregation_alias(operation, field)
+            if operation == "count":
+                columns.append("COUNT(*)")
+                continue
+            numeric = f"{self._field_type(field)} IN {type_list('number')}"
+            function = "SUM" if operation == "sum" else "AVG"
+            columns.append(f"{function}(CASE WHEN {numeric} THEN {self._field(field)} END)")
+
+        params: List[Any] = []
+        where = self._where(collection, filters, None, False, None, None, params)
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(columns)} FROM documents WHERE {where}", params).fetchone()
+
+        result = {}
+        for (operation, field), value in zip(aggregations, row):
+            if operation == "sum" and value is None:
+                value = 0
+            result[aggregation_alias(operation, field)] = value
+        return {"success": True, "data": result}
+
+    def _fetch(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT id, data, timestamps FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+        ).fetchone()
+        return decode_document(*row) if row else None
+
+    def _write(self, collection: str, item: Dict[str, Any]):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO documents (collection, id, data, timestamps) VALUES (?, ?, ?, ?)",
+            (collection, item['id'], *encode_document(item))
+        )
+
+    def create_document(self, collection: str, data: Dict[str, Any], doc_id: Optional[str] = None):
+        """Create document (an existing ID is overwritten, like set())"""
+        doc_id = doc_id or new_document_id()
+        data['id'] = doc_id
+        data['created_at'] = data.get('created_at') or utc_now()
+        data['updated_at'] = utc_now()
+        normalize_timestamps(data)
+
+        with self._lock:
+            self._write(collection, data)
+            self._notify(collection, [data], [])
+        return {"success": True, "id": doc_id}
+
+    def update_document(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        """Merge fields into an existing document"""
+        with self._lock:
+            with self._transaction():
+                item = self._fetch(collection, doc_id)
+                if item is None:
+                    return {"success": False, "error": "Document not found"}
+                item.update(data)
+                item['updated_at'] = utc_now()
+                normalize_timestamps(item)
+                self._write(collection, item)
+            # Listeners only hear about committed writes, in commit order
+            self._notify(collection, [item], [])
+        return {"success": True}
+
+    def update_and_get(self, collection: str, doc_id: str, data: Dict[str, Any],
+                       precondition: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None,
+                       derive: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        """Read, check and merge in one transaction (see FirebaseManager.update_and_get)"""
+        with self._lock:
+            with self._transaction():
+                item = self._fetch(collection, doc_id)
+                if item is None:
+                    return {"success": False, "error": "Document not found", "code": "not_found"}
+                reason = precondition(dict(item)) if precondition else None
+                if reason:
+                    return {"success": False, "error": reason, "code": "precondition_failed"}
+                extra = derive(dict(item)) if derive else {}
+                item.update(data)
+                item.update(extra)
+                item['updated_at'] = utc_now()
+                normalize_timestamps(item)
+                self._write(collection, item)
+            self._notify(collection, [item], [])
+        return {"success": True, "id": doc_id, "data": dict(item)}
+
+    def increment_fields(self, collection: str, doc_id: str, increments: Dict[str, Any]):
+        """Add to numeric fields in one transaction, creating the document if missing"""
+        with self._lock:
+            with self._transaction():
+                item = self._fetch(collection, doc_id) or {'id': doc_id, 'created_at': utc_now()}
+                add_increments(item, increments)
+                item['updated_at'] = utc_now()
+                normalize_timestamps(item)
+                self._write(collection, item)
+            self._notify(collection, [item], [])
+        return {"success": True, "id": doc_id}
+
+    def get_document(self, collection: str, doc_id: str):
+        with self._lock:
+            item = self._fetch(collection, doc_id)
+        if item is None:
+            return {"success": False, "error": "Document not found"}
+        return {"success": True, "data": item}
+
+    def get_documents(self, collection: str, doc_ids: List[str]):
+        """Multi-get (missing IDs are left out of the result)"""
+        data = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(doc_ids), 500):
+                chunk = list(doc_ids[start:start + 500])
+                rows = self._conn.execute(
+                    f"SELECT id, data, timestamps FROM documents WHERE collection = ? "
+                    f"AND id IN ({', '.join('?' * len(chunk))})", [collection, *chunk]
+                ).fetchall()
+                data.update((row[0], decode_document(*row)) for row in rows)
+        return {"success": True, "data": data}
+
+    def delete_document(self, collection: str, doc_id: str):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM documents WHERE collection = ? AND id = ?", (collection, doc_id))
+            if cursor.rowcount == 0:
+                return {"success": False, "error": "Document not found"}
+            self._notify(collection, [], [doc_id])
+        return {"success": True}
+
+    def create_documents(self, collection: str, documents: List[Dict[str, Any]]):
+        """Bulk create in one transaction (documents may carry their own 'id')"""
+        items = []
+        for document in documents:
+            item = dict(document)
+            item['id'] = item.get('id') or new_document_id()
+            item['created_at'] = item.get('created_at') or utc_now()
+            item['updated_at'] = utc_now()
+            normalize_timestamps(item)
+            items.append(item)
+
+        with self._lock:
+            with self._transaction():
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO documents (collection, id, data, timestamps) VALUES (?, ?, ?, ?)",
+                    [(collection, item['id'], *encode_document(item)) for item in items]
+                )
+            self._notify(collection, items, [])
+        if len(items) > self.BULK_ANALYZE_THRESHOLD:
+            # A large load changes the data distribution the planner relies on
+            with self._lock:
+                self._conn.execute("ANALYZE")
+        return bulk_result([{"success": True, "id": item['id']} for item in items])
+
+    def update_documents(self, collection: str, updates: Dict[str, Dict[str, Any]]):
+        """Bulk update in one transaction"""
+        results, updated = [], []
+        with self._lock:
+            with self._transaction():
+                for doc_id, data in updates.items():
+                    item = self._fetch(collection, doc_id)
+                    if item is None:
+                        results.append({"success": False, "id": doc_id, "error": "Document not found"})
+                        continue
+                    item.update(data)
+                    item['updated_at'] = utc_now()
+                    normalize_timestamps(item)
+                    self._write(collection, item)
+                    updated.append(item)
+                    results.append({"success": True, "id": doc_id})
+            self._notify(collection, updated, [])
+        return bulk_result(results)
+
+    def delete_documents(self, collection: str, doc_ids: List[str]):
+        """Bulk delete in one transaction"""
+        results = []
+        with self._lock:
+            with self._transaction():
+                for doc_id in doc_ids:
+                    cursor = self._conn.execute("DELETE FROM documents WHERE collection = ? AND id = ?", (collection, doc_id))
+                    if cursor.rowcount:
+                        results.append({"success": True, "id": doc_id})
+                    else:
+                        results.append({"success": False, "id": doc_id, "error": "Document not found"})
+            self._notify(collection, [], [result['id'] for result in results if result['success']])
+        return bulk_result(results)
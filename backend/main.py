@@ -7,13 +7,16 @@ from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import os
 from pathlib import Path
 
 # Import modules
-from backend.database.firebase_connection import firebase_manager
+from backend.database.async_firebase_connection import async_firebase_manager
+from backend.database.query_stats import query_recorder
+from backend.services.audit_log import audit_log
 from backend.api import auth, users, suggestions, reports, system, sync
 from backend.core.config import settings
 
@@ -28,27 +31,27 @@ async def lifespan(app: FastAPI):
     print(f"📊 Database: {settings.DATABASE_HOST}")
     print(f"🔧 Environment: {settings.ENVIRONMENT}")    
     
-    # Test database connection
-    if settings.FIREBASE_ENABLED:
-        print("🔥 Using Firebase Firestore")
-        if firebase_manager.is_connected():
-            print("✅ Firebase connection successful")
-        else:
-            print("❌ Firebase connection failed")
-    else:
+    # Query shapes seen by earlier runs (see scripts/firestore_index_advisor.py)
+    if query_recorder.enabled:
+        try:
+            query_recorder.load()
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar estatísticas de consultas: {e}")
+    
+    # Warm up the database in the background; /health answers 503 until it is done
+    if not settings.FIREBASE_ENABLED:
         print("⚠️ MySQL not supported in this version")
-        print("🔥 Using Firebase Firestore")
-        if firebase_manager.is_connected():
-            print("✅ Firebase connection successful")
-        else:
-            print("❌ Firebase connection failed")
+    print("🔥 Using Firebase Firestore")
+    warm_up_task = asyncio.create_task(warm_up())
+    
+    # Audit log entries are written in batches, off the request path
+    audit_log.start()
     
     # Initialize Google Forms sync
     if settings.AUTO_SYNC_ENABLED:
         print("🔄 Inicializando sincronização Google Forms...")
         try:
             from backend.services.google_forms_sync import google_forms_sync
-            import asyncio
             # Iniciar sincronização em background
             asyncio.create_task(google_forms_sync.start_background_sync())
             print("✅ Sincronização automática iniciada")
@@ -61,6 +64,63 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("🛑 Shutting down API")
+    warm_up_task.cancel()
+    try:
+        await audit_log.stop()
+    except Exception as e:
+        print(f"⚠️ Erro ao gravar logs de auditoria pendentes: {e}")
+    if settings.REPLICA_ENABLED:
+        from backend.services.replica import replica_manager
+        replica_manager.stop()
+    if settings.AUTH_CLAIMS_ONLY:
+        from backend.services.token_versions import token_versions
+        token_versions.stop()
+    if query_recorder.enabled:
+        try:
+            query_recorder.save()
+        except Exception as e:
+            print(f"⚠️ Erro ao salvar estatísticas de consultas: {e}")
+
+async def warm_up():
+    """Initialize Firebase, open its channels with a cheap read, then seed the dashboard counters, load token versions and start replicas"""
+    try:
+        result = await async_firebase_manager.warm_up()
+    except Exception as e:
+        async_firebase_manager.warm_up_error = str(e)
+        print(f"❌ Firebase connection failed: {e}")
+        return
+    
+    if result['success']:
+        print(f"✅ Firebase connection successful (cold start: {result['seconds']:.2f}s)")
+    else:
+        print(f"❌ Firebase connection failed: {result['error']}")
+    
+    # Dashboard counters count existing data only once seeded by a full rebuild
+    try:
+        from backend.services.dashboard_stats import dashboard_counters
+        stats = await dashboard_counters.ensure()
+        print(f"📊 Contadores do dashboard: {stats.get('sugestoes_total', 0)} sugestão(ões), {stats.get('usuarios_ativos', 0)} usuário(s) ativo(s)")
+    except Exception as e:
+        print(f"⚠️ Erro ao preparar contadores do dashboard: {e}")
+    
+    # Token versions trusted by the claims-only authentication mode
+    if settings.AUTH_CLAIMS_ONLY:
+        from backend.services.token_versions import token_versions
+        await token_versions.load()
+        token_versions.start()
+        if token_versions.ready:
+            print(f"🔑 Autenticação por claims: {token_versions.stats()['users']} usuário(s) carregado(s)")
+        else:
+            print(f"⚠️ Erro ao carregar versões de token: {token_versions.error}")
+    
+    # Live replicas of hot collections
+    if settings.REPLICA_ENABLED:
+        print(f"🪞 Iniciando réplicas: {', '.join(settings.REPLICA_COLLECTIONS)}")
+        try:
+            from backend.services.replica import replica_manager
+            await asyncio.to_thread(replica_manager.start)
+        except Exception as e:
+            print(f"⚠️ Erro ao iniciar réplicas: {e}")
 
 # Create FastAPI app
 app = FastAPI(
@@ -258,10 +318,26 @@ def get_fallback_html(page_title="Sistema de Gestão de Sugestões"):
 # Health check
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (503 until the startup warm-up has succeeded)"""
+    if async_firebase_manager.warm_up_error:
+        return JSONResponse(status_code=503, content={
+            "status": "error",
+            "version": "2.0.0",
+            "database": "error",
+            "error": async_firebase_manager.warm_up_error,
+            "message": "Warm-up failed, not ready"
+        })
+    
+    if not async_firebase_manager.ready:
+        return JSONResponse(status_code=503, content={
+            "status": "starting",
+            "version": "2.0.0",
+            "message": "Warm-up in progress, not ready"
+        })
+    
     try:
         # Test Firebase database
-        db_status = "ok" if firebase_manager.is_connected() else "error"
+        db_status = "ok" if async_firebase_manager.is_connected() else "error"
     except Exception:
         db_status = "error"
     
@@ -269,6 +345,7 @@ async def health_check():
         "status": "ok",
         "version": "2.0.0",
         "database": db_status,
+        "cold_start_seconds": async_firebase_manager.cold_start_seconds,
         "message": "Sistema de Gestão de Sugestões API"
     }
 
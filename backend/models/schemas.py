@@ -81,9 +81,10 @@ class UserProfile(UserBase):
 
 class UserList(BaseModel):
     users: List[UserProfile]
-    total: int
+    total: Optional[int] = None  # None if the count aggregation failed in cursor mode
     page: int
     per_page: int
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to read the next page
 
 class ChangePasswordRequest(BaseModel):
     current_password: str
@@ -128,9 +129,10 @@ class SuggestionResponse(SuggestionBase):
 
 class SuggestionList(BaseModel):
     suggestions: List[SuggestionResponse]
-    total: int
+    total: Optional[int] = None  # None if the count aggregation failed in cursor mode
     page: int
     per_page: int
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to read the next page
 
 # Report Models
 class DashboardStats(BaseModel):
@@ -182,9 +184,17 @@ class LogEntry(BaseModel):
 
 class LogList(BaseModel):
     logs: List[LogEntry]
-    total: int
+    total: Optional[int] = None  # None if the count aggregation failed in cursor mode
     page: int
     per_page: int
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to read the next page
+
+class ReportQuery(BaseModel):
+    group_by: List[str] = []
+    bucket: Optional[str] = None  # "day", "week" or "month"
+    metric: str = "count"  # or "distinct_users"
+    filters: Dict[str, Any] = {}
+    limit: Optional[int] = None
 
 # Configuration Models
 class SystemConfig(BaseModel):
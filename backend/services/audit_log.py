@@ -0,0 +1,221 @@
+"""
+Buffered audit-log writer
+
+log_user_action() only appends the entry to an in-memory queue; a
+background task started by the FastAPI lifespan writes the queue to the
+"logs" collection with create_documents, as soon as AUDIT_LOG_BATCH_SIZE
+entries are waiting or AUDIT_LOG_FLUSH_INTERVAL seconds after the first
+one arrived. Shutdown drains whatever is left.
+
+Best-effort field updates that no request has to wait for (a user's
+`ultimo_login`) go through the same flusher with defer_update(); updates
+to the same document are merged and written with update_documents.
+
+Each entry gets its document ID when queued, so a batch that fails is
+simply queued again and rewritten without creating duplicates. When the
+queue is full (Firestore unreachable for a long time), new entries are
+dropped and counted rather than blocking requests. Outside the API
+(scripts) no flusher runs and entries are written immediately.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from backend.database.async_firebase_connection import async_firebase_manager
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class AuditLogWriter:
+    """Queue of audit entries flushed to Firestore in batches"""
+
+    def __init__(self, collection: str = "logs", batch_size: int = 200,
+                 flush_interval: float = 1.0, max_queue: int = 10000, max_attempts: int = 5):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.batches = 0
+        self.last_flush_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.updated = 0
+        self.updates_dropped = 0
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._updates: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._attempts: Dict[str, int] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def write(self, entry: Dict[str, Any]):
+        """Queue `entry` (or write it at once when no flusher is running)"""
+        entry = {"id": uuid.uuid4().hex, **entry}
+        entry.setdefault('created_at', entry.get('timestamp'))
+
+        if not self.running:
+            await async_firebase_manager.create_documents(self.collection, [entry])
+            return
+
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append(entry)
+        self.enqueued += 1
+        # The first entry starts the flush interval, a full batch ends it
+        if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    async def defer_update(self, collection: str, doc_id: str, fields: Dict[str, Any]):
+        """Update a document on the next flush (or at once when no flusher is running)"""
+        if not self.running:
+            await async_firebase_manager.update_document(collection, doc_id, fields)
+            return
+
+        pending = self._pending()
+        self._updates.setdefault(collection, {}).setdefault(doc_id, {}).update(fields)
+        if pending == 0:
+            self._wakeup.set()
+
+    def _pending(self) -> int:
+        return len(self._queue) + sum(len(updates) for updates in self._updates.values())
+
+    def start(self):
+        """Start the background flusher on the running event loop"""
+        if self.running:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher after writing everything still queued"""
+        if not self.running:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        while True:
+            if not self._pending() and not self._stopping:
+                await self._wakeup.wait()
+            # Give a partial batch until the interval runs out to fill up
+            if len(self._queue) < self.batch_size and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wait_for_batch(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+
+            if self._updates:
+                await self._flush_updates()
+
+            while self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                if not await self._flush(batch) and not self._stopping:
+                    # Firestore is struggling: back off before the next attempt
+                    await asyncio.sleep(self.flush_interval)
+                    break
+
+            if self._stopping and not self._pending():
+                return
+
+    async def _wait_for_batch(self):
+        while len(self._queue) < self.batch_size and not self._stopping:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> bool:
+        """Write one batch; failed entries are queued again until max_attempts"""
+        started = time.perf_counter()
+        try:
+            result = await async_firebase_manager.create_documents(self.collection, batch)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        self.batches += 1
+        self.last_flush_seconds = time.perf_counter() - started
+
+        if 'results' in result:
+            failed = [entry for entry, outcome in zip(batch, result['results']) if not outcome['success']]
+            errors = [outcome.get('error') for outcome in result['results'] if not outcome['success']]
+            error = errors[0] if errors else None
+        else:
+            failed, error = batch, result.get('error')
+
+        self.written += len(batch) - len(failed)
+        failed_ids = {entry['id'] for entry in failed}
+        for entry in batch:
+            if entry['id'] not in failed_ids:
+                self._attempts.pop(entry['id'], None)
+        if not failed:
+            return True
+
+        self.failed_batches += 1
+        self.last_error = error
+        logger.warning(f"Falha ao gravar {len(failed)} registro(s) de auditoria: {error}")
+        retry = []
+        for entry in failed:
+            attempts = self._attempts.get(entry['id'], 0) + 1
+            if attempts >= self.max_attempts or self._stopping:
+                self._attempts.pop(entry['id'], None)
+                self.dropped += 1
+            else:
+                self._attempts[entry['id']] = attempts
+                retry.append(entry)
+        self._queue.extendleft(reversed(retry))
+        return False
+
+    async def _flush_updates(self):
+        """Write the merged updates; failures are dropped, as these writes are best-effort"""
+        updates, self._updates = self._updates, {}
+        for collection, documents in updates.items():
+            try:
+                result = await async_firebase_manager.update_documents(collection, documents)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            succeeded = result.get('succeeded', 0)
+            self.updated += succeeded
+            self.updates_dropped += len(documents) - succeeded
+            if not result['success']:
+                failures = [outcome.get('error') for outcome in result.get('results', []) if not outcome['success']]
+                self.last_error = result.get('error') or (failures[0] if failures else None)
+                logger.warning(f"Falha ao gravar {len(documents) - succeeded} atualização(ões) adiadas em {collection}: {self.last_error}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": len(self._queue),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "updates_pending": sum(len(updates) for updates in self._updates.values()),
+            "updated": self.updated,
+            "updates_dropped": self.updates_dropped,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "last_flush_seconds": self.last_flush_seconds,
+            "last_error": self.last_error
+        }
+
+# Instância global, iniciada e drenada pelo lifespan da API
+audit_log = AuditLogWriter(
+    batch_size=settings.AUDIT_LOG_BATCH_SIZE,
+    flush_interval=settings.AUDIT_LOG_FLUSH_INTERVAL,
+    max_queue=settings.AUDIT_LOG_MAX_QUEUE
+)
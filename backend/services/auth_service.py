@@ -2,25 +2,90 @@
 Firebase Authentication service with JWT tokens and password hashing
 """
 
+import asyncio
 import hashlib
+import time
 from jose import jwt
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-from backend.database.firebase_connection import firebase_manager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, Dict, Any, Set
+from backend.database.async_firebase_connection import async_firebase_manager
+from backend.core.cache import TTLCache
 from backend.core.config import settings
+from backend.services.audit_log import audit_log
+from backend.services.dashboard_stats import dashboard_counters
+from backend.services.password_hasher import password_hasher
+from backend.services.principal_cache import principal_cache
+from backend.services.token_versions import token_versions, new_token_version
+
+# User fields copied into token claims; changing any of them must bump `token_version`
+TOKEN_CLAIM_FIELDS = ("email", "tipo_usuario", "nome", "setor", "cargo", "ativo")
+
+# Decoded payloads of tokens that already passed verification, keyed by the
+# token's SHA-256 and kept until the token's own `exp`
+token_cache = TTLCache(maxsize=settings.JWT_CACHE_MAX_ENTRIES,
+                       ttl=settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def _token_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+# Password rehashes running after their logins returned (referenced so they are not collected)
+_rehash_tasks: Set[asyncio.Task] = set()
 
 class FirebaseAuthService:
     """Firebase Authentication service"""
     
+    @staticmethod
+    def user_type(user: Dict[str, Any]) -> str:
+        """Role of a user document: the stored tipo_usuario, or `cargo` on legacy documents without it"""
+        return user.get('tipo_usuario') or user.get('cargo') or 'user'
+    
     @staticmethod
     def hash_password(password: str) -> str:
-        """Hash password using SHA-256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash password with the configured KDF (blocks; prefer hash_password_async)"""
+        return password_hasher.hash(password)
     
     @staticmethod
     def verify_password(password: str, hashed_password: str) -> bool:
-        """Verify password against hash"""
-        return FirebaseAuthService.hash_password(password) == hashed_password
+        """Verify password against hash, legacy SHA-256 hashes included"""
+        return password_hasher.verify(password, hashed_password)
+    
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """Hash password in the password hashing pool"""
+        return await password_hasher.hash_async(password)
+    
+    @staticmethod
+    async def verify_password_async(password: str, hashed_password: str) -> bool:
+        """Verify password in the password hashing pool"""
+        return await password_hasher.verify_async(password, hashed_password)
+    
+    @staticmethod
+    async def upgrade_password_hash(user: Dict[str, Any], password: str):
+        """Rehash a just-verified password whose stored hash is legacy or uses older parameters"""
+        new_hash = await password_hasher.hash_async(password)
+        old_hash = user['senha_hash']
+        
+        # Only replace the hash that was verified, never a password changed meanwhile
+        result = await async_firebase_manager.update_and_get(
+            "usuarios", user['id'], {"senha_hash": new_hash},
+            precondition=lambda current: None if current.get('senha_hash') == old_hash else "Password changed"
+        )
+        principal_cache.invalidate(user['id'])
+        if result['success']:
+            password_hasher.upgrades += 1
+    
+    @staticmethod
+    def schedule_password_upgrade(user: Dict[str, Any], password: str):
+        """Run upgrade_password_hash in the background; a failed one is retried at the next login"""
+        async def upgrade():
+            try:
+                await FirebaseAuthService.upgrade_password_hash(user, password)
+            except Exception as e:
+                print(f"Error upgrading password hash: {e}")
+        
+        task = asyncio.create_task(upgrade())
+        _rehash_tasks.add(task)
+        task.add_done_callback(_rehash_tasks.discard)
     
     @staticmethod
     def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
@@ -46,51 +111,93 @@ class FirebaseAuthService:
     
     @staticmethod
     def verify_token(token: str) -> Optional[Dict[str, Any]]:
-        """Verify and decode JWT token"""
+        """Verify and decode JWT token (repeated tokens are served from token_cache)"""
+        key = _token_key(token)
+        payload = token_cache.get(key)
+        if payload is not None:
+            return dict(payload)
+        
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-            return payload
         except jwt.ExpiredSignatureError:
             return None
         except jwt.JWTError:
             return None
+        
+        # Tokens without `exp` never expire and are not cached
+        remaining = payload.get('exp', 0) - time.time()
+        if remaining > 0 and token_cache.maxsize > 0:
+            token_cache.set(key, dict(payload), ttl=remaining)
+        return payload
     
     @staticmethod
-    def authenticate_user(email: str, password: str) -> Optional[Dict[str, Any]]:
-        """Authenticate user with email and password using Firebase"""
+    def evict_token(token: str):
+        """Drop a token from token_cache (called on logout)"""
+        token_cache.pop(_token_key(token))
+    
+    @staticmethod
+    async def get_active_user_by_email(email: str) -> Optional[Dict[str, Any]]:
+        """Full user document (password hash included) of the active user with this email"""
+        result = await async_firebase_manager.query_collection("usuarios", [
+            ("email", "==", email),
+            ("ativo", "==", True)
+        ], limit=1)
+        
+        if not result['success'] or not result['data']:
+            return None
+        return result['data'][0]
+    
+    @staticmethod
+    async def get_user_document(user_id: str) -> Optional[Dict[str, Any]]:
+        """Full user document (password hash included), read from the database"""
+        result = await async_firebase_manager.get_document("usuarios", user_id)
+        return result['data'] if result['success'] else None
+    
+    @staticmethod
+    async def authenticate_user(email: str, password: str) -> Optional[Dict[str, Any]]:
+        """Authenticate user with email and password using Firebase
+        
+        Costs one read (a point read by ID when the email index knows the
+        user, the email query otherwise); the last-login update and the
+        audit record are written in the background.
+        """
         try:
-            # Get user from Firebase
-            result = firebase_manager.query_collection("usuarios", [
-                ("email", "==", email),
-                ("ativo", "==", True)
-            ])
+            # Get user through the email index, always with its stored password hash
+            user = await principal_cache.get_by_email(
+                email, FirebaseAuthService.get_active_user_by_email, FirebaseAuthService.get_user_document
+            )
             
-            if not result['success'] or not result['data']:
+            if not user:
                 return None
             
-            user = result['data'][0]
-            
-            # Verify password
-            if not FirebaseAuthService.verify_password(password, user['senha_hash']):
+            # Verify password in the hashing pool, off the event loop
+            if not await FirebaseAuthService.verify_password_async(password, user['senha_hash']):
                 return None
             
+            # The rehash costs another KDF run and a write; the login does not wait for it
+            if password_hasher.needs_rehash(user['senha_hash']):
+                FirebaseAuthService.schedule_password_upgrade(user, password)
+            
             # Update last login
-            firebase_manager.update_document("usuarios", user['id'], {
-                "ultimo_login": datetime.now()
+            await audit_log.defer_update("usuarios", user['id'], {
+                "ultimo_login": datetime.now(timezone.utc)
             })
             
             # Log login
-            FirebaseAuthService.log_user_action(user['id'], "LOGIN", f"Login successful for {email}")            # Return user data (without password)
+            await FirebaseAuthService.log_user_action(user['id'], "LOGIN", f"Login successful for {email}")
+            
+            # Return user data (without password)
             user_data = {
                 'id': user['id'],
                 'nome': user['nome'],
                 'email': user['email'],
-                'tipo_usuario': user.get('tipo_usuario', user.get('cargo', 'user')),  # Priorizar tipo_usuario
+                'tipo_usuario': FirebaseAuthService.user_type(user),
                 'cargo': user.get('cargo'),  # Incluir campo cargo para compatibilidade
                 'setor': user['setor'],
                 'ativo': user['ativo'],
                 'created_at': user.get('created_at'),
-                'last_login': datetime.now()
+                'last_login': datetime.now(timezone.utc),
+                'token_version': int(user.get('token_version') or 0)
             }
             
             return user_data
@@ -100,10 +207,10 @@ class FirebaseAuthService:
             return None
     
     @staticmethod
-    def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
+    async def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
         """Get user by ID from Firebase"""
         try:
-            result = firebase_manager.get_document("usuarios", user_id)
+            result = await async_firebase_manager.get_document("usuarios", user_id)
             
             if not result['success']:
                 return None
@@ -117,11 +224,13 @@ class FirebaseAuthService:
                 'id': user['id'],
                 'nome': user['nome'],
                 'email': user['email'],
-                'tipo_usuario': user['cargo'],  # Mapear cargo para tipo_usuario
+                'tipo_usuario': FirebaseAuthService.user_type(user),
+                'cargo': user.get('cargo'),
                 'setor': user['setor'],
                 'ativo': user['ativo'],
                 'created_at': user.get('created_at'),
-                'last_login': user.get('ultimo_login')
+                'last_login': user.get('ultimo_login'),
+                'token_version': int(user.get('token_version') or 0)
             }
             
         except Exception as e:
@@ -129,12 +238,12 @@ class FirebaseAuthService:
             return None
     
     @staticmethod
-    def create_user(user_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_user(user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new user in Firebase"""
         try:
             # Hash password
             if 'password' in user_data:
-                user_data['senha_hash'] = FirebaseAuthService.hash_password(user_data['password'])
+                user_data['senha_hash'] = await FirebaseAuthService.hash_password_async(user_data['password'])
                 del user_data['password']
             
             # Set defaults
@@ -142,10 +251,11 @@ class FirebaseAuthService:
             user_data['cargo'] = user_data.get('cargo', 'usuario')
             user_data['ultimo_login'] = None
             
-            result = firebase_manager.create_document("usuarios", user_data)
+            result = await async_firebase_manager.create_document("usuarios", user_data)
             
             if result['success']:
-                FirebaseAuthService.log_user_action(result['id'], "USER_CREATED", f"User created: {user_data['email']}")
+                await dashboard_counters.record_user(None, user_data)
+                await FirebaseAuthService.log_user_action(result['id'], "USER_CREATED", f"User created: {user_data['email']}")
                 return {"success": True, "user_id": result['id']}
             else:
                 return {"success": False, "error": result['error']}
@@ -154,18 +264,28 @@ class FirebaseAuthService:
             return {"success": False, "error": str(e)}
     
     @staticmethod
-    def update_user(user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def update_user(user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update user in Firebase"""
         try:
             # Hash password if provided
             if 'password' in user_data:
-                user_data['senha_hash'] = FirebaseAuthService.hash_password(user_data['password'])
+                user_data['senha_hash'] = await FirebaseAuthService.hash_password_async(user_data['password'])
                 del user_data['password']
             
-            result = firebase_manager.update_document("usuarios", user_id, user_data)
+            previous = {}
+            result = await async_firebase_manager.update_and_get(
+                "usuarios", user_id, user_data,
+                precondition=lambda current: previous.update(current),
+                derive=FirebaseAuthService.claim_version_bump(user_data)
+            )
+            principal_cache.invalidate(user_id)
+            
+            if result['success']:
+                FirebaseAuthService.revoke_if_bumped(user_id, previous, result['data'])
             
             if result['success']:
-                FirebaseAuthService.log_user_action(user_id, "USER_UPDATED", f"User updated: {user_id}")
+                await dashboard_counters.record_user(previous, result['data'])
+                await FirebaseAuthService.log_user_action(user_id, "USER_UPDATED", f"User updated: {user_id}")
                 return {"success": True}
             else:
                 return {"success": False, "error": result['error']}
@@ -174,9 +294,9 @@ class FirebaseAuthService:
             return {"success": False, "error": str(e)}
     
     @staticmethod
-    def log_user_action(user_id: Optional[str], action: str, details: str, 
+    async def log_user_action(user_id: Optional[str], action: str, details: str, 
                        ip_address: Optional[str] = None, user_agent: Optional[str] = None):
-        """Log user action to Firebase"""
+        """Log user action to Firebase (queued and written in batches by audit_log)"""
         try:
             log_data = {
                 "user_id": user_id,
@@ -184,17 +304,68 @@ class FirebaseAuthService:
                 "details": details,
                 "ip_address": ip_address,
                 "user_agent": user_agent,
-                "timestamp": datetime.now()
+                "timestamp": datetime.now(timezone.utc)
             }
             
-            firebase_manager.create_document("logs", log_data)
+            await audit_log.write(log_data)
             
         except Exception as e:
             print(f"Error logging user action: {e}")
     
     @staticmethod
-    def refresh_access_token(refresh_token: str) -> Optional[str]:
-        """Create new access token from refresh token"""
+    def token_claims(user: Dict[str, Any]) -> Dict[str, Any]:
+        """Claims embedded in access and refresh tokens (enough to authorise with AUTH_CLAIMS_ONLY)"""
+        created_at = user.get('created_at')
+        return {
+            "sub": str(user['id']),
+            "email": user['email'],
+            "tipo_usuario": user['tipo_usuario'],
+            "nome": user.get('nome'),
+            "setor": user.get('setor'),
+            "cargo": user.get('cargo'),
+            "ativo": bool(user.get('ativo')),
+            "created_at": created_at.isoformat() if isinstance(created_at, datetime) else created_at,
+            "ver": int(user.get('token_version') or 0)
+        }
+    
+    @staticmethod
+    def claim_version_bump(update: Dict[str, Any]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """`derive` hook for update_and_get: a new token_version if `update` changes a claim-carried field"""
+        def derive(current: Dict[str, Any]) -> Dict[str, Any]:
+            if any(field in update and update[field] != current.get(field) for field in TOKEN_CLAIM_FIELDS):
+                return {"token_version": new_token_version()}
+            return {}
+        return derive
+    
+    @staticmethod
+    def revoke_if_bumped(user_id: str, previous: Dict[str, Any], updated: Dict[str, Any]):
+        """Stop trusting older tokens' claims once an update wrote a new token_version"""
+        version = int(updated.get('token_version') or 0)
+        if version != int(previous.get('token_version') or 0):
+            token_versions.revoke(user_id, version)
+    
+    @staticmethod
+    def principal_from_claims(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The current user as get_user_by_id would return it, or None if the claims cannot be trusted"""
+        if not payload.get('ativo') or not token_versions.accepts(payload['sub'], payload.get('ver')):
+            return None
+        created_at = payload.get('created_at')
+        return {
+            'id': payload['sub'],
+            'nome': payload.get('nome'),
+            'email': payload.get('email'),
+            'tipo_usuario': payload.get('tipo_usuario'),
+            'cargo': payload.get('cargo'),
+            'setor': payload.get('setor'),
+            'ativo': True,
+            'created_at': datetime.fromisoformat(created_at) if created_at else None,
+            'last_login': None,
+            'token_version': payload['ver']
+        }
+    
+    @staticmethod
+    async def refresh_access_token(refresh_token: str) -> Optional[str]:
+        """Create new access token from refresh token, with claims read from the current user"""
         payload = FirebaseAuthService.verify_token(refresh_token)
         
         if not payload or payload.get('type') != 'refresh':
@@ -204,12 +375,19 @@ class FirebaseAuthService:
         if not user_id:
             return None
         
+        user = await principal_cache.get(str(user_id), FirebaseAuthService.get_user_by_id)
+        if not user:
+            return None
+        
+        # Revoked sessions cannot be extended
+        if payload.get('ver', 0) < user['token_version']:
+            return None
+        
         # Create new access token
-        access_token_data = {"sub": str(user_id)}
-        return FirebaseAuthService.create_access_token(access_token_data)
+        return FirebaseAuthService.create_access_token(FirebaseAuthService.token_claims(user))
     
     @staticmethod
-    def get_users(filters: Optional[Dict] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+    async def get_users(filters: Optional[Dict] = None, limit: Optional[int] = None) -> Dict[str, Any]:
         """Get list of users from Firebase"""
         try:
             firebase_filters = []
@@ -218,7 +396,7 @@ class FirebaseAuthService:
                 for key, value in filters.items():
                     firebase_filters.append((key, "==", value))
             
-            result = firebase_manager.query_collection("usuarios", firebase_filters, limit=limit)
+            result = await async_firebase_manager.query_collection("usuarios", firebase_filters, limit=limit)
             
             if result['success']:
                 # Remove sensitive data
@@ -227,7 +405,7 @@ class FirebaseAuthService:
                     user_data = user.copy()
                     if 'senha_hash' in user_data:
                         del user_data['senha_hash']
-                    user_data['tipo_usuario'] = user_data.get('cargo', 'usuario')
+                    user_data['tipo_usuario'] = FirebaseAuthService.user_type(user_data)
                     users.append(user_data)
                 
                 return {"success": True, "data": users}
@@ -0,0 +1,177 @@
+"""
+Materialised dashboard counters
+
+The dashboard's numbers live in one document, estatisticas/dashboard:
+
+    sugestoes_total             int
+    sugestoes_por_status        {status: count}
+    sugestoes_por_mes           {"YYYY-MM" (UTC): count}
+    usuarios_ativos             int
+    usuarios_ativos_por_setor   {setor: count}
+
+Every create, update and delete of a suggestion or user (API endpoints and
+the Google Forms import) applies the difference between the old and new
+document with increment_fields, an atomic server-side increment, so the
+dashboard is a single read. The API warm-up seeds the document with a full
+rebuild when it is missing, or was only created by increments (no
+`rebuilt_at`). A counter update that fails after its write succeeded
+leaves the document off by that change; `python
+scripts/rebuild_dashboard_stats.py` recomputes it from the collections.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from backend.database.async_firebase_connection import async_firebase_manager
+from backend.database.firebase_connection import firebase_manager, add_increments
+
+logger = logging.getLogger(__name__)
+
+STATS_COLLECTION = "estatisticas"
+DASHBOARD_DOC = "dashboard"
+
+def month_key(created_at: Any) -> Optional[str]:
+    """Histogram bucket of a creation time (data-layer timestamps are aware UTC)"""
+    if isinstance(created_at, datetime):
+        return created_at.astimezone(timezone.utc).strftime('%Y-%m')
+    return None
+
+def _prune(increments: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop zero amounts and empty maps, so an unchanged document costs no write"""
+    pruned = {}
+    for key, value in increments.items():
+        if isinstance(value, dict):
+            value = _prune(value)
+            if value:
+                pruned[key] = value
+        elif value:
+            pruned[key] = value
+    return pruned
+
+def suggestion_increments(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Counter changes for a suggestion going from `before` to `after` (None: absent)"""
+    increments: Dict[str, Any] = {}
+    for suggestion, sign in ((before, -1), (after, 1)):
+        if suggestion is None:
+            continue
+        add_increments(increments, {
+            "sugestoes_total": sign,
+            "sugestoes_por_status": {suggestion.get('status') or 'unknown': sign}
+        })
+        month = month_key(suggestion.get('created_at'))
+        if month:
+            add_increments(increments, {"sugestoes_por_mes": {month: sign}})
+    return _prune(increments)
+
+def user_increments(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Counter changes for a user going from `before` to `after` (only active users count)"""
+    increments: Dict[str, Any] = {}
+    for user, sign in ((before, -1), (after, 1)):
+        if user is None or not user.get('ativo'):
+            continue
+        add_increments(increments, {
+            "usuarios_ativos": sign,
+            "usuarios_ativos_por_setor": {user.get('setor') or 'Unknown': sign}
+        })
+    return _prune(increments)
+
+def compute_stats(suggestions: List[Dict[str, Any]], active_users: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The full counters document, from every suggestion and every active user"""
+    stats: Dict[str, Any] = {
+        "sugestoes_total": 0, "sugestoes_por_status": {}, "sugestoes_por_mes": {},
+        "usuarios_ativos": 0, "usuarios_ativos_por_setor": {}
+    }
+    for suggestion in suggestions:
+        add_increments(stats, suggestion_increments(None, suggestion))
+    for user in active_users:
+        add_increments(stats, user_increments(None, user))
+    return stats
+
+class DashboardCounters:
+    """Reads, increments and rebuilds estatisticas/dashboard"""
+
+    def __init__(self, collection: str = STATS_COLLECTION, doc_id: str = DASHBOARD_DOC):
+        self.collection = collection
+        self.doc_id = doc_id
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    async def record_suggestion(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        await self._apply(suggestion_increments(before, after))
+
+    async def record_user(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        await self._apply(user_increments(before, after))
+
+    def record_suggestions_sync(self, created: List[Dict[str, Any]]):
+        """One increment for a batch of imported suggestions (blocking, for the sync manager)"""
+        increments: Dict[str, Any] = {}
+        for suggestion in created:
+            add_increments(increments, suggestion_increments(None, suggestion))
+        if increments:
+            self._check(firebase_manager.increment_fields(self.collection, self.doc_id, increments))
+
+    async def _apply(self, increments: Dict[str, Any]):
+        if increments:
+            self._check(await async_firebase_manager.increment_fields(self.collection, self.doc_id, increments))
+
+    def _check(self, result: Dict[str, Any]):
+        # The data write already succeeded; a lost increment is drift for rebuild to fix
+        if not result['success']:
+            self.failures += 1
+            self.last_error = result.get('error')
+            logger.warning(f"Falha ao atualizar {self.collection}/{self.doc_id}: {self.last_error}")
+
+    async def read(self) -> Optional[Dict[str, Any]]:
+        """The counters, or None until a rebuild has seeded them
+
+        increment_fields creates the document when it is missing, so writes
+        made before the first rebuild leave one holding only their deltas;
+        without `rebuilt_at` it does not count the existing data yet.
+        """
+        result = await async_firebase_manager.get_document(self.collection, self.doc_id)
+        if not result['success'] or not result['data'].get('rebuilt_at'):
+            return None
+        return result['data']
+
+    async def ensure(self) -> Dict[str, Any]:
+        """The counters, rebuilding them first if they were never seeded (API warm-up)"""
+        stats = await self.read()
+        if stats is None:
+            stats = await self.rebuild()
+        return stats
+
+    async def rebuild(self) -> Dict[str, Any]:
+        """Recompute the document from the collections (writes made meanwhile may be missed)"""
+        suggestions_result = await async_firebase_manager.query_collection("sugestoes", select=["status", "created_at"])
+        users_result = await async_firebase_manager.query_collection(
+            "usuarios", filters=[("ativo", "==", True)], select=["ativo", "setor"]
+        )
+        stats = self._compute(suggestions_result, users_result)
+        result = await async_firebase_manager.create_document(self.collection, dict(stats), self.doc_id)
+        if not result['success']:
+            raise RuntimeError(result['error'])
+        return stats
+
+    def rebuild_sync(self) -> Dict[str, Any]:
+        suggestions_result = firebase_manager.query_collection("sugestoes", select=["status", "created_at"])
+        users_result = firebase_manager.query_collection(
+            "usuarios", filters=[("ativo", "==", True)], select=["ativo", "setor"]
+        )
+        stats = self._compute(suggestions_result, users_result)
+        result = firebase_manager.create_document(self.collection, dict(stats), self.doc_id)
+        if not result['success']:
+            raise RuntimeError(result['error'])
+        return stats
+
+    @staticmethod
+    def _compute(suggestions_result: Dict[str, Any], users_result: Dict[str, Any]) -> Dict[str, Any]:
+        for result in (suggestions_result, users_result):
+            if not result['success']:
+                raise RuntimeError(result['error'])
+        stats = compute_stats(suggestions_result['data'], users_result['data'])
+        stats['rebuilt_at'] = datetime.now(timezone.utc)
+        return stats
+
+# Instância global, usada pelos endpoints, pela sincronização e pelo script de reconstrução
+dashboard_counters = DashboardCounters()
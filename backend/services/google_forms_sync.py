@@ -20,6 +20,7 @@ except ImportError:
     GOOGLE_AVAILABLE = False
 
 from backend.database.firebase_connection import firebase_manager
+from backend.services.dashboard_stats import dashboard_counters
 from backend.core.config import settings
 
 # Configure logging
@@ -231,7 +232,7 @@ class GoogleFormsSync:
     
     def save_suggestions_to_firebase(self, suggestions: List[Dict[str, Any]]) -> int:
         """Salvar sugestões no Firebase"""
-        saved_count = 0
+        new_suggestions = []
         
         for suggestion_data in suggestions:
             try:
@@ -248,28 +249,45 @@ class GoogleFormsSync:
                     logger.info(f"Sugestão já existe: {suggestion['titulo']}")
                     continue
                 
-                # Salvar no Firebase
-                result = firebase_manager.create_document("sugestoes", suggestion)
-                
-                if result["success"]:
-                    saved_count += 1
-                    logger.info(f"✅ Sugestão salva: {suggestion['titulo']}")
-                    
-                    # Log da ação
-                    firebase_manager.create_document("logs", {
-                        "user_id": None,
-                        "action": "IMPORT_SUGGESTION",
-                        "details": f"Importada sugestão via Google Forms: {suggestion['titulo']}",
-                        "source": "google_forms_sync",
-                        "created_at": datetime.now()
-                    })
-                else:
-                    logger.error(f"Erro ao salvar sugestão: {result.get('error')}")
+                new_suggestions.append(suggestion)
                     
             except Exception as e:
                 logger.error(f"Erro ao processar sugestão: {e}")
         
-        return saved_count
+        if not new_suggestions:
+            return 0
+        
+        # Salvar no Firebase em lotes
+        result = firebase_manager.create_documents("sugestoes", new_suggestions)
+        
+        if "results" not in result:
+            logger.error(f"Erro ao salvar sugestões: {result.get('error')}")
+            return 0
+        
+        import_logs = []
+        saved = []
+        for suggestion, doc_result in zip(new_suggestions, result["results"]):
+            if doc_result["success"]:
+                logger.info(f"✅ Sugestão salva: {suggestion['titulo']}")
+                saved.append(suggestion)
+                import_logs.append({
+                    "user_id": None,
+                    "action": "IMPORT_SUGGESTION",
+                    "details": f"Importada sugestão via Google Forms: {suggestion['titulo']}",
+                    "source": "google_forms_sync",
+                    "created_at": datetime.now()
+                })
+            else:
+                logger.error(f"Erro ao salvar sugestão: {doc_result.get('error')}")
+        
+        # Contadores do dashboard, num único incremento para o lote
+        dashboard_counters.record_suggestions_sync(saved)
+        
+        # Log das ações
+        if import_logs:
+            firebase_manager.create_documents("logs", import_logs)
+        
+        return result["succeeded"]
     
     def sync_now(self) -> Dict[str, Any]:
         """Executar sincronização manual"""
@@ -321,7 +339,8 @@ class GoogleFormsSync:
         
         while True:
             try:
-                result = self.sync_now()
+                # sync_now is blocking (Sheets API + Firestore), run it off the event loop
+                result = await asyncio.to_thread(self.sync_now)
                 if result["success"] and result["imported"] > 0:
                     logger.info(f"✅ Auto-sync: {result['imported']} sugestões importadas")
                 
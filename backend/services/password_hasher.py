@@ -0,0 +1,160 @@
+"""
+Password hashing with a slow KDF, run in a bounded worker pool
+
+New hashes use scrypt (or PBKDF2-SHA256, PASSWORD_HASH_ALGORITHM) with the
+cost parameters from the settings, encoded with their parameters and salt:
+
+    scrypt$<n>$<r>$<p>$<salt>$<hash>
+    pbkdf2_sha256$<iterations>$<salt>$<hash>
+
+Bare 64-character SHA-256 hex digests written by earlier versions still
+verify; needs_rehash() reports them (and hashes made with older cost
+parameters) so authenticate_user can upgrade them in the background
+after a successful login. Both KDFs release the GIL, so the *_async methods run them in a
+thread pool of PASSWORD_HASH_WORKERS threads, keeping the event loop free;
+stats() exposes how many calls are waiting for a worker.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from backend.core.config import settings
+
+def _b64encode(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+def _is_legacy(stored: str) -> bool:
+    return len(stored) == 64 and all(char in "0123456789abcdef" for char in stored)
+
+class PasswordHasher:
+    """scrypt / PBKDF2 hashing with legacy SHA-256 verification"""
+
+    def __init__(self, algorithm: str = "scrypt", scrypt_n: int = 2 ** 14, scrypt_r: int = 8,
+                 scrypt_p: int = 1, pbkdf2_iterations: int = 600000, max_workers: int = 4):
+        if algorithm not in ("scrypt", "pbkdf2_sha256"):
+            raise ValueError(f"Unsupported password hash algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self.max_workers = max_workers
+        self.completed = 0
+        self.busy_seconds = 0.0
+        self.peak_waiting = 0
+        self.upgrades = 0
+        self._submitted = 0
+        self._running = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        if self.algorithm == "scrypt":
+            digest = self._scrypt(password, salt, self.scrypt_n, self.scrypt_r, self.scrypt_p)
+            return f"scrypt${self.scrypt_n}${self.scrypt_r}${self.scrypt_p}${_b64encode(salt)}${_b64encode(digest)}"
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, self.pbkdf2_iterations)
+        return f"pbkdf2_sha256${self.pbkdf2_iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, password: str, stored: str) -> bool:
+        """Check `password` against any supported hash format (constant-time comparison)"""
+        if not stored:
+            return False
+        if _is_legacy(stored):
+            return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+        try:
+            scheme, *fields = stored.split("$")
+            if scheme == "scrypt":
+                n, r, p, salt, expected = fields
+                digest = self._scrypt(password, _b64decode(salt), int(n), int(r), int(p))
+            elif scheme == "pbkdf2_sha256":
+                iterations, salt, expected = fields
+                digest = hashlib.pbkdf2_hmac("sha256", password.encode(), _b64decode(salt), int(iterations))
+            else:
+                return False
+            return hmac.compare_digest(digest, _b64decode(expected))
+        except (ValueError, TypeError):
+            return False
+
+    def needs_rehash(self, stored: str) -> bool:
+        """True for legacy SHA-256 hashes and hashes made with other parameters"""
+        if self.algorithm == "scrypt":
+            prefix = f"scrypt${self.scrypt_n}${self.scrypt_r}${self.scrypt_p}$"
+        else:
+            prefix = f"pbkdf2_sha256${self.pbkdf2_iterations}$"
+        return not (stored or "").startswith(prefix)
+
+    @staticmethod
+    def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        # OpenSSL's default 32 MiB limit is too small for n=2**15 and up
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+    async def hash_async(self, password: str) -> str:
+        return await self._submit(self.hash, password)
+
+    async def verify_async(self, password: str, stored: str) -> bool:
+        return await self._submit(self.verify, password, stored)
+
+    async def _submit(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="password-hash")
+        with self._lock:
+            self._submitted += 1
+            self.peak_waiting = max(self.peak_waiting, self._submitted - self._running)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._timed, func, args)
+        finally:
+            with self._lock:
+                self._submitted -= 1
+
+    def _timed(self, func: Callable[..., Any], args: tuple) -> Any:
+        with self._lock:
+            self._running += 1
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+                self.busy_seconds += time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            running, waiting = self._running, self._submitted - self._running
+        return {
+            "algorithm": self.algorithm,
+            "cost": ({"n": self.scrypt_n, "r": self.scrypt_r, "p": self.scrypt_p}
+                     if self.algorithm == "scrypt" else {"iterations": self.pbkdf2_iterations}),
+            "workers": self.max_workers,
+            "running": running,
+            "waiting": waiting,
+            "peak_waiting": self.peak_waiting,
+            "completed": self.completed,
+            "mean_seconds": self.busy_seconds / self.completed if self.completed else None,
+            "upgrades": self.upgrades
+        }
+
+# Instância global, compartilhada pela autenticação e pelos endpoints de usuários
+password_hasher = PasswordHasher(
+    algorithm=settings.PASSWORD_HASH_ALGORITHM,
+    scrypt_n=settings.PASSWORD_SCRYPT_N,
+    scrypt_r=settings.PASSWORD_SCRYPT_R,
+    scrypt_p=settings.PASSWORD_SCRYPT_P,
+    pbkdf2_iterations=settings.PASSWORD_PBKDF2_ITERATIONS,
+    max_workers=settings.PASSWORD_HASH_WORKERS
+)
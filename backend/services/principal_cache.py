@@ -0,0 +1,145 @@
+"""
+Short-TTL cache of authenticated principals
+
+get_current_user resolves the token's user ID to a user record on every
+request. The record is kept here for PRINCIPAL_CACHE_TTL seconds, and
+concurrent misses for the same user share a single fetch. The user
+endpoints call invalidate() whenever they change or delete a user, so a
+deactivation takes effect on the next request. Changes made by other
+processes are only seen once the TTL runs out.
+
+Logins look users up by email through get_by_email, which caches only
+the email -> user ID mapping, never the document: the password is always
+checked against the stored hash, and a repeated login costs a point read
+by ID instead of the email query. invalidate() drops both entries.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from backend.core.cache import TTLCache
+from backend.core.config import settings
+
+Loader = Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+
+class PrincipalCache:
+    """User records by ID and by email, with invalidation and single-flight loading"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.enabled = ttl > 0 and maxsize > 0
+        self.loads = 0
+        self.shared_loads = 0
+        self.invalidations = 0
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[str, "asyncio.Task"] = {}
+        self._generations: Dict[str, int] = {}
+        self.email_loads = 0
+        self._by_email = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._emails: Dict[str, str] = {}
+        self._email_generation = 0
+
+    async def get(self, user_id: str, loader: Loader) -> Optional[Dict[str, Any]]:
+        """Cached record for `user_id`, loading it with `loader` on a miss
+
+        Inactive or unknown users (loader returns None) are not cached.
+        """
+        if not self.enabled:
+            return await loader(user_id)
+
+        user = self._cache.get(user_id)
+        if user is not None:
+            return dict(user)
+
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load(user_id, loader))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda done: self._forget(user_id, done))
+        else:
+            self.shared_loads += 1
+
+        # A cancelled caller must not cancel the fetch the others are waiting on
+        user = await asyncio.shield(task)
+        return dict(user) if user is not None else None
+
+    async def _load(self, user_id: str, loader: Loader) -> Optional[Dict[str, Any]]:
+        generation = self._generations.get(user_id, 0)
+        self.loads += 1
+        user = await loader(user_id)
+        # Skip the store if the user was changed while we were reading it
+        if user is not None and self._generations.get(user_id, 0) == generation:
+            self._cache.set(user_id, dict(user))
+        return user
+
+    def _forget(self, user_id: str, task: "asyncio.Task"):
+        if self._inflight.get(user_id) is task:
+            del self._inflight[user_id]
+
+    async def get_by_email(self, email: str, find: Loader, fetch: Loader) -> Optional[Dict[str, Any]]:
+        """Fresh document of the active user with `email`
+
+        `find` looks the user up by email, `fetch` reads a document by ID;
+        a cached ID is only trusted if the document it reads still has
+        this email and is active.
+        """
+        if not self.enabled:
+            return await find(email)
+
+        user_id = self._by_email.get(email)
+        if user_id is not None:
+            user = await fetch(user_id)
+            if user is not None and user.get('email') == email and user.get('ativo'):
+                return user
+            self._by_email.pop(email)
+            self._emails.pop(user_id, None)
+
+        generation = self._email_generation
+        self.email_loads += 1
+        user = await find(email)
+        if user is None:
+            return None
+        # Any user change during the read may have been to this one
+        if self._email_generation == generation:
+            self._by_email.set(email, user['id'])
+            self._emails[user['id']] = email
+        return user
+
+    def invalidate(self, user_id: str):
+        """Drop `user_id` (called after every change to that user)"""
+        if not self.enabled:
+            return
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        self._cache.pop(user_id)
+        self._email_generation += 1
+        email = self._emails.pop(user_id, None)
+        if email is not None:
+            self._by_email.pop(email)
+        # Later callers must not join a fetch that may have read the old record
+        self._inflight.pop(user_id, None)
+        self.invalidations += 1
+
+    def clear(self):
+        for user_id in list(self._generations):
+            self._generations[user_id] += 1
+        self._cache.clear()
+        self._inflight.clear()
+        self._email_generation += 1
+        self._emails.clear()
+        self._by_email.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            **self._cache.stats(),
+            "loads": self.loads,
+            "shared_loads": self.shared_loads,
+            "in_flight": len(self._inflight),
+            "invalidations": self.invalidations,
+            "email_index": {**self._by_email.stats(), "loads": self.email_loads}
+        }
+
+# Instância global, usada por get_current_user e pelos endpoints de usuários
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl=settings.PRINCIPAL_CACHE_TTL
+)
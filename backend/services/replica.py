@@ -0,0 +1,199 @@
+"""
+Live in-memory replicas of whole collections
+
+A replica loads its collection once and then applies every change as a
+delta: Firestore `on_snapshot` events, or the change listeners of the local
+backends. While a replica is serving, the Firebase managers answer
+query_collection and aggregate for that collection from its indexed
+MockFirestore copy instead of scanning the backend.
+
+With Firestore the copy is eventually consistent: a write shows up once its
+snapshot event arrives, usually well under a second later. The lag is
+exposed by stats().
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Any
+
+from backend.database.firebase_connection import FirebaseManager, MockFirestore, firebase_manager, snapshot_to_dict
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class CollectionReplica:
+    """Local copy of one collection, kept current by change events"""
+
+    def __init__(self, collection: str):
+        self.collection = collection
+        self.store = MockFirestore(seed=False)
+        self.ready = False
+        self.source: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+        self.last_change_at: Optional[float] = None
+        self.last_lag_seconds: Optional[float] = None
+        self.changes_applied = 0
+        self.error: Optional[str] = None
+        self._watch = None
+        self._unsubscribe = None
+        self._started_at: Optional[float] = None
+        self._lock = threading.Lock()
+        # Local changes seen while the initial load runs, replayed after it
+        self._buffered: Optional[List[tuple]] = None
+
+    @property
+    def is_serving(self) -> bool:
+        """Loaded and still receiving changes (a dead Firestore watch stops serving)"""
+        if not self.ready:
+            return False
+        return self._watch is None or self._watch.is_active
+
+    def start(self, manager: FirebaseManager):
+        """Subscribe to changes and load the collection
+
+        Local backends load synchronously; with Firestore the first snapshot
+        event carries the whole collection and marks the replica ready.
+        """
+        manager._ensure_initialized()
+        self._started_at = time.monotonic()
+
+        if manager.is_local_backend:
+            self.source = "local"
+            # Subscribe first so no write between the load and the subscription is
+            # lost; changes arriving during the load are held back and replayed on
+            # top of it, so the (possibly older) loaded documents never win
+            self._buffered = []
+            self._unsubscribe = manager.db.add_listener(self._on_local_change)
+            result = manager.db.query_collection(self.collection)
+            if not result['success']:
+                raise RuntimeError(result.get('error'))
+            with self._lock:
+                self.store.apply_changes(self.collection, result['data'], [])
+                for upserts, deleted_ids in self._buffered:
+                    self.store.apply_changes(self.collection, upserts, deleted_ids)
+                self._buffered = None
+            self._mark_ready()
+        else:
+            self.source = "firestore"
+            self._watch = manager.db.collection(self.collection).on_snapshot(self._on_snapshot)
+            self._unsubscribe = self._watch.unsubscribe
+
+    def stop(self):
+        if self._unsubscribe:
+            self._unsubscribe()
+        self._unsubscribe = None
+        self._watch = None
+        self.ready = False
+
+    def _mark_ready(self):
+        self.loaded_at = time.time()
+        self.load_seconds = time.monotonic() - self._started_at
+        self.ready = True
+        logger.info(f"Réplica de '{self.collection}' carregada em {self.load_seconds:.2f}s")
+
+    def _apply(self, upserts: List[Dict[str, Any]], deleted_ids: List[str]):
+        with self._lock:
+            self.store.apply_changes(self.collection, upserts, deleted_ids)
+            self.changes_applied += len(upserts) + len(deleted_ids)
+            self.last_change_at = time.time()
+
+    def _on_local_change(self, collection: str, upserts: List[Dict[str, Any]], deleted_ids: List[str]):
+        if collection != self.collection:
+            return
+        with self._lock:
+            if self._buffered is not None:
+                self._buffered.append((upserts, deleted_ids))
+                return
+        self._apply(upserts, deleted_ids)
+        self.last_lag_seconds = 0.0
+
+    def _on_snapshot(self, documents, changes, read_time):
+        """Firestore watch callback (runs on the watch's background thread)"""
+        try:
+            upserts, deleted_ids = [], []
+            for change in changes:
+                if change.type.name == "REMOVED":
+                    deleted_ids.append(change.document.id)
+                else:
+                    upserts.append(snapshot_to_dict(change.document))
+            self._apply(upserts, deleted_ids)
+
+            if read_time is not None:
+                self.last_lag_seconds = max(0.0, (datetime.now(timezone.utc) - read_time).total_seconds())
+            if not self.ready:
+                self._mark_ready()
+        except Exception as e:
+            # A replica that missed a change must not serve reads any more
+            self.error = str(e)
+            self.ready = False
+            logger.error(f"Erro ao aplicar alterações na réplica de '{self.collection}': {e}")
+
+    def query_collection(self, filters: Optional[List[tuple]] = None, order_by: Optional[str] = None,
+                         limit: Optional[int] = None, descending: bool = False,
+                         start_after: Optional[Dict[str, Any]] = None, end_before: Optional[Dict[str, Any]] = None,
+                         select: Optional[List[str]] = None) -> Dict[str, Any]:
+        try:
+            return self.store.query_collection(self.collection, filters, order_by, limit,
+                                               descending, start_after, end_before, select=select)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def aggregate(self, filters: Optional[List[tuple]] = None,
+                  aggregations: Optional[List[tuple]] = None) -> Dict[str, Any]:
+        try:
+            return self.store.aggregate(self.collection, filters, aggregations)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "collection": self.collection,
+            "source": self.source,
+            "ready": self.ready,
+            "serving": self.is_serving,
+            "documents": self.store.aggregate(self.collection)['data']['count'],
+            "load_seconds": self.load_seconds,
+            "changes_applied": self.changes_applied,
+            # Staleness: how late the last change arrived, and how long ago
+            "last_lag_seconds": self.last_lag_seconds,
+            "seconds_since_last_change": now - self.last_change_at if self.last_change_at else None,
+            "seconds_since_load": now - self.loaded_at if self.loaded_at else None,
+            "error": self.error
+        }
+
+class ReplicaManager:
+    """Starts the configured replicas and attaches them to the Firebase manager"""
+
+    def __init__(self, manager: FirebaseManager):
+        self.manager = manager
+        self.replicas: Dict[str, CollectionReplica] = {}
+
+    def start(self, collections: Optional[List[str]] = None):
+        for collection in collections or settings.REPLICA_COLLECTIONS:
+            if collection in self.replicas:
+                continue
+            replica = CollectionReplica(collection)
+            try:
+                replica.start(self.manager)
+            except Exception as e:
+                logger.error(f"Erro ao iniciar réplica de '{collection}': {e}")
+                replica.stop()
+                continue
+            self.replicas[collection] = replica
+            self.manager.attach_replica(replica)
+
+    def stop(self):
+        for collection, replica in self.replicas.items():
+            self.manager.detach_replica(collection)
+            replica.stop()
+        self.replicas.clear()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [replica.stats() for replica in self.replicas.values()]
+
+# Instância global
+replica_manager = ReplicaManager(firebase_manager)
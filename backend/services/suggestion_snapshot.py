@@ -0,0 +1,142 @@
+"""
+Columnar snapshot of the suggestions collection for reports
+
+The report endpoints used to walk every suggestion as a dict. The snapshot
+reads the collection once (only the fields reports use) into a pandas
+DataFrame:
+
+    usuario_id                          categorical (user IDs interned once)
+    status, prioridade,
+    setor_origem, setor_destino         categorical
+    created_at                          int64 nanoseconds since the epoch (UTC)
+
+so a report is a boolean mask plus a value_counts / groupby over integer
+codes. Missing values are NaN in the categoricals and MISSING_TIME in
+created_at; each report maps them to the defaults it always used.
+
+The snapshot is rebuilt when this process writes to "sugestoes" (the
+collection's query_cache generation changes) or after
+SUGGESTION_SNAPSHOT_TTL seconds, which bounds how long writes made by
+other processes go unseen. Concurrent reports share a single rebuild.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.database.async_firebase_connection import async_firebase_manager
+from backend.database.query_cache import query_cache
+from backend.core.config import settings
+
+COLLECTION = "sugestoes"
+CATEGORY_FIELDS = ["usuario_id", "status", "prioridade", "setor_origem", "setor_destino"]
+# NaT's integer value; it sorts before every real timestamp
+MISSING_TIME = np.iinfo(np.int64).min
+NS_PER_DAY = 86400 * 10 ** 9
+
+def epoch_ns(value: Optional[datetime]) -> Optional[int]:
+    """A datetime bound as int64 nanoseconds, comparable with the created_at column"""
+    return pd.Timestamp(value).value if value is not None else None
+
+def local_day_bounds(day: str) -> Tuple[int, int]:
+    """Epoch nanoseconds of the local midnights starting "YYYY-MM-DD" and the day after
+
+    A day used as an inclusive upper bound matches created_at < the second
+    one. Raises ValueError on anything but a valid date.
+    """
+    start = datetime.strptime(day, '%Y-%m-%d').astimezone()
+    return epoch_ns(start), epoch_ns(start + timedelta(days=1))
+
+def epoch_column(values: List[Optional[datetime]]) -> np.ndarray:
+    """int64 UTC epoch nanoseconds of aware datetimes (None becomes MISSING_TIME)"""
+    return pd.to_datetime(values, utc=True).as_unit('ns').asi8
+
+def to_frame(suggestions: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Build the columnar form of a list of suggestion documents"""
+    columns: Dict[str, Any] = {
+        field: pd.Categorical([suggestion.get(field) for suggestion in suggestions])
+        for field in CATEGORY_FIELDS
+    }
+    columns['created_at'] = epoch_column([suggestion.get('created_at') for suggestion in suggestions])
+    return pd.DataFrame(columns)
+
+def breakdown(column: pd.Series, missing: str) -> Dict[str, int]:
+    """{value: count} of a categorical column, with missing values counted as `missing`"""
+    counts: Dict[str, int] = {}
+    for value, count in column.value_counts(dropna=False, sort=False).items():
+        if count:
+            key = missing if pd.isna(value) else value
+            counts[key] = counts.get(key, 0) + int(count)
+    return counts
+
+def day_counts(created_at: np.ndarray) -> List[tuple]:
+    """Sorted [("YYYY-MM-DD", count)] of int64 UTC timestamps (missing ones excluded)"""
+    days, counts = np.unique(created_at[created_at != MISSING_TIME] // NS_PER_DAY, return_counts=True)
+    labels = np.datetime_as_string(days.astype('datetime64[D]'))
+    return [(str(label), int(count)) for label, count in zip(labels, counts)]
+
+class SuggestionSnapshot:
+    """The current columnar snapshot, rebuilt on demand"""
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self.builds = 0
+        self.hits = 0
+        self.last_build_seconds: Optional[float] = None
+        self._frame: Optional[pd.DataFrame] = None
+        self._generation = -1
+        self._built_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _fresh(self) -> bool:
+        return (self._frame is not None
+                and self._generation == query_cache.generation(COLLECTION)
+                and time.monotonic() - self._built_at < self.ttl)
+
+    async def frame(self) -> pd.DataFrame:
+        """The snapshot; callers must treat it as read-only, it is shared"""
+        if self._fresh():
+            self.hits += 1
+            return self._frame
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another report may have rebuilt it while this one waited
+            if self._fresh():
+                self.hits += 1
+                return self._frame
+            await self._build()
+            return self._frame
+
+    async def _build(self):
+        # Taken before the read, so a write that lands during it makes the result stale
+        generation = query_cache.generation(COLLECTION)
+        started = time.perf_counter()
+        result = await async_firebase_manager.query_collection(
+            COLLECTION, select=CATEGORY_FIELDS + ["created_at"]
+        )
+        if not result['success']:
+            raise RuntimeError(f"Error fetching suggestions: {result['error']}")
+        frame = await asyncio.to_thread(to_frame, result['data'])
+        self._frame, self._generation, self._built_at = frame, generation, time.monotonic()
+        self.builds += 1
+        self.last_build_seconds = time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        frame = self._frame
+        return {
+            "rows": len(frame) if frame is not None else None,
+            "memory_bytes": int(frame.memory_usage(deep=True).sum()) if frame is not None else None,
+            "fresh": self._fresh(),
+            "ttl": self.ttl,
+            "builds": self.builds,
+            "hits": self.hits,
+            "last_build_seconds": self.last_build_seconds
+        }
+
+# Instância global, compartilhada pelos endpoints de relatórios
+suggestion_snapshot = SuggestionSnapshot(ttl=settings.SUGGESTION_SNAPSHOT_TTL)
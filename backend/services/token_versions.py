@@ -0,0 +1,134 @@
+"""
+Per-user token versions for the claims-only authentication mode
+
+Every user document may carry a `token_version`; access and refresh
+tokens copy it into their `ver` claim. Revoking a user's tokens writes a
+new, larger version (the current time in milliseconds, so no read is
+needed first). This table holds the minimum accepted version of every
+active user and is loaded once the database is warm.
+
+With AUTH_CLAIMS_ONLY, get_current_user trusts a token's claims only when
+the table knows the user and the token's version is current. Anything
+else falls back to reading the user document, so an unknown, stale or
+pre-upgrade token is never rejected wrongly nor accepted blindly.
+
+The table is per process, so it is reloaded every
+TOKEN_VERSIONS_RELOAD_SECONDS: a revocation made by another API process
+(or a user deleted there) is honoured here within that interval. If
+reloads keep failing the table goes stale after two intervals and every
+request falls back to reading the user document, rather than trusting
+versions that may have been revoked elsewhere.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from backend.database.async_firebase_connection import async_firebase_manager
+from backend.core.config import settings
+
+def new_token_version() -> int:
+    """Version that invalidates every token issued so far"""
+    return int(time.time() * 1000)
+
+class TokenVersions:
+    """Minimum accepted token version of each active user"""
+
+    def __init__(self, reload_seconds: float = 30.0):
+        self.reload_seconds = reload_seconds
+        self.ready = False
+        self.loaded_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.revocations = 0
+        self.reloads = 0
+        self._versions: Dict[str, int] = {}
+        # Revocations (None: forgotten users) made while a load is in flight
+        self._pending: Optional[Dict[str, Optional[int]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """Read the version of every active user"""
+        self._pending = {}
+        try:
+            result = await async_firebase_manager.query_collection(
+                "usuarios", filters=[("ativo", "==", True)], select=["token_version"]
+            )
+            if not result['success']:
+                self.error = result['error']
+                return
+            versions = {user['id']: int(user.get('token_version') or 0) for user in result['data']}
+            # The read may predate revocations made here meanwhile; they still apply
+            for user_id, version in self._pending.items():
+                if version is None:
+                    versions.pop(user_id, None)
+                elif user_id in versions:
+                    versions[user_id] = max(version, versions[user_id])
+            self._versions = versions
+            self.loaded_at = time.time()
+            self.error = None
+            self.ready = True
+        finally:
+            self._pending = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            try:
+                await self.load()
+                self.reloads += 1
+            except Exception as e:
+                self.error = str(e)
+
+    def start(self):
+        """Reload the table every `reload_seconds` in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _stale(self) -> bool:
+        return self.loaded_at is None or time.time() - self.loaded_at > 2 * self.reload_seconds
+
+    def accepts(self, user_id: str, version: Any) -> bool:
+        """True if a token with `version` can be trusted without reading the user"""
+        if not self.ready or self._stale() or not isinstance(version, int):
+            return False
+        current = self._versions.get(user_id)
+        return current is not None and version >= current
+
+    def observe(self, user_id: str, version: int):
+        """Learn the version of a user who just logged in (e.g. one created after load)"""
+        if self.ready and version > self._versions.get(user_id, -1):
+            self._versions[user_id] = version
+
+    def revoke(self, user_id: str, version: int):
+        """Reject tokens older than `version` (already written to the user document)"""
+        self._versions[user_id] = max(version, self._versions.get(user_id, 0))
+        if self._pending is not None:
+            self._pending[user_id] = max(version, self._pending.get(user_id) or 0)
+        self.revocations += 1
+
+    def forget(self, user_id: str):
+        """Stop trusting claims of `user_id` at all (deleted users)"""
+        self._versions.pop(user_id, None)
+        if self._pending is not None:
+            self._pending[user_id] = None
+        self.revocations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "stale": self._stale(),
+            "users": len(self._versions),
+            "revocations": self.revocations,
+            "reload_seconds": self.reload_seconds,
+            "reloads": self.reloads,
+            "loaded_at": self.loaded_at,
+            "error": self.error
+        }
+
+# Instância global, carregada no warm-up quando AUTH_CLAIMS_ONLY está ativo
+token_versions = TokenVersions(reload_seconds=settings.TOKEN_VERSIONS_RELOAD_SECONDS)
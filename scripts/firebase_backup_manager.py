@@ -13,6 +13,7 @@ import asyncio
 sys.path.append(str(Path(__file__).parent))
 
 from backend.database.firebase_connection import firebase_manager
+from backend.services.dashboard_stats import dashboard_counters
 
 class FirebaseBackupManager:
     """Gerenciador de backup e restore Firebase"""
@@ -34,45 +35,47 @@ class FirebaseBackupManager:
             print("❌ Firebase não conectado!")
             return False
         
-        backup_data = {
-            "metadata": {
-                "backup_name": backup_name,
-                "created_at": datetime.now().isoformat(),
-                "version": "2.0.0",
-                "firebase_mode": "demo" if firebase_manager.is_demo_mode else "production"
-            },
-            "collections": {}
+        metadata = {
+            "backup_name": backup_name,
+            "created_at": datetime.now().isoformat(),
+            "version": "2.0.0",
+            "firebase_mode": "demo" if firebase_manager.is_demo_mode else "production"
         }
         
         # Coleções para backup
         collections = ["usuarios", "sugestoes", "configuracoes", "setores", "logs", "relatorios"]
         
-        for collection in collections:
-            print(f"📋 Fazendo backup da coleção: {collection}")
-            try:
-                result = firebase_manager.query_collection(collection)
-                if result.get("success"):
-                    data = result.get("data", [])
-                    # Converter datetime para string para JSON
-                    for item in data:
-                        for key, value in item.items():
-                            if isinstance(value, datetime):
-                                item[key] = value.isoformat()
-                    
-                    backup_data["collections"][collection] = data
-                    print(f"   ✅ {len(data)} documentos salvos")
-                else:
-                    print(f"   ⚠️ Coleção {collection} vazia ou erro")
-                    backup_data["collections"][collection] = []
-            except Exception as e:
-                print(f"   ❌ Erro no backup de {collection}: {e}")
-                backup_data["collections"][collection] = []
-        
-        # Salvar backup
+        # Os documentos são gravados em streaming, página a página, para que a
+        # memória fique constante independente do tamanho das coleções
         backup_file = self.backup_dir / f"{backup_name}.json"
         try:
             with open(backup_file, 'w', encoding='utf-8') as f:
-                json.dump(backup_data, f, indent=2, ensure_ascii=False, default=str)
+                f.write('{\n  "metadata": ')
+                json.dump(metadata, f, ensure_ascii=False)
+                f.write(',\n  "collections": {')
+                
+                for index, collection in enumerate(collections):
+                    print(f"📋 Fazendo backup da coleção: {collection}")
+                    f.write(("," if index else "") + f"\n    {json.dumps(collection)}: [")
+                    
+                    count = 0
+                    try:
+                        for item in firebase_manager.iter_collection(collection):
+                            # Converter datetime para string para JSON
+                            for key, value in item.items():
+                                if isinstance(value, datetime):
+                                    item[key] = value.isoformat()
+                            
+                            f.write(("," if count else "") + "\n      ")
+                            json.dump(item, f, ensure_ascii=False, default=str)
+                            count += 1
+                        print(f"   ✅ {count} documentos salvos")
+                    except Exception as e:
+                        print(f"   ❌ Erro no backup de {collection}: {e} ({count} documentos salvos)")
+                    
+                    f.write("\n    ]")
+                
+                f.write("\n  }\n}\n")
             
             print(f"\n✅ Backup criado com sucesso!")
             print(f"📄 Arquivo: {backup_file}")
@@ -115,28 +118,36 @@ class FirebaseBackupManager:
                     print("   ⚠️ Coleção vazia, pulando...")
                     continue
                 
-                restored_count = 0
                 for doc in documents:
-                    try:
-                        # Converter strings ISO de volta para datetime
-                        for key, value in doc.items():
-                            if isinstance(value, str) and 'T' in value and value.endswith('Z') or '+' in value[-6:]:
-                                try:
-                                    doc[key] = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                                except:
-                                    pass  # Manter como string se não for datetime válido
-                        
-                        result = firebase_manager.add_document(collection_name, doc)
-                        if result.get("success"):
-                            restored_count += 1
-                        else:
-                            print(f"   ⚠️ Erro ao restaurar documento: {doc.get('id', 'Unknown')}")
-                    
-                    except Exception as e:
-                        print(f"   ❌ Erro no documento: {e}")
+                    # Converter strings ISO de volta para datetime
+                    for key, value in doc.items():
+                        if isinstance(value, str) and 'T' in value and (value.endswith('Z') or '+' in value[-6:]):
+                            try:
+                                doc[key] = datetime.fromisoformat(value.replace('Z', '+00:00'))
+                            except:
+                                pass  # Manter como string se não for datetime válido
+                
+                # Restaurar em lotes, preservando os IDs originais
+                result = firebase_manager.create_documents(collection_name, documents)
+                if "results" not in result:
+                    print(f"   ❌ Erro na coleção: {result.get('error')}")
+                    continue
                 
+                for doc_result in result["results"]:
+                    if not doc_result["success"]:
+                        print(f"   ⚠️ Erro ao restaurar documento: {doc_result.get('id', 'Unknown')}")
+                
+                restored_count = result["succeeded"]
                 print(f"   ✅ {restored_count}/{len(documents)} documentos restaurados")
             
+            # O restore grava em lote, sem passar pelos contadores do dashboard
+            try:
+                dashboard_counters.rebuild_sync()
+                print("✅ Contadores do dashboard recalculados")
+            except Exception as e:
+                print(f"⚠️ Erro ao recalcular contadores do dashboard: {e}")
+                print("   Execute: python scripts/rebuild_dashboard_stats.py")
+            
             print(f"\n🎉 Restore concluído!")
             return True
             
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Gera config/firestore.indexes.json a partir das consultas observadas
+Sistema de Gestão de Sugestões v2.0
+
+Com QUERY_STATS_ENABLED=True (desligado por padrão; ative em produção ou
+durante uma sessão de profiling), a API grava as formas de consulta
+(filtros + ordenação) em data/query_shapes.json ao ser encerrada. O
+arquivo não é versionado (.gitignore). Este script lê esse arquivo,
+mostra a frequência e a latência de cada forma e escreve os índices
+compostos necessários, prontos para:
+
+    firebase deploy --only firestore:indexes
+
+Índices já presentes no arquivo de saída são mantidos.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Adicionar o diretório raiz ao path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from backend.core.config import settings
+from backend.database.query_stats import QueryRecorder, firestore_indexes
+
+def main():
+    parser = argparse.ArgumentParser(description="Sugere índices compostos do Firestore a partir das consultas observadas")
+    parser.add_argument("--input", default=settings.QUERY_STATS_FILE,
+                        help="estatísticas gravadas pela API (padrão: %(default)s)")
+    parser.add_argument("--output", default="config/firestore.indexes.json",
+                        help="arquivo de índices a gerar (padrão: %(default)s)")
+    parser.add_argument("--dry-run", action="store_true", help="apenas mostrar, sem gravar")
+    args = parser.parse_args()
+
+    if not Path(args.input).exists():
+        print(f"❌ Arquivo não encontrado: {args.input}")
+        print("   Execute a API e encerre-a normalmente para gravar as estatísticas.")
+        sys.exit(1)
+
+    recorder = QueryRecorder(path=args.input)
+    recorder.load()
+    report = recorder.report()
+
+    print("🔍 FORMAS DE CONSULTA OBSERVADAS")
+    print("=" * 50)
+    for entry in report:
+        mean_ms = (entry['mean_seconds'] or 0) * 1000
+        needs = "índice composto" if entry['composite_index'] else "índices simples"
+        print(f"{entry['count']:>8}x  {mean_ms:8.1f} ms  {entry['key']}  [{needs}]")
+        if entry['errors']:
+            print(f"          ⚠️ {entry['errors']} erro(s): {entry['last_error']}")
+
+    generated = firestore_indexes([entry['shape'] for entry in report])
+
+    # Manter índices existentes (inclusive os criados manualmente)
+    output = Path(args.output)
+    if output.exists():
+        with open(output, "r", encoding="utf-8") as f:
+            existing = json.load(f)
+        known = {json.dumps(index, sort_keys=True) for index in generated['indexes']}
+        for index in existing.get("indexes", []):
+            if json.dumps(index, sort_keys=True) not in known:
+                generated['indexes'].append(index)
+        generated['fieldOverrides'] = existing.get("fieldOverrides", [])
+
+    print()
+    print(f"📋 {len(generated['indexes'])} índice(s) composto(s)")
+
+    if args.dry_run:
+        print(json.dumps(generated, ensure_ascii=False, indent=2))
+        return
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(generated, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"✅ Índices gravados em {output}")
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ sys.path.append(str(Path(__file__).parent / "backend"))
 try:
     from backend.database.firebase_connection import firebase_manager
     from backend.services.google_forms_sync import GoogleFormsSync
+    from backend.services.dashboard_stats import dashboard_counters
     from backend.core.config import settings
     print("✅ Módulos importados com sucesso")
 except ImportError as e:
@@ -78,8 +79,9 @@ def import_all_historical_data():
         print(f"✅ Preparadas {len(all_responses)} respostas para importação")
         
         # Salvar TODAS no Firebase
-        saved_count = 0
         errors = []
+        new_suggestions = []
+        import_batch = f"historical_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
         for response_data in all_responses:
             try:
@@ -87,7 +89,7 @@ def import_all_historical_data():
                 
                 # Adicionar identificador único para evitar duplicatas
                 suggestion['google_forms_row'] = response_data['row_number']
-                suggestion['import_batch'] = f"historical_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                suggestion['import_batch'] = import_batch
                 
                 # Verificar se já existe (por row number)
                 existing = firebase_manager.query_collection("sugestoes", [
@@ -98,31 +100,42 @@ def import_all_historical_data():
                     print(f"⚠️ Linha {response_data['row_number']} já importada")
                     continue
                 
-                # Salvar no Firebase
-                result = firebase_manager.create_document("sugestoes", suggestion)
-                
-                if result["success"]:
-                    saved_count += 1
-                    print(f"✅ Linha {response_data['row_number']}: {suggestion['titulo']}")
-                    
-                    # Log da ação
-                    firebase_manager.create_document("logs", {
-                        "user_id": None,
-                        "action": "IMPORT_HISTORICAL_DATA",
-                        "details": f"Importada linha {response_data['row_number']}: {suggestion['titulo']}",
-                        "source": "historical_import",
-                        "created_at": datetime.now()
-                    })
-                else:
-                    error_msg = f"Erro linha {response_data['row_number']}: {result.get('error')}"
-                    print(f"❌ {error_msg}")
-                    errors.append(error_msg)
+                new_suggestions.append(suggestion)
                     
             except Exception as e:
                 error_msg = f"Exceção linha {response_data.get('row_number', '?')}: {e}"
                 print(f"❌ {error_msg}")
                 errors.append(error_msg)
         
+        # Salvar em lotes (um commit por até 500 documentos)
+        result = firebase_manager.create_documents("sugestoes", new_suggestions) if new_suggestions else {"results": [], "succeeded": 0}
+        
+        if "results" not in result:
+            errors.append(f"Erro ao salvar lote: {result.get('error')}")
+            result = {"results": [], "succeeded": 0}
+        
+        import_logs = []
+        for suggestion, doc_result in zip(new_suggestions, result["results"]):
+            if doc_result["success"]:
+                print(f"✅ Linha {suggestion['google_forms_row']}: {suggestion['titulo']}")
+                import_logs.append({
+                    "user_id": None,
+                    "action": "IMPORT_HISTORICAL_DATA",
+                    "details": f"Importada linha {suggestion['google_forms_row']}: {suggestion['titulo']}",
+                    "source": "historical_import",
+                    "created_at": datetime.now()
+                })
+            else:
+                error_msg = f"Erro linha {suggestion['google_forms_row']}: {doc_result.get('error')}"
+                print(f"❌ {error_msg}")
+                errors.append(error_msg)
+        
+        # Log das ações
+        if import_logs:
+            firebase_manager.create_documents("logs", import_logs)
+        
+        saved_count = result["succeeded"]
+        
         print(f"\n✅ IMPORTAÇÃO CONCLUÍDA:")
         print(f"   • Total de linhas: {len(all_responses)}")
         print(f"   • Importadas com sucesso: {saved_count}")
@@ -141,6 +154,15 @@ def import_all_historical_data():
         print(f"❌ Erro na importação histórica: {e}")
         return False
 
+def rebuild_dashboard_counters():
+    """Recalcula os contadores do dashboard, que as operações em lote não atualizam"""
+    try:
+        dashboard_counters.rebuild_sync()
+        print("✅ Contadores do dashboard recalculados")
+    except Exception as e:
+        print(f"⚠️ Erro ao recalcular contadores do dashboard: {e}")
+        print("   Execute: python scripts/rebuild_dashboard_stats.py")
+
 def clean_all_suggestions():
     """Limpa TODAS as sugestões antes da reimportação"""
     try:
@@ -156,17 +178,16 @@ def clean_all_suggestions():
             print("⚠️ Nenhuma sugestão encontrada para limpar")
             return True
         
-        suggestions = result.get('data', [])
-        deleted_count = 0
+        suggestion_ids = [s['id'] for s in result.get('data', []) if s.get('id')]
         
-        for suggestion in suggestions:
-            suggestion_id = suggestion.get('id')
-            if suggestion_id:
-                delete_result = firebase_manager.delete_document("sugestoes", suggestion_id)
-                if delete_result.get("success"):
-                    deleted_count += 1
+        # Remover em lotes (um commit por até 500 documentos)
+        delete_result = firebase_manager.delete_documents("sugestoes", suggestion_ids)
+        deleted_count = delete_result.get("succeeded", 0)
         
         print(f"✅ {deleted_count} sugestões removidas")
+        
+        # Mesmo que a importação falhe depois, o dashboard não conta as sugestões apagadas
+        rebuild_dashboard_counters()
         return True
         
     except Exception as e:
@@ -203,6 +224,9 @@ def main():
         print("❌ Falha na importação histórica")
         return
     
+    # Passo 3: Recalcular os contadores do dashboard a partir do zero
+    rebuild_dashboard_counters()
+    
     print("\n" + "="*80)
     print("🎉 IMPORTAÇÃO HISTÓRICA CONCLUÍDA COM SUCESSO!")
     print("="*80)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Recalcula estatisticas/dashboard a partir das coleções
+Sistema de Gestão de Sugestões v2.0
+
+Os contadores do dashboard são mantidos por incrementos a cada escrita
+(ver backend/services/dashboard_stats.py). Se uma escrita foi feita por
+fora da API, ou um incremento falhou, este script corrige o documento
+lendo todas as sugestões e todos os usuários ativos.
+
+Escritas feitas enquanto o script roda podem ficar de fora; prefira
+executá-lo com pouco movimento.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Adicionar o diretório raiz ao path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from backend.database.firebase_connection import firebase_manager
+from backend.services.dashboard_stats import dashboard_counters, compute_stats
+
+def nonzero(value):
+    """Counters that reached 0 stay in the document; they are not drift"""
+    if isinstance(value, dict):
+        return {key: count for key, count in value.items() if count}
+    return value or 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula os contadores do dashboard")
+    parser.add_argument("--dry-run", action="store_true", help="apenas comparar, sem gravar")
+    args = parser.parse_args()
+
+    print("📊 CONTADORES DO DASHBOARD")
+    print("=" * 50)
+
+    current = firebase_manager.get_document(dashboard_counters.collection, dashboard_counters.doc_id)
+    current = current['data'] if current['success'] else None
+
+    if args.dry_run:
+        suggestions = firebase_manager.query_collection("sugestoes", select=["status", "created_at"])
+        users = firebase_manager.query_collection("usuarios", filters=[("ativo", "==", True)], select=["ativo", "setor"])
+        if not suggestions['success'] or not users['success']:
+            print(f"❌ Erro ao ler coleções: {suggestions.get('error') or users.get('error')}")
+            sys.exit(1)
+        expected = compute_stats(suggestions['data'], users['data'])
+    else:
+        try:
+            expected = dashboard_counters.rebuild_sync()
+        except Exception as e:
+            print(f"❌ Erro ao recalcular: {e}")
+            sys.exit(1)
+
+    if current is None:
+        print("ℹ️ Documento ainda não existia")
+    for field in ("sugestoes_total", "sugestoes_por_status", "sugestoes_por_mes",
+                  "usuarios_ativos", "usuarios_ativos_por_setor"):
+        before = nonzero((current or {}).get(field))
+        after = nonzero(expected.get(field))
+        marker = "  " if before == after else "⚠️"
+        print(f"{marker} {field}: {json.dumps(after, ensure_ascii=False, sort_keys=True)}")
+        if before != after and current is not None:
+            print(f"     antes: {json.dumps(before, ensure_ascii=False, sort_keys=True)}")
+
+    if args.dry_run:
+        print("\nℹ️ Nada gravado (--dry-run)")
+    else:
+        print(f"\n✅ {dashboard_counters.collection}/{dashboard_counters.doc_id} atualizado")
+
+if __name__ == "__main__":
+    main()
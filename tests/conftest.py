@@ -0,0 +1,13 @@
+"""
+Shared fixtures: the tests run against the in-memory and SQLite backends only
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Never reach a real Firestore project from the test suite
+os.environ["FIREBASE_ENABLED"] = "False"
+os.environ["STORAGE_BACKEND"] = "firestore"
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
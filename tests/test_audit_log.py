@@ -0,0 +1,110 @@
+"""
+Buffered audit-log writer: batching, retries, deferred updates and draining on stop
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from backend.database.async_firebase_connection import async_firebase_manager
+from backend.database.firebase_connection import firebase_manager
+from backend.services.audit_log import AuditLogWriter
+
+@pytest.fixture
+def collection():
+    firebase_manager._ensure_initialized()
+    return f"logs_{uuid.uuid4().hex[:8]}"
+
+def stored(collection):
+    return firebase_manager.query_collection(collection)["data"]
+
+@pytest.mark.asyncio
+async def test_full_batches_are_written_without_waiting(collection, monkeypatch):
+    writes = []
+    create_documents = async_firebase_manager.create_documents
+
+    async def counting(name, documents):
+        writes.append(len(documents))
+        return await create_documents(name, documents)
+
+    monkeypatch.setattr(async_firebase_manager, "create_documents", counting)
+    writer = AuditLogWriter(collection=collection, batch_size=5, flush_interval=60)
+    writer.start()
+    for number in range(12):
+        await writer.write({"acao": "TESTE", "numero": number})
+    await asyncio.sleep(0.05)
+    # A full batch ends the interval; everything queued by then is drained in batches
+    assert writes == [5, 5, 2]
+
+    for number in range(12, 14):
+        await writer.write({"acao": "TESTE", "numero": number})
+    await asyncio.sleep(0.05)
+    # A partial batch waits for the interval, or for the drain on stop
+    assert writes == [5, 5, 2]
+    assert writer.stats()["queued"] == 2
+
+    await writer.stop()
+    assert writes == [5, 5, 2, 2]
+    assert sorted(entry["numero"] for entry in stored(collection)) == list(range(14))
+    assert writer.written == 14 and writer.dropped == 0
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_written_after_the_interval(collection):
+    writer = AuditLogWriter(collection=collection, batch_size=100, flush_interval=0.05)
+    writer.start()
+    await writer.write({"acao": "TESTE"})
+    await asyncio.sleep(0.3)
+    assert len(stored(collection)) == 1
+    await writer.stop()
+
+@pytest.mark.asyncio
+async def test_failed_batches_are_retried_without_duplicates(collection, monkeypatch):
+    create_documents = async_firebase_manager.create_documents
+    failures = iter([True, True])
+
+    async def flaky(name, documents):
+        if next(failures, False):
+            return {"success": False, "error": "unavailable"}
+        return await create_documents(name, documents)
+
+    monkeypatch.setattr(async_firebase_manager, "create_documents", flaky)
+    writer = AuditLogWriter(collection=collection, batch_size=3, flush_interval=0.01)
+    writer.start()
+    for number in range(3):
+        await writer.write({"acao": "TESTE", "numero": number})
+    await asyncio.sleep(0.3)
+    await writer.stop()
+    assert sorted(entry["numero"] for entry in stored(collection)) == [0, 1, 2]
+    assert writer.failed_batches == 2 and writer.dropped == 0
+
+@pytest.mark.asyncio
+async def test_entries_are_dropped_after_max_attempts(collection, monkeypatch):
+    async def failing(name, documents):
+        return {"success": False, "error": "unavailable"}
+
+    monkeypatch.setattr(async_firebase_manager, "create_documents", failing)
+    writer = AuditLogWriter(collection=collection, batch_size=1, flush_interval=0.01, max_attempts=2)
+    writer.start()
+    await writer.write({"acao": "TESTE"})
+    await asyncio.sleep(0.3)
+    await writer.stop()
+    assert writer.dropped == 1 and writer.stats()["queued"] == 0
+
+@pytest.mark.asyncio
+async def test_deferred_updates_are_merged(collection):
+    firebase_manager.create_document(collection, {"nome": "Ana"}, "u1")
+    writer = AuditLogWriter(collection=collection, batch_size=10, flush_interval=60)
+    writer.start()
+    await writer.defer_update(collection, "u1", {"ultimo_login": "primeiro", "contador": 1})
+    await writer.defer_update(collection, "u1", {"ultimo_login": "segundo"})
+    await writer.stop()
+    document = firebase_manager.get_document(collection, "u1")["data"]
+    assert document["ultimo_login"] == "segundo" and document["contador"] == 1
+    assert writer.updated == 1
+
+@pytest.mark.asyncio
+async def test_without_a_flusher_entries_are_written_at_once(collection):
+    writer = AuditLogWriter(collection=collection)
+    await writer.write({"acao": "TESTE"})
+    assert len(stored(collection)) == 1
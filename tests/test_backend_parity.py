@@ -0,0 +1,172 @@
+"""
+MockFirestore and SQLiteFirestore must answer every query the same way
+
+MockFirestore is the reference for Firestore semantics (cross-type
+ordering, missing fields, cursors over ties); the SQLite backend compiles
+the same queries to SQL. Each case runs on both over one dataset that mixes
+value types, missing fields and nested maps.
+"""
+
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.database.firebase_connection import MockFirestore, value_key
+from backend.database.sqlite_backend import SQLiteFirestore
+
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+STATUSES = ["pendente", "aprovada", "rejeitada", None]
+# Values of every type Firestore orders across: null, booleans, numbers, timestamps, strings
+MIXED = [None, True, False, 0, 1, 2, 2.0, 2.5, BASE, BASE + timedelta(days=1), "", "a", "b"]
+
+def make_documents(count: int = 240, seed: int = 7):
+    rng = random.Random(seed)
+    documents = []
+    for number in range(count):
+        document = {
+            "id": f"d{number:04d}",
+            "status": rng.choice(STATUSES),
+            "n": rng.choice(MIXED),
+            "score": rng.choice([1, 2, 3]),
+            "tags": rng.sample(["a", "b", "c", 1, True], 2),
+            "meta": {"rank": rng.randint(0, 5), "group": rng.choice(["x", "y"])},
+            "created_at": BASE + timedelta(minutes=rng.randint(0, 60))
+        }
+        if rng.random() < 0.15:
+            del document["n"]
+        if rng.random() < 0.1:
+            del document["meta"]
+        documents.append(document)
+    return documents
+
+@pytest.fixture(scope="module")
+def stores(tmp_path_factory):
+    documents = make_documents()
+    mock = MockFirestore(seed=False)
+    sqlite = SQLiteFirestore(str(tmp_path_factory.mktemp("parity") / "parity.db"))
+    mock.create_documents("c", [dict(document) for document in documents])
+    sqlite.create_documents("c", [dict(document) for document in documents])
+    yield mock, sqlite
+    sqlite.close()
+
+def query_ids(store, **query):
+    result = store.query_collection("c", **query)
+    assert result["success"], result
+    return [document["id"] for document in result["data"]]
+
+def assert_same(stores, **query):
+    mock, sqlite = stores
+    expected = query_ids(mock, **query)
+    assert query_ids(sqlite, **query) == expected
+    return expected
+
+FILTERS = [
+    [],
+    [("status", "==", "pendente")],
+    [("status", "==", None)],
+    [("status", "!=", "pendente")],
+    [("status", "in", ["aprovada", None])],
+    [("status", "not-in", ["aprovada", "rejeitada"])],
+    [("n", "==", 2)],
+    [("n", ">", 1)],
+    [("n", "<=", True)],
+    [("n", ">=", "a")],
+    [("n", "<", BASE + timedelta(hours=12))],
+    [("created_at", ">=", BASE + timedelta(minutes=30)), ("status", "==", "aprovada")],
+    [("tags", "array-contains", "a")],
+    [("tags", "array-contains-any", [1, "c"])],
+    [("meta.group", "==", "x")],
+    [("meta.rank", ">", 2), ("score", "in", [1, 3])],
+]
+
+@pytest.mark.parametrize("filters", FILTERS, ids=lambda filters: repr(filters))
+def test_filters(stores, filters):
+    assert_same(stores, filters=filters)
+
+@pytest.mark.parametrize("order_by", [None, "n", "status", "created_at", "meta.rank"])
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("limit", [None, 7])
+def test_order_and_limit(stores, order_by, descending, limit):
+    assert_same(stores, order_by=order_by, descending=descending, limit=limit)
+
+def test_cross_type_order(stores):
+    mock, _ = stores
+    ids = assert_same(stores, order_by="n")
+    documents = mock.collections["c"].docs
+    keys = [(value_key(documents[doc_id]["n"]), doc_id) for doc_id in ids]
+    assert keys == sorted(keys)
+    # Documents without the field are left out of an ordered query
+    assert len(ids) == sum(1 for document in documents.values() if "n" in document)
+
+@pytest.mark.parametrize("order_by", [None, "score", "n", "meta.rank"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_cursors_walk_every_page(stores, order_by, descending):
+    """start_after pages cover the query exactly once, ties on the order field included"""
+    mock, sqlite = stores
+    everything = assert_same(stores, order_by=order_by, descending=descending)
+    for store in (mock, sqlite):
+        seen, cursor = [], None
+        while True:
+            page = store.query_collection("c", order_by=order_by, descending=descending,
+                                          limit=9, start_after=cursor)["data"]
+            if not page:
+                break
+            seen.extend(document["id"] for document in page)
+            cursor = page[-1]
+        assert seen == everything
+
+@pytest.mark.parametrize("order_by", ["score", "created_at"])
+def test_end_before_returns_the_previous_page(stores, order_by):
+    mock, _ = stores
+    everything = query_ids(mock, order_by=order_by)
+    documents = mock.collections["c"].docs
+    for position in (0, 5, 50, len(everything) - 1):
+        cursor = documents[everything[position]]
+        previous = assert_same(stores, order_by=order_by, limit=4, end_before=cursor)
+        assert previous == everything[max(0, position - 4):position]
+
+def test_cursor_between_bounds(stores):
+    mock, _ = stores
+    everything = query_ids(mock, order_by="score")
+    documents = mock.collections["c"].docs
+    after, before = documents[everything[10]], documents[everything[60]]
+    ids = assert_same(stores, order_by="score", start_after=after, end_before=before)
+    assert ids == everything[11:60]
+
+@pytest.mark.parametrize("filters", [[], [("status", "==", "pendente")], [("meta.group", "==", "y")]])
+def test_aggregate(stores, filters):
+    mock, sqlite = stores
+    aggregations = [("count", None), ("sum", "score"), ("avg", "n"), ("sum", "meta.rank")]
+    expected = mock.aggregate("c", filters, aggregations)["data"]
+    result = sqlite.aggregate("c", filters, aggregations)["data"]
+    assert result["count"] == expected["count"] == len(query_ids(mock, filters=filters))
+    for alias in ("sum_score", "avg_n", "sum_meta.rank"):
+        assert result[alias] == pytest.approx(expected[alias])
+
+@pytest.mark.parametrize("select", [[], ["status"], ["status", "n"], ["meta.group"], ["missing"]])
+def test_select(stores, select):
+    mock, sqlite = stores
+    query = dict(filters=[("score", "==", 2)], order_by="created_at", select=select)
+    expected = mock.query_collection("c", **query)["data"]
+    assert sqlite.query_collection("c", **query)["data"] == expected
+    for document in expected:
+        assert set(document) <= set(select) | {"id", "meta"}
+
+def test_writes_keep_indexes_in_sync(tmp_path):
+    """Updates and deletes after the indexes exist are reflected by both backends"""
+    mock, sqlite = MockFirestore(seed=False), SQLiteFirestore(str(tmp_path / "writes.db"))
+    documents = make_documents(count=60, seed=3)
+    for store in (mock, sqlite):
+        store.create_documents("c", [dict(document) for document in documents])
+        # Build the mock's indexes before writing
+        store.query_collection("c", filters=[("status", "==", "aprovada")], order_by="n")
+    for number, document in itertools.islice(enumerate(documents), 0, 60, 4):
+        for store in (mock, sqlite):
+            store.update_document("c", document["id"], {"status": "aprovada", "n": number})
+            store.delete_document("c", documents[number + 1]["id"])
+    pair = (mock, sqlite)
+    assert_same(pair, filters=[("status", "==", "aprovada")], order_by="n")
+    assert_same(pair, filters=[("n", ">=", 10)], order_by="n", descending=True, limit=5)
+    sqlite.close()
@@ -0,0 +1,100 @@
+"""
+CircuitBreaker state machine: closed -> open -> half-open -> closed
+"""
+
+import pytest
+
+from backend.database import resilience
+from backend.database.resilience import CircuitBreaker, CircuitOpenError
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+def open_breaker(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opened_count == 1
+    clock.now += 4
+    with pytest.raises(CircuitOpenError, match="6.0s"):
+        breaker.before_call()
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10)
+    open_breaker(breaker)
+    clock.now += 10
+    assert breaker.state == "half_open"
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+def test_failed_trial_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10)
+    open_breaker(breaker)
+    clock.now += 10
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opened_count == 2
+    with pytest.raises(CircuitOpenError, match="10.0s"):
+        breaker.before_call()
+
+def test_released_trial_frees_the_slot(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=5)
+    open_breaker(breaker)
+    clock.now += 5
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+def test_rejection_survives_a_concurrent_close(clock, monkeypatch):
+    """retry_in uses the open time read under the lock, even if a success clears it meanwhile"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=5)
+    open_breaker(breaker)
+    clock.now += 10
+    breaker.before_call()
+
+    class ClosingLock:
+        """Lets the trial's success land right after before_call releases the lock"""
+
+        def __init__(self, lock):
+            self.lock = lock
+
+        def __enter__(self):
+            return self.lock.__enter__()
+
+        def __exit__(self, *exc_info):
+            self.lock.__exit__(*exc_info)
+            breaker._opened_at = None
+
+    monkeypatch.setattr(breaker, "_lock", ClosingLock(breaker._lock))
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
@@ -0,0 +1,125 @@
+"""
+Keyset pagination: opaque cursors and GET /api/suggestions/
+
+Suggestions are seeded with repeated created_at values, so pages only line
+up if cursors break ties by document ID the way the backends order them.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.database.cursors import decode_cursor, encode_cursor
+from backend.database.firebase_connection import MockFirestore, firebase_manager
+
+BASE = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+def suggestion(number: int) -> dict:
+    return {
+        "id": f"pg{number:03d}",
+        "titulo": f"Sugestão {number}",
+        "descricao": "Teste de paginação",
+        "setor_origem": "TI",
+        "setor_destino": "RH",
+        "prioridade": "media",
+        "status": "pendente" if number % 3 else "aprovada",
+        "usuario_id": "admin_user_123",
+        # Three suggestions per timestamp
+        "created_at": BASE + timedelta(minutes=number // 3)
+    }
+
+def test_cursor_round_trip():
+    document = {"id": "abc", "created_at": BASE, "meta": {"rank": 2}}
+    assert decode_cursor(encode_cursor(document, "created_at"), "created_at") == {"id": "abc", "created_at": BASE}
+    assert decode_cursor(encode_cursor(document, "meta.rank"), "meta.rank") == {"id": "abc", "meta": {"rank": 2}}
+    assert decode_cursor(encode_cursor(document)) == {"id": "abc"}
+
+@pytest.mark.parametrize("token", ["not base64!", "e30", "bnVsbA"])
+def test_malformed_cursor(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token, "created_at")
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_decoded_cursors_page_forwards_and_back(descending):
+    store = MockFirestore(seed=False)
+    store.create_documents("sugestoes", [suggestion(number) for number in range(25)])
+    everything = [item["id"] for item in store.query_collection(
+        "sugestoes", order_by="created_at", descending=descending)["data"]]
+
+    # Forwards: each page's last document is the next page's cursor
+    pages, cursor = [], None
+    while True:
+        page = store.query_collection("sugestoes", order_by="created_at", descending=descending, limit=4,
+                                      start_after=cursor)["data"]
+        if not page:
+            break
+        pages.append([item["id"] for item in page])
+        cursor = decode_cursor(encode_cursor(page[-1], "created_at"), "created_at")
+    assert [doc_id for page in pages for doc_id in page] == everything
+
+    # Backwards: each page's first document is the previous page's cursor
+    for previous, current in zip(pages, pages[1:]):
+        first = store.get_document("sugestoes", current[0])["data"]
+        before = decode_cursor(encode_cursor(first, "created_at"), "created_at")
+        page = store.query_collection("sugestoes", order_by="created_at", descending=descending, limit=4,
+                                      end_before=before)["data"]
+        assert [item["id"] for item in page] == previous
+
+@pytest.fixture(scope="module")
+def client():
+    from backend.main import app
+
+    with TestClient(app) as test_client:
+        firebase_manager.create_documents("sugestoes", [suggestion(number) for number in range(23)])
+        response = test_client.post("/api/auth/login", json={"email": "admin@sistema.com", "password": "admin123"})
+        test_client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        yield test_client
+
+def walk(client, **params):
+    """Every page of the listing, following next_cursor from the first page"""
+    pages = []
+    response = client.get("/api/suggestions/", params=params)
+    while True:
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages.append(body)
+        if body["next_cursor"] is None:
+            return pages
+        response = client.get("/api/suggestions/", params={**params, "cursor": body["next_cursor"]})
+
+def expected_ids(filters=None):
+    result = firebase_manager.query_collection("sugestoes", filters=filters, order_by="created_at")
+    return [item["id"] for item in result["data"]]
+
+def test_first_page_is_a_keyset_page(client):
+    body = client.get("/api/suggestions/", params={"per_page": 5}).json()
+    assert [item["id"] for item in body["suggestions"]] == expected_ids()[:5]
+    assert body["total"] == len(expected_ids())
+    assert body["next_cursor"] is not None
+
+def test_next_cursors_cover_every_suggestion_once(client):
+    pages = walk(client, per_page=5)
+    assert all(len(page["suggestions"]) == 5 for page in pages[:-1])
+    assert [item["id"] for page in pages for item in page["suggestions"]] == expected_ids()
+
+def test_cursor_pages_match_offset_pages(client):
+    ids = expected_ids()
+    for page in (2, 3):
+        body = client.get("/api/suggestions/", params={"per_page": 5, "page": page}).json()
+        assert [item["id"] for item in body["suggestions"]] == ids[(page - 1) * 5:page * 5]
+
+def test_cursor_with_filter(client):
+    pages = walk(client, per_page=4, status="aprovada")
+    ids = [item["id"] for page in pages for item in page["suggestions"]]
+    assert ids == expected_ids([("status", "==", "aprovada")])
+    assert all(page["total"] == len(ids) for page in pages)
+
+def test_last_page_has_no_cursor(client):
+    body = client.get("/api/suggestions/", params={"per_page": 100}).json()
+    assert body["next_cursor"] is None
+    assert len(body["suggestions"]) == len(expected_ids())
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/api/suggestions/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,74 @@
+"""
+Password hashing formats, rehash detection and the background upgrade at login
+"""
+
+import asyncio
+import hashlib
+
+import pytest
+
+from backend.database.firebase_connection import firebase_manager
+from backend.services import auth_service as auth_service_module
+from backend.services.auth_service import auth_service
+from backend.services.password_hasher import PasswordHasher, password_hasher
+
+@pytest.mark.parametrize("hasher", [
+    PasswordHasher("scrypt", scrypt_n=2 ** 10),
+    PasswordHasher("pbkdf2_sha256", pbkdf2_iterations=1000),
+], ids=["scrypt", "pbkdf2_sha256"])
+def test_hash_and_verify(hasher):
+    stored = hasher.hash("segredo")
+    assert stored.startswith(hasher.algorithm + "$")
+    assert hasher.verify("segredo", stored)
+    assert not hasher.verify("outro", stored)
+    assert hasher.hash("segredo") != stored
+    assert not hasher.needs_rehash(stored)
+
+def test_legacy_sha256_verifies_and_needs_rehash():
+    hasher = PasswordHasher("scrypt", scrypt_n=2 ** 10)
+    legacy = hashlib.sha256(b"admin123").hexdigest()
+    assert hasher.verify("admin123", legacy)
+    assert not hasher.verify("admin124", legacy)
+    assert hasher.needs_rehash(legacy)
+
+def test_changed_parameters_need_rehash():
+    old = PasswordHasher("scrypt", scrypt_n=2 ** 10).hash("segredo")
+    current = PasswordHasher("scrypt", scrypt_n=2 ** 11)
+    assert current.verify("segredo", old)
+    assert current.needs_rehash(old)
+    assert PasswordHasher("pbkdf2_sha256", pbkdf2_iterations=1000).needs_rehash(old)
+
+@pytest.mark.parametrize("stored", ["", "scrypt$bad", "md5$abc$def", "pbkdf2_sha256$x$y$z"])
+def test_malformed_hashes_never_verify(stored):
+    assert not PasswordHasher("scrypt", scrypt_n=2 ** 10).verify("segredo", stored)
+
+@pytest.mark.asyncio
+async def test_login_does_not_wait_for_the_rehash(monkeypatch):
+    firebase_manager._ensure_initialized()
+    legacy = hashlib.sha256(b"segredo").hexdigest()
+    user_id = firebase_manager.create_document("usuarios", {
+        "nome": "Bia", "email": "bia@example.com", "setor": "TI", "tipo_usuario": "user",
+        "ativo": True, "senha_hash": legacy
+    })["id"]
+
+    release = asyncio.Event()
+    upgrade = auth_service.upgrade_password_hash
+
+    async def slow_upgrade(user, password):
+        await release.wait()
+        await upgrade(user, password)
+
+    monkeypatch.setattr(auth_service_module.FirebaseAuthService, "upgrade_password_hash", staticmethod(slow_upgrade))
+    try:
+        user = await asyncio.wait_for(auth_service.authenticate_user("bia@example.com", "segredo"), timeout=10)
+        assert user["id"] == user_id
+        # The login returned while the rehash is still held back
+        assert firebase_manager.get_document("usuarios", user_id)["data"]["senha_hash"] == legacy
+
+        release.set()
+        await asyncio.wait_for(asyncio.gather(*auth_service_module._rehash_tasks), timeout=10)
+        upgraded = firebase_manager.get_document("usuarios", user_id)["data"]["senha_hash"]
+        assert not password_hasher.needs_rehash(upgraded)
+        assert password_hasher.verify("segredo", upgraded)
+    finally:
+        firebase_manager.delete_document("usuarios", user_id)
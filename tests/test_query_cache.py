@@ -0,0 +1,78 @@
+"""
+TTL/LRU cache and the query result cache's write-through invalidation
+"""
+
+import pytest
+
+from backend.core import cache as cache_module
+from backend.core.cache import TTLCache
+from backend.database.query_cache import QueryCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+def test_ttl_cache_expires_and_evicts_least_recently_used(clock):
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=1)
+    assert cache.get("a") == 1
+    clock[0] += 2
+    assert cache.get("b") is None
+    assert cache.expirations == 1
+
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    # "b" was the least recently used entry
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+def make_cache(**ttls):
+    return QueryCache(enabled=True, maxsize=100, default_ttl=30, ttls=ttls)
+
+def result(*ids):
+    return {"success": True, "data": [{"id": doc_id} for doc_id in ids]}
+
+def test_writes_invalidate_the_collection_only():
+    cache = make_cache()
+    users = cache.key("usuarios", "query", [("ativo", "==", True)])
+    logs = cache.key("logs", "query", None)
+    cache.put(users, result("u1"))
+    cache.put(logs, result("l1"))
+
+    cache.invalidate("usuarios")
+    assert cache.get(cache.key("usuarios", "query", [("ativo", "==", True)])) is None
+    assert cache.get(cache.key("logs", "query", None)) == result("l1")
+
+def test_read_in_flight_during_a_write_is_not_served():
+    cache = make_cache()
+    key = cache.key("sugestoes", "query", None)
+    cache.invalidate("sugestoes")
+    # The read started before the write finishes and stores an old result
+    cache.put(key, result("old"))
+    assert cache.get(cache.key("sugestoes", "query", None)) is None
+
+def test_filter_values_keep_their_type():
+    cache = make_cache()
+    cache.put(cache.key("c", "query", [("n", "==", 1)]), result("int"))
+    assert cache.get(cache.key("c", "query", [("n", "==", True)])) is None
+    assert cache.get(cache.key("c", "query", [("n", "==", 1.0)])) is None
+    assert cache.get(cache.key("c", "query", [("n", "==", 1)])) == result("int")
+
+def test_results_are_copies():
+    cache = make_cache()
+    key = cache.key("c", "query", None)
+    cache.put(key, result("a"))
+    cache.get(key)["data"][0]["id"] = "changed"
+    assert cache.get(key) == result("a")
+
+def test_failures_disabled_collections_and_unhashable_shapes_are_not_cached():
+    cache = make_cache(logs=0)
+    cache.put(cache.key("c", "query", None), {"success": False, "error": "x"})
+    assert cache.get(cache.key("c", "query", None)) is None
+    assert cache.key("logs", "query", None) is None
+    assert cache.key("c", "query", object.__new__(type("Unhashable", (), {"__hash__": None}))) is None
+    assert QueryCache(enabled=False, maxsize=10, default_ttl=30, ttls={}).key("c", "query") is None
@@ -0,0 +1,122 @@
+"""
+Declarative report queries: spec validation and results against a plain pandas groupby
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from backend.services.report_query import compile_query, compile_spec, MISSING_LABELS
+from backend.services.suggestion_snapshot import local_day_bounds, to_frame
+
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+@pytest.fixture(scope="module")
+def suggestions():
+    rng = random.Random(11)
+    items = []
+    for number in range(2000):
+        item = {
+            "usuario_id": rng.choice([f"u{user}" for user in range(40)] + [None, ""]),
+            "status": rng.choice(["pendente", "aprovada", "rejeitada", None]),
+            "prioridade": rng.choice(["baixa", "media", "alta"]),
+            "setor_origem": rng.choice(["TI", "RH", "Financeiro", None]),
+            "setor_destino": rng.choice(["TI", "RH", "Compras"]),
+            "created_at": BASE + timedelta(hours=rng.randint(0, 24 * 120)) if rng.random() > 0.02 else None
+        }
+        items.append(item)
+    return items
+
+@pytest.fixture(scope="module")
+def frame(suggestions):
+    return to_frame(suggestions)
+
+def expected_counts(suggestions, group_by, keep=lambda item: True):
+    """{group tuple: count} computed row by row"""
+    counts = {}
+    for item in suggestions:
+        if not keep(item):
+            continue
+        key = tuple(item[field] if item[field] is not None else MISSING_LABELS[field] for field in group_by)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def result_counts(result, group_by, metric="count"):
+    return {tuple(row[field] for field in group_by): row[metric] for row in result["rows"]}
+
+@pytest.mark.parametrize("group_by", [[], ["status"], ["setor_origem", "status"], ["prioridade", "setor_destino", "status"]])
+def test_group_counts(suggestions, frame, group_by):
+    result = compile_spec({"group_by": group_by}).run(frame)
+    assert result_counts(result, group_by) == expected_counts(suggestions, group_by)
+    assert result["matched"] == len(suggestions)
+
+def test_filters_and_visible_sector(suggestions, frame):
+    spec = {"group_by": ["status"], "filters": {"prioridade": ["alta", "media"], "setor": "RH"}}
+    result = compile_spec(spec).run(frame, visible_setor="TI")
+
+    def keep(item):
+        return (item["prioridade"] in ("alta", "media")
+                and "RH" in (item["setor_origem"], item["setor_destino"])
+                and "TI" in (item["setor_origem"], item["setor_destino"]))
+
+    assert result_counts(result, ["status"]) == expected_counts(suggestions, ["status"], keep)
+
+def test_date_to_includes_the_whole_day(suggestions, frame):
+    day = "2025-02-10"
+    start, end = local_day_bounds(day)
+    result = compile_spec({"filters": {"date_from": day, "date_to": day}}).run(frame)
+    inside = [item for item in suggestions
+              if item["created_at"] is not None and start <= pd.Timestamp(item["created_at"]).value < end]
+    assert result["rows"] == [{"count": len(inside)}]
+    assert inside
+
+@pytest.mark.parametrize("bucket", ["day", "week", "month"])
+def test_buckets(suggestions, frame, bucket):
+    result = compile_spec({"bucket": bucket}).run(frame)
+    dated = pd.Series([item["created_at"] for item in suggestions if item["created_at"] is not None])
+    dated = pd.to_datetime(dated, utc=True).dt.tz_localize(None)
+    if bucket == "day":
+        labels = dated.dt.strftime("%Y-%m-%d")
+    elif bucket == "week":
+        labels = (dated.dt.normalize() - pd.to_timedelta(dated.dt.weekday, unit="D")).dt.strftime("%Y-%m-%d")
+    else:
+        labels = dated.dt.strftime("%Y-%m")
+    assert result_counts(result, ["bucket"]) == {(label,): count for label, count in labels.value_counts().items()}
+
+def test_distinct_users(suggestions, frame):
+    result = compile_spec({"group_by": ["status"], "metric": "distinct_users"}).run(frame)
+    expected = {}
+    for item in suggestions:
+        if item["usuario_id"]:
+            status = item["status"] if item["status"] is not None else MISSING_LABELS["status"]
+            expected.setdefault((status,), set()).add(item["usuario_id"])
+    assert result_counts(result, ["status"], "distinct_users") == {key: len(users) for key, users in expected.items()}
+
+def test_limit_keeps_the_largest_groups(suggestions, frame):
+    result = compile_spec({"group_by": ["usuario_id"], "limit": 5}).run(frame)
+    counts = [row["count"] for row in result["rows"]]
+    everything = sorted(expected_counts(suggestions, ["usuario_id"]).values(), reverse=True)
+    assert counts == everything[:5]
+    assert result["groups"] == len(everything)
+
+@pytest.mark.parametrize("spec", [
+    {"group_by": ["titulo"]},
+    {"group_by": ["status", "status"]},
+    {"bucket": "year"},
+    {"metric": "sum"},
+    {"limit": 0},
+    {"filters": {"date_from": "10/02/2025"}},
+    {"filters": {"days": 0}},
+    {"filters": {"status": []}},
+    {"filters": {"cor": "azul"}},
+])
+def test_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        compile_spec(spec)
+
+def test_plans_are_cached_by_spec():
+    spec = {"group_by": ["status", "prioridade"], "filters": {"days": 30}}
+    assert compile_query(spec) is compile_query(dict(reversed(list(spec.items()))))
+    assert compile_query(spec) is not compile_query({**spec, "limit": 3})
@@ -0,0 +1,100 @@
+"""
+Token versions for AUTH_CLAIMS_ONLY, and the claim-change bump on user updates
+"""
+
+import time
+
+import pytest
+
+from backend.database.async_firebase_connection import async_firebase_manager
+from backend.database.firebase_connection import MockFirestore, firebase_manager
+from backend.services import auth_service as auth_service_module
+from backend.services.auth_service import auth_service
+from backend.services.token_versions import TokenVersions
+
+@pytest.fixture
+def user_id():
+    firebase_manager._ensure_initialized()
+    result = firebase_manager.create_document("usuarios", {
+        "nome": "Ana", "email": "ana@example.com", "setor": "RH", "tipo_usuario": "user",
+        "ativo": True, "token_version": 100
+    })
+    yield result["id"]
+    firebase_manager.delete_document("usuarios", result["id"])
+
+@pytest.mark.asyncio
+async def test_accepts_current_versions_only(user_id):
+    versions = TokenVersions()
+    assert not versions.accepts(user_id, 100)
+    await versions.load()
+    assert versions.accepts(user_id, 100)
+    assert versions.accepts(user_id, 101)
+    assert not versions.accepts(user_id, 99)
+    assert not versions.accepts(user_id, "100")
+    assert not versions.accepts("unknown", 100)
+
+@pytest.mark.asyncio
+async def test_reload_sees_revocations_made_elsewhere(user_id):
+    versions = TokenVersions()
+    await versions.load()
+    # Another worker revokes: only the stored document changes
+    firebase_manager.update_document("usuarios", user_id, {"token_version": 200})
+    assert versions.accepts(user_id, 100)
+    await versions.load()
+    assert not versions.accepts(user_id, 100)
+    assert versions.accepts(user_id, 200)
+
+@pytest.mark.asyncio
+async def test_local_revocation_during_a_reload_is_kept(user_id, monkeypatch):
+    versions = TokenVersions()
+    await versions.load()
+    read = async_firebase_manager.query_collection
+
+    async def read_then_revoke(*args, **kwargs):
+        result = await read(*args, **kwargs)
+        # The read has the old version; the revocation lands before it is applied
+        versions.revoke(user_id, 300)
+        return result
+
+    monkeypatch.setattr(async_firebase_manager, "query_collection", read_then_revoke)
+    await versions.load()
+    assert not versions.accepts(user_id, 100)
+    assert versions.accepts(user_id, 300)
+
+@pytest.mark.asyncio
+async def test_forgotten_user_stays_forgotten_across_a_reload(user_id, monkeypatch):
+    versions = TokenVersions()
+    read = async_firebase_manager.query_collection
+
+    async def read_then_forget(*args, **kwargs):
+        result = await read(*args, **kwargs)
+        versions.forget(user_id)
+        return result
+
+    monkeypatch.setattr(async_firebase_manager, "query_collection", read_then_forget)
+    await versions.load()
+    assert not versions.accepts(user_id, 100)
+
+@pytest.mark.asyncio
+async def test_stale_table_is_not_trusted(user_id):
+    versions = TokenVersions(reload_seconds=30)
+    await versions.load()
+    versions.loaded_at = time.time() - 61
+    assert not versions.accepts(user_id, 100)
+    assert versions.stats()["stale"]
+
+def test_claim_change_bumps_version_inside_the_update(monkeypatch):
+    issued = iter(range(10, 100))
+    monkeypatch.setattr(auth_service_module, "new_token_version", lambda: next(issued))
+    store = MockFirestore(seed=False)
+    store.create_document("usuarios", {"nome": "Ana", "setor": "RH", "telefone": "1", "token_version": 5}, "u1")
+
+    def update(data):
+        return store.update_and_get("usuarios", "u1", data, derive=auth_service.claim_version_bump(data))["data"]
+
+    # Unchanged claim values and non-claim fields keep the version
+    assert update({"nome": "Ana", "telefone": "2"})["token_version"] == 5
+    assert update({"setor": "TI"})["token_version"] == 10
+    # The diff is against the stored document, not the caller's earlier view
+    store.update_document("usuarios", "u1", {"setor": "RH"})
+    assert update({"setor": "TI"})["token_version"] == 11